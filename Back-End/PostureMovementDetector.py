@@ -1,74 +1,276 @@
 import cv2
-import mediapipe as mp
 import numpy as np
 import time
-import csv
 from datetime import datetime
 import os
+import logging
+import queue
+import threading
+from dataclasses import dataclass, field
+try:
+    import mediapipe as mp
+except ImportError:
+    # Analysis, replay and benchmarks can run on recorded landmarks without MediaPipe
+    mp = None
+from landmarks import KEY_LANDMARKS, NUM_LANDMARKS, LANDMARK_FIELDS, MOVEMENT_CODES, landmarks_to_array
+from landmark_log import LOG_SINKS, FRAME_DTYPE, FLAG_REUSED
+from landmark_bus import LandmarkBus, DEFAULT_BUS_NAME
+from segment_logging import RotatingLandmarkSink
+from latency_controller import AdaptivePoseEstimator
+from roi_tracker import RoiPoseEstimator
+from person_tracking import PatientPoseEstimator, MediaPipeMultiPose
+from pose_pool import get_default_pool
+from video_sources import open_frame_source
+from stage_metrics import StageMetrics, NULL_TIMER
+from text_overlay import CachedTextRenderer
+from tremor_analysis import SlidingDFTTremorAnalyzer
+from landmark_smoothing import make_smoother
+from motion_gate import MotionGate
+from rule_engine import RuleSet
+from posture_rules import (assess_posture_batch, detect_involuntary_movements_batch,
+                           posture_status_dict, movement_status_dict)
+
+@dataclass
+class FrameResult:
+    """Analysis output for a single frame"""
+    frame_index: int
+    timestamp: float
+    pose_landmarks: object = None  # MediaPipe landmark list, kept for drawing
+    landmarks: np.ndarray = None  # (33, 4) x, y, z, visibility or None when nobody was detected
+    movement_scores: dict = field(default_factory=dict)  # scores of visible key landmarks by name
+    movement_score_array: np.ndarray = None  # (33,) scores for every landmark
+    posture_status: dict = field(default_factory=lambda: {"overall": "no_detection"})
+    movement_status: dict = field(default_factory=lambda: {"overall": "normal"})
+    tremor: dict = None  # SlidingDFTTremorAnalyzer.report() once its window is full
+    reused: bool = False  # True when the motion gate skipped inference and the previous landmarks were kept
+
+
+
+@dataclass
+class FrameBatch:
+    """
+    Analysis output for a batch of frames from process_frames, as arrays.
+    Frames without a detection have NaN landmarks and scores.
+    """
+    frame_indices: np.ndarray  # (N,)
+    timestamps: np.ndarray  # (N,) seconds
+    landmarks: np.ndarray  # (N, 33, 4) x, y, z, visibility
+    movement_scores: np.ndarray  # (N, 33)
+    posture_codes: np.ndarray  # (N,) uint8 from POSTURE_CODES
+    movement_codes: np.ndarray  # (N,) uint8 from MOVEMENT_CODES, tremor included
+    posture_masks: dict  # assess_posture_batch masks, or the rule engine's fired masks
+    movement_masks: dict  # detect_involuntary_movements_batch masks, or the rule engine's fired masks
+    reused: np.ndarray  # (N,) bool, see FrameResult.reused
+    tremor: np.ndarray = None  # (N, K) bool per tremor_landmarks entry, None without tremor analysis
+    rules: RuleSet = None
+    key_landmarks: dict = field(default_factory=lambda: dict(KEY_LANDMARKS))
+    tremor_names: list = field(default_factory=list)
+    
+    def __len__(self):
+        return len(self.timestamps)
+    
+    def status(self, i):
+        """(posture_status, movement_status) dicts of frame i, as in FrameResult"""
+        if self.rules is not None:
+            posture_status, movement_status = self.rules.status_dicts(
+                self.posture_codes, self.movement_codes, self.posture_masks, i)
+        else:
+            posture_status = posture_status_dict(self.posture_codes, self.posture_masks, i)
+            movement_status = movement_status_dict(self.movement_codes, self.movement_masks, i,
+                                                   key_landmarks=self.key_landmarks)
+        if self.tremor is not None:
+            for name, flagged in zip(self.tremor_names, self.tremor[i]):
+                if flagged:
+                    movement_status[name] = "tremor"
+        return posture_status, movement_status
+    
+    def records(self):
+        """The batch as FRAME_DTYPE records, ready for a columnar log or the landmark bus"""
+        records = np.zeros(len(self), dtype=FRAME_DTYPE)
+        records['frame'] = self.frame_indices
+        records['timestamp'] = self.timestamps
+        records['landmarks'] = self.landmarks
+        records['movement_scores'] = self.movement_scores
+        records['posture'] = self.posture_codes
+        records['movement'] = self.movement_codes
+        records['flags'] = np.where(self.reused, FLAG_REUSED, 0)
+        return records
+    
+    def frame_result(self, i, visibility_threshold=0.5):
+        """Frame i as a FrameResult, without the MediaPipe landmark list or the tremor report"""
+        posture_status, movement_status = self.status(i)
+        if np.isnan(self.landmarks[i, 0, 3]):
+            return FrameResult(int(self.frame_indices[i]), float(self.timestamps[i]),
+                               posture_status=posture_status, movement_status=movement_status,
+                               reused=bool(self.reused[i]))
+        landmarks = self.landmarks[i]
+        scores = self.movement_scores[i]
+        movement_scores = {name: float(scores[idx]) for name, idx in self.key_landmarks.items()
+                           if landmarks[idx, 3] > visibility_threshold}
+        return FrameResult(int(self.frame_indices[i]), float(self.timestamps[i]), None, landmarks,
+                           movement_scores, scores, posture_status, movement_status, None, bool(self.reused[i]))
+
+def _put_latest(q, item):
+    """Put item on a bounded queue, dropping the oldest entry if it is full. Returns True if one was dropped"""
+    dropped = False
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
 
 class PostureMovementDetector:
-    def __init__(self, camera_index=0, landmark_visibility_threshold=0.5):
+    def __init__(self, camera_index=0, landmark_visibility_threshold=0.5,
+                 max_history_length=30, movement_window=10, log_format="csv",
+                 frame_size=(1280, 720), latency_budget_ms=None, roi_tracking=False,
+                 metrics=False, metrics_port=None, tremor_analysis=False, pose_estimator=None,
+                 event_engine=None, reuse_buffers=False, smoothing=None, motion_gate=False,
+                 segment_seconds=None, segment_bytes=None, on_segment_closed=None, rules=None,
+                 landmark_bus=None, person_tracking=None, video_path=None, video_backend="opencv",
+                 frame_stride=1, pose_pool=None):
         # MediaPipe setup
-        self.mp_pose = mp.solutions.pose
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.mp_drawing_styles = mp.solutions.drawing_styles
+        if mp is not None:
+            self.mp_pose = mp.solutions.pose
+            self.mp_drawing = mp.solutions.drawing_utils
+            self.mp_drawing_styles = mp.solutions.drawing_styles
+        else:
+            self.mp_pose = self.mp_drawing = self.mp_drawing_styles = None
         
         # Initialize pose detection with higher min_detection_confidence for stability
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7,
-            model_complexity=2  # Use the most accurate model
-        )
+        self.pose_pool = None
+        self.pooled_pose = None
+        if person_tracking is not None:
+            # Several people in view: a PatientPoseEstimator, or the path of a PoseLandmarker
+            # .task model to build one with MediaPipe's multi-person landmarker
+            if isinstance(person_tracking, str):
+                person_tracking = PatientPoseEstimator(MediaPipeMultiPose(person_tracking))
+            self.pose = person_tracking
+        elif pose_estimator is not None:
+            # Anything with a MediaPipe-style process(rgb_image), e.g. a fake for benchmarks
+            self.pose = pose_estimator
+        elif pose_pool is not None:
+            # A warm estimator loaded at process start instead of a new graph per session
+            # (True: the process-wide pose_pool.get_default_pool()); returned by cleanup()
+            self.pose_pool = get_default_pool() if pose_pool is True else pose_pool
+            self.pooled_pose = self.pose = self.pose_pool.acquire()
+        elif mp is None:
+            raise ImportError("mediapipe is required unless a pose_estimator is given")
+        elif latency_budget_ms is None:
+            self.pose = self.mp_pose.Pose(
+                min_detection_confidence=0.7,
+                min_tracking_confidence=0.7,
+                model_complexity=2  # Use the most accurate model
+            )
+        else:
+            # Start with the most accurate model and degrade only when over budget
+            self.pose = AdaptivePoseEstimator(
+                budget_ms=latency_budget_ms,
+                min_detection_confidence=0.7,
+                min_tracking_confidence=0.7
+            )
+        
+        # Run inference on a crop around the patient found in the previous frame. Not combined
+        # with person tracking, which has to see everyone to keep their tracks apart
+        if roi_tracking and person_tracking is None:
+            self.pose = RoiPoseEstimator(self.pose)
+        
+        # Skip inference on static frames and keep the previous landmarks (True or a MotionGate)
+        self.motion_gate = MotionGate() if motion_gate is True else (motion_gate or None)
+        self.last_pose_results = None
         
         # Camera setup
         self.camera_index = camera_index
+        self.frame_size = frame_size  # Requested capture resolution (width, height)
         self.cap = None
+        # Recorded video or stream to analyze instead of the camera, see video_sources.FRAME_SOURCES
+        self.video_path = video_path
+        self.video_backend = video_backend  # "opencv" or "pyav" (threaded FFmpeg decode straight to RGB)
+        self.frame_stride = frame_stride  # Analyze every n-th frame of the video
+        self.source = None
         
         # Tracking variables
         self.landmark_visibility_threshold = landmark_visibility_threshold
         self.frame_count = 0
+        self.dropped_frames = 0
         self.start_time = None
         self.prev_time = 0
         
         # Key landmarks for posture analysis (indices in MediaPipe Pose)
-        self.key_landmarks = {
-            "LEFT_SHOULDER": 11,
-            "RIGHT_SHOULDER": 12,
-            "LEFT_HIP": 23,
-            "RIGHT_HIP": 24,
-            "LEFT_KNEE": 25,
-            "RIGHT_KNEE": 26,
-            "LEFT_ANKLE": 27,
-            "RIGHT_ANKLE": 28,
-            "NOSE": 0,
-            "LEFT_EAR": 7,
-            "RIGHT_EAR": 8,
-            "LEFT_WRIST": 15,
-            "RIGHT_WRIST": 16
-        }
+        self.key_landmarks = dict(KEY_LANDMARKS)
         
         # Movement tracking
-        self.landmark_history = {name: [] for name in self.key_landmarks}
         self.movement_threshold = 0.01  # Threshold for detecting significant movement
-        self.max_history_length = 30  # Number of frames to keep for movement analysis
+        self.max_history_length = max_history_length  # Number of frames to keep for movement analysis
+        self.movement_window = movement_window  # Number of recent frames averaged into a movement score
+        # Landmark jitter filter applied before scoring and logging: None, "one_euro", "kalman"
+        # or a filter instance from landmark_smoothing
+        self.smoother = make_smoother(smoothing, visibility_threshold=landmark_visibility_threshold) \
+            if isinstance(smoothing, str) else smoothing
+        # Declarative posture/movement rules (a rule file path or a RuleSet) replacing the
+        # built-in checks; their params default to this detector's thresholds
+        self.rules = RuleSet.from_file(rules) if isinstance(rules, str) else rules
+        # Frequency analysis of wrists, ankles and head; fps is corrected once the camera reports it
+        self.tremor_analyzer = SlidingDFTTremorAnalyzer(
+            fps=30.0, visibility_threshold=landmark_visibility_threshold) if tremor_analysis else None
+        # Ring buffer of (frame, landmark, x/y/z/visibility); history_index is the next slot to write
+        self.landmark_history = np.zeros((max_history_length, NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+        self.history_index = 0
+        self.history_count = 0
         
         # Data logging
         self.output_dir = "patient_data"
         os.makedirs(self.output_dir, exist_ok=True)
-        self.csv_file = None
-        self.csv_writer = None
+        self.log_format = log_format  # "csv", "columnar" or "encoded", see landmark_log.LOG_SINKS
+        self.log_sink = None
+        # Long sessions: rotate into compressed segments (see segment_logging) when either limit is set
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.on_segment_closed = on_segment_closed  # Called with (path, manifest entry) for each finished segment
+        
+        # Per-stage latency instrumentation, None when disabled
+        self.metrics = StageMetrics() if metrics or metrics_port else None
+        self.metrics_port = metrics_port  # Serve JSON snapshots at http://127.0.0.1:<port>/metrics
+        
+        # Turns per-frame statuses into patient_event episodes, see event_engine.EventEngine.
+        # The caller owns it and closes it; it may outlive this detector
+        self.event_engine = event_engine
+        
+        # Shared-memory ring other processes read landmarks from (True, a bus name or a LandmarkBus)
+        if landmark_bus is True:
+            landmark_bus = DEFAULT_BUS_NAME
+        self.owns_landmark_bus = isinstance(landmark_bus, str)
+        self.landmark_bus = LandmarkBus(landmark_bus) if self.owns_landmark_bus else landmark_bus
+        
+        # Sequential loop only: capture, convert and draw into the same buffers every frame
+        self.reuse_buffers = reuse_buffers
+        self.frame_buffer = None
+        self.rgb_buffer = None
+        self.text_renderer = CachedTextRenderer() if reuse_buffers else None
         
     def _setup_logging(self, patient_id):
-        """Set up CSV logging for a specific patient"""
+        """Set up landmark logging for a specific patient"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{self.output_dir}/patient_{patient_id}_{timestamp}.csv"
-        
-        self.csv_file = open(filename, 'w', newline='')
-        fieldnames = ['timestamp', 'frame', 'landmark_name', 'landmark_id', 
-                      'x', 'y', 'z', 'visibility', 
-                      'movement_score', 'posture_status']
-        self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=fieldnames)
-        self.csv_writer.writeheader()
+        sink_class = LOG_SINKS[self.log_format]
+        filename = f"{self.output_dir}/patient_{patient_id}_{timestamp}{sink_class.extension}"
+        
+        if self.segment_seconds is not None or self.segment_bytes is not None:
+            directory = f"{self.output_dir}/patient_{patient_id}_{timestamp}"
+            sink_kwargs = {"key_landmarks": self.key_landmarks} if self.log_format == "csv" else {}
+            self.log_sink = RotatingLandmarkSink(directory, self.log_format, patient_id=patient_id,
+                                                 segment_seconds=self.segment_seconds,
+                                                 segment_bytes=self.segment_bytes,
+                                                 on_segment_closed=self.on_segment_closed, **sink_kwargs)
+            return directory
+        elif self.log_format == "csv":
+            self.log_sink = sink_class(filename, key_landmarks=self.key_landmarks)
+        else:
+            self.log_sink = sink_class(filename, patient_id=patient_id)
         return filename
         
     def start_camera(self):
@@ -83,41 +285,71 @@ class PostureMovementDetector:
                 raise ValueError("Error: Could not open any camera")
         
         # Set higher resolution if supported
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_size[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_size[1])
         
         print(f"Camera initialized: {int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))}x{int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))}")
+        
+        camera_fps = self.cap.get(cv2.CAP_PROP_FPS)
+        if self.tremor_analyzer is not None and camera_fps > 0:
+            self.tremor_analyzer = SlidingDFTTremorAnalyzer(
+                fps=camera_fps, visibility_threshold=self.landmark_visibility_threshold)
         return self.cap
     
-    def calculate_movement_score(self, landmark_name, current_position):
-        """Calculate a movement score based on landmark history"""
-        history = self.landmark_history[landmark_name]
-        
-        if len(history) < 2:
-            return 0.0
-        
-        # Calculate average movement over recent frames
-        movements = []
-        for i in range(1, min(10, len(history))):
-            dx = history[-i][0] - history[-i-1][0]
-            dy = history[-i][1] - history[-i-1][1]
-            dz = history[-i][2] - history[-i-1][2]
-            distance = np.sqrt(dx*dx + dy*dy + dz*dz)
-            movements.append(distance)
-        
-        avg_movement = np.mean(movements) if movements else 0
-        
-        # Update history
-        self.landmark_history[landmark_name].append(current_position)
-        # Maintain fixed history length
-        if len(self.landmark_history[landmark_name]) > self.max_history_length:
-            self.landmark_history[landmark_name].pop(0)
+    def start_source(self):
+        """Open video_path with the configured backend"""
+        self.source = open_frame_source(self.video_path, self.video_backend, stride=self.frame_stride)
+        print(f"Reading {self.video_path} with the {self.video_backend} backend at {self.source.fps:.1f} fps")
+        if self.tremor_analyzer is not None:
+            self.tremor_analyzer = SlidingDFTTremorAnalyzer(
+                fps=self.source.fps / self.frame_stride, visibility_threshold=self.landmark_visibility_threshold)
+        return self.source
+    
+    def reset_history(self):
+        """Forget all landmark history, e.g. when a new patient session starts"""
+        self.history_index = 0
+        self.history_count = 0
+        self.last_pose_results = None
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        if self.smoother is not None:
+            self.smoother.reset()
+        if self.tremor_analyzer is not None:
+            self.tremor_analyzer.reset()
+    
+    def calculate_movement_scores(self, current_landmarks):
+        """
+        Calculate movement scores for all landmarks at once from the ring buffer history.
+        current_landmarks is a (33, 4) array which is pushed into the history afterwards.
+        Returns a (33,) array with the average displacement over recent frames.
+        """
+        scores = np.zeros(NUM_LANDMARKS, dtype=np.float32)
+        window = min(self.movement_window, self.history_count)
+        
+        if window >= 2:
+            # Gather the most recent frames, newest first
+            order = (self.history_index - 1 - np.arange(window)) % self.max_history_length
+            recent = self.landmark_history[order]
             
-        return avg_movement
+            # Frame-to-frame displacement, only where the landmark was visible on both frames
+            steps = recent[:-1, :, :3] - recent[1:, :, :3]
+            distances = np.sqrt(np.einsum('ijk,ijk->ij', steps, steps))
+            visible = recent[:, :, 3] > self.landmark_visibility_threshold
+            valid = visible[:-1] & visible[1:]
+            counts = valid.sum(axis=0)
+            np.divide((distances * valid).sum(axis=0), counts, out=scores, where=counts > 0)
+        
+        # Update history, overwriting the oldest frame once the buffer is full
+        self.landmark_history[self.history_index] = current_landmarks
+        self.history_index = (self.history_index + 1) % self.max_history_length
+        self.history_count = min(self.history_count + 1, self.max_history_length)
+        
+        return scores
     
     def assess_posture(self, landmarks):
         """
         Basic posture assessment based on shoulder and hip alignment
+        landmarks are MediaPipe landmarks or a (33, 4) array of them
         Returns a dictionary with posture issues
         """
         posture_status = {"overall": "normal"}
@@ -127,14 +359,23 @@ class PostureMovementDetector:
                               "LEFT_HIP", "RIGHT_HIP", "NOSE", 
                               "LEFT_EAR", "RIGHT_EAR"]
         
+        is_array = isinstance(landmarks, np.ndarray)
+        
         landmark_coords = {}
         for name in required_landmarks:
             idx = self.key_landmarks[name]
-            if idx < len(landmarks) and landmarks[idx].visibility > self.landmark_visibility_threshold:
-                landmark_coords[name] = (landmarks[idx].x, landmarks[idx].y, landmarks[idx].z)
-            else:
-                # Not enough data for reliable posture assessment
-                return {"overall": "insufficient_data"}
+            if idx < len(landmarks):
+                if is_array:
+                    # Plain floats, scalar math on NumPy scalars is several times slower
+                    x, y, z, visibility = landmarks[idx].tolist()
+                else:
+                    landmark = landmarks[idx]
+                    x, y, z, visibility = landmark.x, landmark.y, landmark.z, landmark.visibility
+                if visibility > self.landmark_visibility_threshold:
+                    landmark_coords[name] = (x, y, z)
+                    continue
+            # Not enough data for reliable posture assessment
+            return {"overall": "insufficient_data"}
         
         # Shoulder alignment (check if shoulders are level)
         if abs(landmark_coords["LEFT_SHOULDER"][1] - landmark_coords["RIGHT_SHOULDER"][1]) > 0.05:
@@ -179,147 +420,510 @@ class PostureMovementDetector:
         
         return movement_status
     
-    def run_detection(self, patient_id, max_frames=None, display=True):
-        """Run the detection process"""
-        if self.cap is None:
+    def assess_posture_batch(self, landmarks):
+        """
+        Array form of assess_posture for (N, 33, 4) landmarks, for batches of frames;
+        assess_posture is faster on a single one.
+        Returns per-frame codes and check masks, see posture_rules.assess_posture_batch
+        """
+        return assess_posture_batch(landmarks, self.landmark_visibility_threshold)
+    
+    def detect_involuntary_movements_batch(self, movement_scores, landmarks):
+        """
+        Array form of detect_involuntary_movements for (N, 33) scores and (N, 33, 4) landmarks.
+        Returns per-frame codes and the per-landmark significant movement mask
+        """
+        return detect_involuntary_movements_batch(movement_scores, landmarks,
+                                                  self.landmark_visibility_threshold, self.movement_threshold)
+    
+    def _rule_params(self):
+        """The detector's thresholds as rule params, so both stay in sync"""
+        return {"visibility_threshold": self.landmark_visibility_threshold,
+                "movement_threshold": self.movement_threshold}
+    
+    def _stage_timer(self):
+        """A per-thread stage timer, or a no-op one when metrics are disabled"""
+        return self.metrics.timer() if self.metrics is not None else NULL_TIMER
+    
+    def _infer(self, frame_rgb, timer=NULL_TIMER):
+        """Pose results for one RGB frame and whether they were reused from an earlier frame"""
+        if self.motion_gate is not None:
+            # Without earlier results the frame is inferred anyway; the gate must not count it as reused
+            infer = self.motion_gate.should_infer(frame_rgb, force=self.last_pose_results is None)
+            timer.lap("motion_gate")
+            if not infer:
+                return self.last_pose_results, True
+        results = self.pose.process(frame_rgb)
+        if getattr(self.pose, 'patient_changed', False):
+            # Someone else is the patient now; their movement must not be scored against the last one's history
+            self.reset_history()
+        self.last_pose_results = results
+        timer.lap("inference")
+        return results, False
+    
+    def _extract_landmarks(self, results, timestamp):
+        """(raw, smoothed) (33, 4) landmark arrays of the detected pose, or (None, None)"""
+        if not results.pose_landmarks:
+            if self.smoother is not None:
+                self.smoother.reset()
+            return None, None
+        raw_landmarks = landmarks_to_array(results.pose_landmarks.landmark)
+        if self.smoother is not None:
+            return raw_landmarks, self.smoother.filter(raw_landmarks, timestamp)
+        return raw_landmarks, raw_landmarks
+    
+    def _analyze_frame(self, frame_rgb, frame_index, timestamp, timer=NULL_TIMER):
+        """Run pose estimation and posture/movement analysis on one RGB frame"""
+        results, reused = self._infer(frame_rgb, timer)
+        
+        # Process landmarks if detected
+        all_scores = None
+        movement_scores = {}
+        posture_status = {"overall": "no_detection"}
+        
+        raw_landmarks, landmarks_array = self._extract_landmarks(results, timestamp)
+        if landmarks_array is not None:
+            # Calculate movement scores for every landmark in one pass
+            all_scores = self.calculate_movement_scores(landmarks_array)
+            
+            # Keep the scores of visible key landmarks
+            for name, idx in self.key_landmarks.items():
+                if landmarks_array[idx, 3] > self.landmark_visibility_threshold:
+                    movement_scores[name] = float(all_scores[idx])
+            
+            if self.rules is not None:
+                # Every rule in one pass
+                posture, movement, fired = self.rules.evaluate(landmarks_array[None], all_scores[None],
+                                                           self._rule_params())
+                posture_status, movement_status = self.rules.status_dicts(posture, movement, fired)
+            else:
+                # Scalar checks: on a single frame they beat the batch forms by about 10x
+                # The MediaPipe objects are cheaper to read, unless smoothing moved the landmarks
+                unsmoothed = landmarks_array is raw_landmarks
+                posture_status = self.assess_posture(results.pose_landmarks.landmark if unsmoothed
+                                                     else landmarks_array)
+                movement_status = self.detect_involuntary_movements(movement_scores)
+        else:
+            movement_status = {"overall": "normal"}
+        
+        # Flag landmarks whose movement is concentrated in the tremor band
+        tremor = None
+        tremor_flags = self._update_tremor(raw_landmarks)
+        if tremor_flags is not None:
+            tremor = self.tremor_analyzer.report()
+            for name, flagged in zip(self.tremor_analyzer.landmark_names, tremor_flags):
+                if flagged:
+                    movement_status[name] = "tremor"
+                    movement_status["overall"] = "movements_detected"
+        timer.lap("scoring")
+        
+        return FrameResult(frame_index, timestamp, results.pose_landmarks, landmarks_array,
+                           movement_scores, all_scores, posture_status, movement_status, tremor, reused)
+    
+    def _update_tremor(self, raw_landmarks):
+        """Feed the tremor analyzer; its per-landmark flags once its window is full, else None"""
+        if self.tremor_analyzer is None:
+            return None
+        # Raw positions: the smoother would attenuate the tremor band
+        self.tremor_analyzer.update(raw_landmarks)
+        return self.tremor_analyzer.detect() if self.tremor_analyzer.ready else None
+    
+    def process_frame(self, frame, timestamp=None, frame_index=None, bgr=False):
+        """
+        Analyze one frame outside the capture loop, e.g. from a server or a job, and
+        hand the result to the configured log sink, event engine and landmark bus.
+        frame is RGB unless bgr=True. timestamp defaults to seconds since the first
+        frame and frame_index to the next frame number. Returns a FrameResult.
+        """
+        if self.start_time is None:
+            self.start_time = time.time()
+        if timestamp is None:
+            timestamp = time.time() - self.start_time
+        self.frame_count = self.frame_count + 1 if frame_index is None else frame_index
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if bgr else frame
+        result = self._analyze_frame(frame_rgb, self.frame_count, timestamp)
+        self._log_result(result)
+        return result
+    
+    def process_frames(self, frames, timestamps, frame_indices=None, bgr=False):
+        """
+        Analyze a batch of frames in order, e.g. a chunk of a recorded video. Pose
+        inference, smoothing and movement scoring run frame by frame since each frame
+        builds on the history of the previous ones; the posture and movement checks
+        then run once over the whole batch, no per-frame status dicts are built, and
+        the batch is logged in one go. frames is a sequence (or iterable) of RGB frames
+        (BGR if bgr=True) with one timestamp each. Returns a FrameBatch.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        count = len(timestamps)
+        if frame_indices is None:
+            frame_indices = np.arange(self.frame_count + 1, self.frame_count + 1 + count)
+        frame_indices = np.asarray(frame_indices)
+        
+        landmarks = np.full((count, NUM_LANDMARKS, LANDMARK_FIELDS), np.nan, dtype=np.float32)
+        scores = np.full((count, NUM_LANDMARKS), np.nan, dtype=np.float32)
+        reused = np.zeros(count, dtype=bool)
+        tremor = None
+        if self.tremor_analyzer is not None:
+            tremor = np.zeros((count, len(self.tremor_analyzer.landmark_names)), dtype=bool)
+        
+        processed = 0
+        for i, frame in zip(range(count), frames):
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if bgr else frame
+            results, reused[i] = self._infer(frame_rgb)
+            raw_landmarks, landmarks_array = self._extract_landmarks(results, timestamps[i])
+            if landmarks_array is not None:
+                landmarks[i] = landmarks_array
+                scores[i] = self.calculate_movement_scores(landmarks_array)
+            tremor_flags = self._update_tremor(raw_landmarks)
+            if tremor_flags is not None:
+                tremor[i] = tremor_flags
+            processed += 1
+        if processed < count:
+            raise ValueError(f"Got {processed} frames for {count} timestamps")
+        self.frame_count = int(frame_indices[-1]) if count else self.frame_count
+        
+        if self.rules is not None:
+            posture_codes, movement_codes, fired = self.rules.evaluate(landmarks, scores, self._rule_params())
+            posture_masks = movement_masks = fired
+        else:
+            posture_codes, posture_masks = self.assess_posture_batch(landmarks)
+            movement_codes, movement_masks = self.detect_involuntary_movements_batch(scores, landmarks)
+        if tremor is not None:
+            movement_codes[tremor.any(axis=1)] = MOVEMENT_CODES["movements_detected"]
+        
+        batch = FrameBatch(frame_indices, timestamps, landmarks, scores, posture_codes, movement_codes,
+                           posture_masks, movement_masks, reused, tremor, self.rules, self.key_landmarks,
+                           self.tremor_analyzer.landmark_names if tremor is not None else [])
+        self._log_batch(batch)
+        return batch
+    
+    def _log_result(self, result):
+        """Hand an analyzed frame to the log sink, the event engine and the landmark bus"""
+        if self.log_sink is not None:
+            self.log_sink.write(result)
+        if self.landmark_bus is not None:
+            self.landmark_bus.publish(result)
+        if self.event_engine is not None:
+            self.event_engine.update_from_result(result)
+    
+    def _log_batch(self, batch):
+        """_log_result for a FrameBatch: one block for the columnar log, per-frame results only where needed"""
+        needs_results = self.event_engine is not None or (
+            self.log_sink is not None and not hasattr(self.log_sink, 'write_records'))
+        if self.log_sink is not None and hasattr(self.log_sink, 'write_records'):
+            self.log_sink.write_records(batch.records())
+        if self.landmark_bus is not None:
+            for record in batch.records():
+                self.landmark_bus.publish_record(record)
+        if needs_results:
+            for i in range(len(batch)):
+                result = batch.frame_result(i, self.landmark_visibility_threshold)
+                if self.log_sink is not None and not hasattr(self.log_sink, 'write_records'):
+                    self.log_sink.write(result)
+                if self.event_engine is not None:
+                    self.event_engine.update_from_result(result)
+    
+    def _convert_frame(self, frame):
+        """BGR camera frame to RGB, into the reused buffer when reuse_buffers is on"""
+        if not self.reuse_buffers:
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.rgb_buffer is None or self.rgb_buffer.shape != frame.shape:
+            self.rgb_buffer = np.empty_like(frame)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb_buffer)
+    
+    def _put_text(self, image, text, org, color):
+        if self.text_renderer is not None:
+            self.text_renderer.draw(image, text, org, color)
+        else:
+            cv2.putText(image, text, org, cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2, cv2.LINE_AA)
+    
+    def _draw_overlay(self, frame, result, patient_id, in_place=False):
+        """Draw landmarks and status text. With in_place=True the frame itself is drawn on"""
+        overlay = frame if in_place else frame.copy()
+        
+        # Draw landmarks on frame
+        if result.pose_landmarks and self.mp_drawing is not None:
+            self.mp_drawing.draw_landmarks(
+                overlay, 
+                result.pose_landmarks,
+                self.mp_pose.POSE_CONNECTIONS,
+                landmark_drawing_spec=self.mp_drawing_styles.get_default_pose_landmarks_style()
+            )
+        
+        # Calculate FPS
+        current_time = time.time()
+        fps = 1 / (current_time - self.prev_time) if self.prev_time else 0
+        self.prev_time = current_time
+        
+        # Add text overlays
+        self._put_text(overlay, f'FPS: {int(fps)}', (10, 30), (0, 255, 0))
+        
+        self._put_text(overlay, f'Patient ID: {patient_id}', (10, 70), (0, 255, 0))
+        
+        self._put_text(overlay, f'Time: {result.timestamp:.1f}s', (10, 110), (0, 255, 0))
+        
+        # Show posture status
+        posture_status = result.posture_status
+        posture_text = f'Posture: {posture_status["overall"]}'
+        color = (0, 255, 0) if posture_status["overall"] == "normal" else (0, 0, 255)
+        self._put_text(overlay, posture_text, (10, 150), color)
+        
+        # Show movement status
+        movement_status = result.movement_status
+        movement_text = f'Movement: {movement_status["overall"]}'
+        color = (0, 255, 0) if movement_status["overall"] == "normal" else (0, 165, 255)
+        self._put_text(overlay, movement_text, (10, 190), color)
+        
+        return overlay
+    
+    def _render_result(self, frame, result, patient_id, in_place=False):
+        """Draw the overlay and show it. Returns False when 'q' is pressed"""
+        overlay = self._draw_overlay(frame, result, patient_id, in_place)
+        
+        # Display the annotated frame
+        cv2.imshow('Posture and Movement Analysis', overlay)
+        
+        # Exit on 'q' press
+        return not (cv2.waitKey(1) & 0xFF == ord('q'))
+    
+    def run_detection(self, patient_id, max_frames=None, display=True, pipelined=False, queue_size=2):
+        """
+        Run the detection process.
+        With pipelined=True capture, inference and rendering/logging run as separate
+        stages connected by bounded queues (see _run_pipelined). reuse_buffers only
+        applies to the sequential loop, since pipelined frames are in flight concurrently.
+        """
+        if self.video_path is not None:
+            if self.source is None:
+                self.start_source()
+        elif self.cap is None:
             self.start_camera()
         
-        if self.csv_file is None:
+        if self.log_sink is None:
             log_file = self._setup_logging(patient_id)
             print(f"Logging data to {log_file}")
         
+        if self.metrics_port and self.metrics.server is None:
+            self.metrics.serve(self.metrics_port)
+            print(f"Serving metrics at http://127.0.0.1:{self.metrics_port}/metrics")
+        
         self.start_time = time.time()
         self.frame_count = 0
+        self.dropped_frames = 0
         
         try:
+            if pipelined:
+                self._run_pipelined(patient_id, max_frames, display, queue_size)
+                return
+            
+            timer = self._stage_timer()
             while True:
                 # Check if we've reached the maximum number of frames
                 if max_frames is not None and self.frame_count >= max_frames:
                     break
                 
                 # Capture frame
-                ret, frame = self.cap.read()
-                if not ret:
-                    print("Error: Couldn't read frame.")
-                    break
-                
-                # Process the frame
-                self.frame_count += 1
-                current_time = time.time()
-                elapsed = current_time - self.start_time
-                
-                # Convert to RGB for MediaPipe
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # Process with MediaPipe
-                results = self.pose.process(frame_rgb)
-                
-                # Prepare overlay frame for visualization if displaying
-                if display:
-                    overlay = frame.copy()
-                
-                # Process landmarks if detected
-                movement_scores = {}
-                posture_status = {"overall": "no_detection"}
-                
-                if results.pose_landmarks:
-                    landmarks = results.pose_landmarks.landmark
-                    
-                    # Analyze posture
-                    posture_status = self.assess_posture(landmarks)
+                timer.mark()
+                if self.source is not None:
+                    # Video sources deliver RGB with the frame's own timestamp
+                    item = self.source.read()
+                    if item is None:
+                        print("End of video.")
+                        break
+                    frame_rgb, elapsed, _ = item
+                    frame = None
+                    timer.lap("capture")
+                    self.frame_count += 1
+                else:
+                    if self.reuse_buffers:
+                        ret, frame = self.cap.read(self.frame_buffer)
+                    else:
+                        ret, frame = self.cap.read()
+                    if not ret:
+                        print("Error: Couldn't read frame.")
+                        break
+                    self.frame_buffer = frame if self.reuse_buffers else None
+                    timer.lap("capture")
                     
-                    # Process each key landmark
-                    for name, idx in self.key_landmarks.items():
-                        if idx < len(landmarks) and landmarks[idx].visibility > self.landmark_visibility_threshold:
-                            lm = landmarks[idx]
-                            current_pos = (lm.x, lm.y, lm.z)
-                            
-                            # Calculate movement score
-                            movement_score = self.calculate_movement_score(name, current_pos)
-                            movement_scores[name] = movement_score
-                            
-                            # Log to CSV
-                            if self.csv_writer:
-                                self.csv_writer.writerow({
-                                    'timestamp': elapsed,
-                                    'frame': self.frame_count,
-                                    'landmark_name': name,
-                                    'landmark_id': idx,
-                                    'x': lm.x,
-                                    'y': lm.y,
-                                    'z': lm.z,
-                                    'visibility': lm.visibility,
-                                    'movement_score': movement_score,
-                                    'posture_status': posture_status.get("overall", "unknown")
-                                })
+                    # Process the frame
+                    self.frame_count += 1
+                    elapsed = time.time() - self.start_time
                     
-                    # Draw landmarks on frame if displaying
-                    if display:
-                        self.mp_drawing.draw_landmarks(
-                            overlay, 
-                            results.pose_landmarks,
-                            self.mp_pose.POSE_CONNECTIONS,
-                            landmark_drawing_spec=self.mp_drawing_styles.get_default_pose_landmarks_style()
-                        )
+                    # Convert to RGB for MediaPipe
+                    frame_rgb = self._convert_frame(frame)
+                    timer.lap("convert")
                 
-                # Detect involuntary movements
-                movement_status = self.detect_involuntary_movements(movement_scores)
+                # Process with MediaPipe and analyze
+                result = self._analyze_frame(frame_rgb, self.frame_count, elapsed, timer)
+                
+                # Log landmarks
+                self._log_result(result)
+                timer.lap("logging")
                 
                 # Display information on frame if showing display
                 if display:
-                    # Calculate FPS
-                    fps = 1 / (current_time - self.prev_time) if self.prev_time else 0
-                    self.prev_time = current_time
-                    
-                    # Add text overlays
-                    cv2.putText(overlay, f'FPS: {int(fps)}', (10, 30), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-                    
-                    cv2.putText(overlay, f'Patient ID: {patient_id}', (10, 70), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-                    
-                    cv2.putText(overlay, f'Time: {elapsed:.1f}s', (10, 110), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-                    
-                    # Show posture status
-                    posture_text = f'Posture: {posture_status["overall"]}'
-                    color = (0, 255, 0) if posture_status["overall"] == "normal" else (0, 0, 255)
-                    cv2.putText(overlay, posture_text, (10, 150), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2, cv2.LINE_AA)
-                    
-                    # Show movement status
-                    movement_text = f'Movement: {movement_status["overall"]}'
-                    color = (0, 255, 0) if movement_status["overall"] == "normal" else (0, 165, 255)
-                    cv2.putText(overlay, movement_text, (10, 190), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2, cv2.LINE_AA)
-                    
-                    # Display the annotated frame
-                    cv2.imshow('Posture and Movement Analysis', overlay)
-                    
-                    # Exit on 'q' press
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                    # The raw frame is not needed after this point, so draw on it directly
+                    if frame is None:
+                        frame = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+                    keep_running = self._render_result(frame, result, patient_id,
+                                                       in_place=self.reuse_buffers or self.source is not None)
+                    timer.lap("render")
+                    if not keep_running:
                         break
         
         finally:
             # Clean up
-            if self.csv_file:
-                self.csv_file.close()
-                self.csv_file = None
-                self.csv_writer = None
+            if self.log_sink is not None:
+                self.log_sink.close()
+                self.log_sink = None
             
-            print(f"Processed {self.frame_count} frames in {time.time() - self.start_time:.2f} seconds")
+            elapsed = time.time() - self.start_time
+            if self.metrics is not None:
+                print(self.metrics.format_summary(self.frame_count, elapsed))
+            else:
+                print(f"Processed {self.frame_count} frames in {elapsed:.2f} seconds")
+            if self.dropped_frames:
+                print(f"Dropped {self.dropped_frames} stale frames")
+            if self.motion_gate is not None and self.motion_gate.frames_reused:
+                print(f"Reused landmarks on {self.motion_gate.frames_reused} static frames "
+                      f"({self.motion_gate.reuse_fraction:.0%})")
+            if isinstance(self.pose, PatientPoseEstimator):
+                print(f"Patient tracked in {self.pose.patient_frames} frames with {self.pose.mean_people:.1f} "
+                      f"people in view on average, {self.pose.patient_switches} patient switches")
+    
+    def _run_pipelined(self, patient_id, max_frames, display, queue_size):
+        """
+        Pipelined detection loop: a capture thread and an inference thread feed the
+        render/log stage on the calling thread (cv2.imshow must stay on it).
+        The capture queue drops the oldest camera frame when full so inference always works
+        on the freshest frame, while video frames wait for room so none is skipped; the
+        result queue blocks so every analyzed frame is logged.
+        """
+        frame_queue = queue.Queue(maxsize=queue_size)
+        result_queue = queue.Queue(maxsize=queue_size)
+        stop_event = threading.Event()
+        
+        def put_waiting(item):
+            while not stop_event.is_set():
+                try:
+                    frame_queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+        
+        def capture_worker():
+            timer = self._stage_timer()
+            while not stop_event.is_set():
+                timer.mark()
+                if self.source is not None:
+                    item = self.source.read()
+                    if item is None:
+                        print("End of video.")
+                        break
+                    frame_rgb, timestamp, _ = item
+                    timer.lap("capture")
+                    put_waiting((None, frame_rgb, timestamp))
+                    continue
+                ret, frame = self.cap.read()
+                if not ret:
+                    print("Error: Couldn't read frame.")
+                    break
+                timer.lap("capture")
+                if _put_latest(frame_queue, (frame, None, time.time() - self.start_time)):
+                    self.dropped_frames += 1
+            # The end marker must always arrive or the inference worker waits on get() forever.
+            # A video waits for room so no frame is lost, unless the loop is stopping anyway,
+            # in which case a queued frame is evicted like with the camera
+            if self.source is not None:
+                put_waiting(None)
+            if self.source is None or stop_event.is_set():
+                _put_latest(frame_queue, None)
+        
+        def inference_worker():
+            timer = self._stage_timer()
+            frame_index = 0
+            while not stop_event.is_set():
+                item = frame_queue.get()
+                if item is None:
+                    break
+                frame, frame_rgb, elapsed = item
+                frame_index += 1
+                
+                timer.mark()
+                if frame_rgb is None:
+                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    timer.lap("convert")
+                elif display:
+                    frame = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+                    timer.lap("convert")
+                result = self._analyze_frame(frame_rgb, frame_index, elapsed, timer)
+                result_queue.put((frame, result))
+                
+                if max_frames is not None and frame_index >= max_frames:
+                    break
+            stop_event.set()
+            result_queue.put(None)
+        
+        workers = [threading.Thread(target=capture_worker, daemon=True),
+                   threading.Thread(target=inference_worker, daemon=True)]
+        for worker in workers:
+            worker.start()
+        
+        timer = self._stage_timer()
+        try:
+            while True:
+                item = result_queue.get()
+                if item is None:
+                    break
+                frame, result = item
+                self.frame_count = result.frame_index
+                
+                timer.mark()
+                self._log_result(result)
+                timer.lap("logging")
+                
+                if display:
+                    keep_running = self._render_result(frame, result, patient_id)
+                    timer.lap("render")
+                    if not keep_running:
+                        break
+        finally:
+            stop_event.set()
+            # Unblock the inference worker if it is waiting on a full result queue
+            while workers[1].is_alive():
+                try:
+                    result_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            for worker in workers:
+                worker.join()
     
     def cleanup(self):
         """Release resources"""
         if self.cap is not None:
             self.cap.release()
+        if self.source is not None:
+            self.source.close()
+            self.source = None
         cv2.destroyAllWindows()
-        if self.csv_file is not None:
-            self.csv_file.close()
+        if self.log_sink is not None:
+            self.log_sink.close()
+            self.log_sink = None
+        if self.landmark_bus is not None and self.owns_landmark_bus:
+            self.landmark_bus.close()
+            self.landmark_bus = None
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.pooled_pose is not None:
+            # Reset for the next patient and hand back to the pool
+            self.pose_pool.release(self.pooled_pose)
+            self.pooled_pose = None
 
 
 # Usage example
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     detector = PostureMovementDetector(camera_index=1)  # Default is 0
     
     try:
@@ -1,4 +1,6 @@
 import argparse
+import os
+import sys
 import cv2
 import mediapipe as mp
 import torch
@@ -8,6 +10,13 @@ import run_unik
 
 from run_unik import Processor, get_parser, init_seed
 
+# Shared landmark utilities live in Back-End
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from landmark_smoothing import SMOOTHERS, make_smoother
+from landmark_bus import LandmarkBusReader
+from video_sources import FRAME_SOURCES, open_frame_source
+from pose_pool import PoseEstimatorPool
+
 def load_model(weights_path, device):
     model = UNIK()  
     model.load_state_dict(torch.load(weights_path, map_location=device))
@@ -15,55 +24,121 @@ def load_model(weights_path, device):
     model.eval()
     return model
 
-def mediapipe_landmarks(frame, pose):
-    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+def mediapipe_landmarks(frame, pose, smoother=None, timestamp=None, is_rgb=False):
+    image_rgb = frame if is_rgb else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     results = pose.process(image_rgb)
     if results.pose_landmarks:
         landmarks = results.pose_landmarks.landmark
         coords = []
         for lm in landmarks:
             coords.extend([lm.x, lm.y, lm.z, lm.visibility])
-        return np.array(coords, dtype=np.float32)
+        coords = np.array(coords, dtype=np.float32)
+        if smoother is not None:
+            # Filter in place on the (33, 4) view of the flat vector
+            smoother.filter(coords.reshape(-1, 4), timestamp, out=coords.reshape(-1, 4))
+        return coords
     else:
+        if smoother is not None:
+            smoother.reset()
         return None
 
-def run_live_classification(args):
+def unik_pose_pool(size=1, max_size=None):
+    """Pool of the Pose settings live classification uses; build it once when classifying repeatedly"""
+    return PoseEstimatorPool(size=size, max_size=max_size, factory=lambda: mp.solutions.pose.Pose(
+        static_image_mode=False, min_detection_confidence=0.5))
+
+def run_live_classification(args, pose_pool=None):
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     model = load_model(args.weights, device)
 
-    mp_pose = mp.solutions.pose
-    pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5)
+    smoother = make_smoother(args.smoothing) if args.smoothing else None
 
+    source = None
+    cap = None
     if args.video_path:
-        cap = cv2.VideoCapture(args.video_path)
+        # Video files and streams go through video_sources, which hands over RGB frames
+        try:
+            source = open_frame_source(args.video_path, args.video_backend, stride=args.frame_stride)
+        except (ValueError, OSError):
+            print("Error: Could not open video source.")
+            return
     else:
         cap = cv2.VideoCapture(0)  # Default webcam
+        if not cap.isOpened():
+            print("Error: Could not open video source.")
+            return
 
-    if not cap.isOpened():
-        print("Error: Could not open video source.")
-        return
+    owns_pool = pose_pool is None
+    if owns_pool:
+        pose_pool = unik_pose_pool()
+    try:
+        # The session hands the pose back, reset for the next one, even on errors or Ctrl+C
+        with pose_pool.session() as pose:
+            while True:
+                if source is not None:
+                    item = source.read()
+                    if item is None:
+                        break
+                    frame_rgb, timestamp, _ = item
+                    landmarks = mediapipe_landmarks(frame_rgb, pose, smoother, timestamp, is_rgb=True)
+                    frame = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+                else:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                    landmarks = mediapipe_landmarks(frame, pose, smoother, timestamp)
+                if landmarks is not None:
+                    input_tensor = torch.tensor(landmarks).unsqueeze(0).to(device)
+                    with torch.no_grad():
+                        output = model(input_tensor)
+                        pred = torch.argmax(output, dim=1).item()
+                    cv2.putText(frame, f'Class: {pred}', (30, 30),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+                cv2.imshow('UNIK Model Classification', frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+    finally:
+        if source is not None:
+            source.close()
+        else:
+            cap.release()
+        cv2.destroyAllWindows()
+        if owns_pool:
+            pose_pool.close()
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+def run_bus_classification(args):
+    """Classify landmarks published by a running detector instead of running a second pose estimator"""
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = load_model(args.weights, device)
+    smoother = make_smoother(args.smoothing) if args.smoothing else None
 
-        landmarks = mediapipe_landmarks(frame, pose)
-        if landmarks is not None:
-            input_tensor = torch.tensor(landmarks).unsqueeze(0).to(device)
+    reader = LandmarkBusReader(args.landmark_bus)
+    coords = np.empty(33 * 4, dtype=np.float32)
+    last_pred = None
+    try:
+        for record in reader:
+            if np.isnan(record['landmarks'][0, 3]):
+                # Nobody detected in this frame
+                if smoother is not None:
+                    smoother.reset()
+                continue
+            coords.reshape(-1, 4)[:] = record['landmarks']
+            if smoother is not None:
+                smoother.filter(coords.reshape(-1, 4), float(record['timestamp']), out=coords.reshape(-1, 4))
+            input_tensor = torch.from_numpy(coords).unsqueeze(0).to(device)
             with torch.no_grad():
                 output = model(input_tensor)
                 pred = torch.argmax(output, dim=1).item()
-            cv2.putText(frame, f'Class: {pred}', (30, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-        cv2.imshow('UNIK Model Classification', frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-    pose.close()
+            if pred != last_pred:
+                print(f"frame {int(record['frame'])} t={float(record['timestamp']):.2f}s class: {pred}")
+                last_pred = pred
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Read {reader.frames_read} frames from the landmark bus, {reader.frames_dropped} dropped")
+        reader.close()
 
 def start_run_unik():
     parser = get_parser()
@@ -77,6 +152,13 @@ if __name__ == "__main__":
     parser.add_argument('--weights', type=str, help='Path to trained UNIK model weights for live classification')
     parser.add_argument('--video_path', type=str, default=None, help='Path to video file. If not set, webcam is used.')
     parser.add_argument('--run_unik', action='store_true', help='Run the run_unik processor')
+    parser.add_argument('--smoothing', type=str, default=None, choices=list(SMOOTHERS),
+                        help='Filter landmark jitter before classification')
+    parser.add_argument('--video_backend', type=str, default='opencv', choices=list(FRAME_SOURCES),
+                        help='Decoder for --video_path; pyav decodes on FFmpeg threads straight to RGB')
+    parser.add_argument('--frame_stride', type=int, default=1, help='Classify every n-th frame of --video_path')
+    parser.add_argument('--landmark_bus', type=str, default=None,
+                        help='Read landmarks from the shared-memory bus of a running detector (e.g. pim_landmarks)')
     args = parser.parse_args()
 
     if args.run_unik:
@@ -84,5 +166,7 @@ if __name__ == "__main__":
     else:
         if not args.weights:
             print("Error: --weights argument is required for live classification mode.")
+        elif args.landmark_bus:
+            run_bus_classification(args)
         else:
             run_live_classification(args)
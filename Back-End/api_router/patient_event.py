@@ -77,6 +77,25 @@ def create_event(event: PatientEventBase):
         logger.error(f"Error creating event: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post('/batch')
+def create_events(events: list[PatientEventBase]):
+    # One insert per batch; the detector's event engine sends one row per episode
+    if not events:
+        return []
+    try:
+        response = (
+            supabase
+            .table('patient_event')
+            .insert([event.model_dump() for event in events])
+            .execute()
+        )
+        if not response.data:
+            raise HTTPException(status_code=400, detail="Failed to create events")
+        return response.data
+    except Exception as e:
+        logger.error(f"Error creating events: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.patch('/{event_id}/status')
 def update_event_status(event_id: str, status_update: StatusUpdate):
     try:
@@ -0,0 +1,255 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PostureMovementDetector import PostureMovementDetector
+from tremor_analysis import SlidingDFTTremorAnalyzer
+from landmark_smoothing import make_smoother
+from rule_engine import RuleSet
+from landmark_codec import LandmarkEncoder, LandmarkDecoder
+from person_tracking import PatientPoseEstimator
+from synthetic_landmarks import generate_landmarks, to_pose_result, FakePoseEstimator, FakeMultiPoseEstimator
+
+# Stand-in image for the fake pose estimator; its content is never looked at
+DUMMY_IMAGE = np.zeros((8, 8, 3), dtype=np.uint8)
+# Camera-sized frame for the conversion and overlay components
+CAMERA_FRAME = np.random.default_rng(0).integers(0, 256, size=(720, 1280, 3), dtype=np.uint8)
+
+
+def _detector(frames):
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(frames))
+    return detector
+
+
+def bench_movement_scores(frames):
+    detector = _detector(frames)
+    return lambda i: detector.calculate_movement_scores(frames[i])
+
+
+def bench_assess_posture(frames):
+    detector = _detector(frames)
+    results = [to_pose_result(frame) for frame in frames]
+    landmarks = [r.pose_landmarks.landmark if r.pose_landmarks else [] for r in results]
+    return lambda i: detector.assess_posture(landmarks[i]) if landmarks[i] else None
+
+
+def bench_detect_movements(frames):
+    detector = _detector(frames)
+    scores = []
+    for frame in frames:
+        all_scores = detector.calculate_movement_scores(frame)
+        scores.append({name: float(all_scores[idx]) for name, idx in detector.key_landmarks.items()})
+    return lambda i: detector.detect_involuntary_movements(scores[i])
+
+
+def bench_posture_batch(frames):
+    detector = _detector(frames)
+    return lambda i: detector.assess_posture_batch(frames[i:i + 1])
+
+
+def bench_movement_batch(frames):
+    detector = _detector(frames)
+    scores = np.array([detector.calculate_movement_scores(frame) for frame in frames])
+    return lambda i: detector.detect_involuntary_movements_batch(scores[i:i + 1], frames[i:i + 1])
+
+
+def bench_rule_engine(frames):
+    detector = _detector(frames)
+    rules = RuleSet.from_file()
+    scores = np.array([detector.calculate_movement_scores(frame) for frame in frames])
+    return lambda i: rules.evaluate(frames[i:i + 1], scores[i:i + 1])
+
+
+def bench_landmark_codec(frames, block_frames=30):
+    """Encode and decode blocks of block_frames, charged to the frame that starts each block"""
+    encoder = LandmarkEncoder()
+    decoder = LandmarkDecoder()
+
+    def step(i):
+        if i % block_frames == 0:
+            decoder.decode(encoder.encode(frames[i:i + block_frames]))
+    return step
+
+
+def bench_tremor_update(frames):
+    analyzer = SlidingDFTTremorAnalyzer()
+
+    def step(i):
+        analyzer.update(frames[i])
+        analyzer.detect()
+    return step
+
+
+def bench_smoothing(frames, name):
+    smoother = make_smoother(name)
+    out = np.empty_like(frames[0])
+    return lambda i: smoother.filter(frames[i], i / 30.0, out=out)
+
+
+def bench_analyze_frame(frames):
+    detector = _detector(frames)
+    return lambda i: detector.process_frame(DUMMY_IMAGE, i / 30.0, i + 1)
+
+
+def bench_process_frames(frames, batch_frames=32):
+    """process_frames over batches of batch_frames, charged to the frame that starts each batch"""
+    detector = _detector(frames)
+    images = [DUMMY_IMAGE] * batch_frames
+    timestamps = np.arange(len(frames) + batch_frames) / 30.0
+
+    def step(i):
+        if i % batch_frames == 0:
+            detector.process_frames(images, timestamps[i:i + batch_frames])
+    return step
+
+
+def bench_person_tracking(frames, bystanders=2):
+    estimator = PatientPoseEstimator(FakeMultiPoseEstimator(frames, bystanders=bystanders))
+    return lambda i: estimator.process(DUMMY_IMAGE)
+
+
+def _frame_results(frames):
+    detector = _detector(frames)
+    return [detector.process_frame(DUMMY_IMAGE, i / 30.0, i + 1) for i in range(len(frames))]
+
+
+def bench_convert_frame(frames, reuse_buffers=False):
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(frames[:1]), reuse_buffers=reuse_buffers)
+    return lambda i: detector._convert_frame(CAMERA_FRAME)
+
+
+def bench_draw_overlay(frames, reuse_buffers=False):
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(frames[:1]), reuse_buffers=reuse_buffers)
+    results = _frame_results(frames)
+    canvas = CAMERA_FRAME.copy()
+    return lambda i: detector._draw_overlay(canvas, results[i], "bench", in_place=reuse_buffers)
+
+
+COMPONENTS = {
+    "movement_scores": bench_movement_scores,
+    "assess_posture": bench_assess_posture,
+    "detect_involuntary_movements": bench_detect_movements,
+    "assess_posture_batch": bench_posture_batch,
+    "detect_involuntary_movements_batch": bench_movement_batch,
+    "rule_engine": bench_rule_engine,
+    "landmark_codec": bench_landmark_codec,
+    "tremor_update": bench_tremor_update,
+    "smoothing_one_euro": lambda frames: bench_smoothing(frames, "one_euro"),
+    "smoothing_kalman": lambda frames: bench_smoothing(frames, "kalman"),
+    "analyze_frame": bench_analyze_frame,
+    "process_frames": bench_process_frames,
+    "person_tracking": bench_person_tracking,
+    "convert_frame": bench_convert_frame,
+    "convert_frame_reuse": lambda frames: bench_convert_frame(frames, reuse_buffers=True),
+    "draw_overlay": bench_draw_overlay,
+    "draw_overlay_reuse": lambda frames: bench_draw_overlay(frames, reuse_buffers=True),
+}
+
+
+def run_component(setup, frames, alloc_frames):
+    """Time one component over every frame, then measure its allocations on a shorter run"""
+    num_frames = len(frames)
+
+    step = setup(frames)
+    gc_before = sum(stat['collections'] for stat in gc.get_stats())
+    start = time.perf_counter()
+    for i in range(num_frames):
+        step(i)
+    elapsed = time.perf_counter() - start
+    gc_collections = sum(stat['collections'] for stat in gc.get_stats()) - gc_before
+
+    # Fresh state so the allocation pass sees the same warm-up as the timing pass
+    step = setup(frames)
+    alloc_frames = min(alloc_frames, num_frames)
+    transient = 0
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    for i in range(alloc_frames):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step(i)
+        _, peak = tracemalloc.get_traced_memory()
+        transient += peak - before
+    blocks_after = sys.getallocatedblocks()
+    tracemalloc.stop()
+
+    return {
+        "fps": num_frames / elapsed,
+        "us_per_frame": elapsed * 1e6 / num_frames,
+        "alloc_bytes_per_frame": transient / alloc_frames,
+        "net_blocks_per_frame": (blocks_after - blocks_before) / alloc_frames,
+        "gc_collections": gc_collections
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print the speed ratio of every component against a previous results file"""
+    print(f"\nCompared with {baseline.get('commit')}:")
+    for name, current in results["components"].items():
+        previous = baseline.get("components", {}).get(name)
+        if previous is None:
+            print(f"{name:<30} new")
+            continue
+        ratio = current["us_per_frame"] / previous["us_per_frame"]
+        print(f"{name:<30}{previous['us_per_frame']:>10.2f} us -> {current['us_per_frame']:>8.2f} us  ({ratio:.2f}x time)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the detector analysis path on synthetic landmarks')
+    parser.add_argument('--frames', type=int, default=3000, help='Synthetic frames per component')
+    parser.add_argument('--alloc_frames', type=int, default=300, help='Frames traced for allocation counts')
+    parser.add_argument('--noise', type=float, default=0.002, help='Landmark jitter (normalized units)')
+    parser.add_argument('--tremor_hz', type=float, default=5.0, help='Tremor frequency on the wrists')
+    parser.add_argument('--tremor_amplitude', type=float, default=0.01, help='Tremor amplitude')
+    parser.add_argument('--shift_amplitude', type=float, default=0.06, help='Postural shift of one shoulder and hip')
+    parser.add_argument('--dropout', type=float, default=0.02, help='Share of frames without a detection')
+    parser.add_argument('--components', nargs='*', default=list(COMPONENTS), help='Subset of components to run')
+    parser.add_argument('--output', type=str, default='bench_results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', type=str, default=None, help='Previous results file to compare against')
+    args = parser.parse_args()
+
+    frames = generate_landmarks(args.frames, noise=args.noise, tremor_hz=args.tremor_hz,
+                                tremor_amplitude=args.tremor_amplitude,
+                                shift_amplitude=args.shift_amplitude, dropout=args.dropout)
+
+    results = {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "config": vars(args),
+        "components": {}
+    }
+    for name in args.components:
+        stats = run_component(COMPONENTS[name], frames, args.alloc_frames)
+        results["components"][name] = stats
+        print(f"{name:<30}{stats['fps']:>12.0f} fps{stats['us_per_frame']:>10.2f} us/frame"
+              f"{stats['alloc_bytes_per_frame']:>10.0f} B/frame")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
@@ -0,0 +1,144 @@
+import numpy as np
+
+# Rough upright MediaPipe Pose skeleton in normalized image coordinates (x, y)
+TEMPLATE_POSE = np.array([
+    (0.500, 0.200),  # 0 nose
+    (0.510, 0.190), (0.520, 0.190), (0.530, 0.190),  # 1-3 left eye inner, eye, outer
+    (0.490, 0.190), (0.480, 0.190), (0.470, 0.190),  # 4-6 right eye inner, eye, outer
+    (0.540, 0.200), (0.460, 0.200),  # 7-8 ears
+    (0.510, 0.230), (0.490, 0.230),  # 9-10 mouth
+    (0.580, 0.300), (0.420, 0.300),  # 11-12 shoulders
+    (0.620, 0.420), (0.380, 0.420),  # 13-14 elbows
+    (0.630, 0.530), (0.370, 0.530),  # 15-16 wrists
+    (0.635, 0.560), (0.365, 0.560),  # 17-18 pinkies
+    (0.630, 0.565), (0.370, 0.565),  # 19-20 index fingers
+    (0.625, 0.550), (0.375, 0.550),  # 21-22 thumbs
+    (0.550, 0.550), (0.450, 0.550),  # 23-24 hips
+    (0.550, 0.720), (0.450, 0.720),  # 25-26 knees
+    (0.550, 0.880), (0.450, 0.880),  # 27-28 ankles
+    (0.550, 0.900), (0.450, 0.900),  # 29-30 heels
+    (0.560, 0.920), (0.440, 0.920),  # 31-32 foot index
+], dtype=np.float32)
+
+
+def generate_landmarks(num_frames, fps=30.0, noise=0.002, tremor_hz=5.0, tremor_amplitude=0.01,
+                       tremor_landmarks=(15, 16), shift_interval=5.0, shift_amplitude=0.06,
+                       visibility=0.95, dropout=0.0, seed=0):
+    """
+    Synthetic (num_frames, 33, 4) landmark stream: the template pose plus Gaussian jitter,
+    a sinusoidal tremor on tremor_landmarks and a postural shift (one shoulder and hip
+    dropping) that ramps in and out every shift_interval seconds. dropout is the share
+    of frames where all visibilities are zero, as when tracking is lost.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_frames) / fps
+
+    frames = np.empty((num_frames, len(TEMPLATE_POSE), 4), dtype=np.float32)
+    frames[:, :, :2] = TEMPLATE_POSE
+    frames[:, :, 2] = -0.1
+    frames[:, :, :3] += rng.normal(0.0, noise, size=(num_frames, len(TEMPLATE_POSE), 3))
+    frames[:, :, 3] = visibility
+
+    if tremor_amplitude:
+        wave = tremor_amplitude * np.sin(2 * np.pi * tremor_hz * t)
+        for idx in tremor_landmarks:
+            frames[:, idx, 0] += wave
+            frames[:, idx, 1] += 0.5 * wave
+
+    if shift_amplitude and shift_interval:
+        # Triangle wave between 0 and 1 with the shift fully present half of every period
+        phase = (t / shift_interval) % 2.0
+        ramp = np.clip(np.minimum(phase, 2.0 - phase) * 2.0 - 0.5, 0.0, 1.0)
+        frames[:, [11, 23], 1] += (shift_amplitude * ramp)[:, None]
+
+    if dropout:
+        lost = rng.random(num_frames) < dropout
+        frames[lost, :, 3] = 0.0
+
+    return frames
+
+
+class FakeLandmark:
+    """Mimics a MediaPipe NormalizedLandmark"""
+
+    __slots__ = ('x', 'y', 'z', 'visibility')
+
+    def __init__(self, x, y, z, visibility):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.visibility = visibility
+
+
+class FakeLandmarkList:
+    __slots__ = ('landmark',)
+
+    def __init__(self, landmark):
+        self.landmark = landmark
+
+
+class FakePoseResult:
+    __slots__ = ('pose_landmarks',)
+
+    def __init__(self, pose_landmarks):
+        self.pose_landmarks = pose_landmarks
+
+
+def to_pose_result(frame):
+    """Wrap one (33, 4) frame like the object returned by Pose.process"""
+    if not np.any(frame[:, 3] > 0):
+        return FakePoseResult(None)
+    return FakePoseResult(FakeLandmarkList([FakeLandmark(*map(float, row)) for row in frame]))
+
+
+class FakePoseEstimator:
+    """Replays prebuilt results from process() in a loop, ignoring the image"""
+
+    def __init__(self, frames):
+        self.results = [to_pose_result(frame) for frame in frames]
+        self.position = 0
+
+    def process(self, image):
+        result = self.results[self.position]
+        self.position = (self.position + 1) % len(self.results)
+        return result
+
+    def close(self):
+        pass
+
+
+def lying_pose(frames):
+    """Turn upright frames a quarter turn, so the person lies across the image like a patient on a stretcher"""
+    out = frames.copy()
+    out[..., 0] = 0.1 + (frames[..., 1] - 0.1) * 0.9
+    out[..., 1] = 0.62 + (frames[..., 0] - 0.5)
+    return out
+
+
+class FakeMultiPoseEstimator:
+    """
+    Multi-person stand-in for person tracking benchmarks: process_all() returns the
+    patient (frames turned to lie down) plus bystanders standing up and walking slowly
+    across the image, in a shuffled order.
+    """
+
+    def __init__(self, frames, bystanders=2, fps=30.0, seed=0):
+        self.patient = lying_pose(frames)
+        self.rng = np.random.default_rng(seed)
+        self.bystanders = []
+        for k in range(bystanders):
+            pose = generate_landmarks(len(frames), fps=fps, tremor_amplitude=0.0, shift_amplitude=0.0, seed=seed + k + 1)
+            # Each bystander walks back and forth over a different stretch of the image
+            t = np.arange(len(frames)) / fps
+            pose[:, :, 0] += (0.3 * np.sin(2 * np.pi * t / 20.0 + k) + 0.25 * (k % 2 * 2 - 1))[:, None]
+            self.bystanders.append(pose)
+        self.position = 0
+
+    def process_all(self, image):
+        i = self.position
+        self.position = (self.position + 1) % len(self.patient)
+        poses = [self.patient[i]] + [pose[i] for pose in self.bystanders]
+        return [poses[j] for j in self.rng.permutation(len(poses))]
+
+    def close(self):
+        pass
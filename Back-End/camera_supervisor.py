@@ -0,0 +1,286 @@
+import argparse
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from landmark_log import LOG_SINKS
+
+logger = logging.getLogger(__name__)
+
+
+class SharedFrameRing:
+    """A fixed number of BGR frame slots in one shared memory block"""
+
+    def __init__(self, shape, slots, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=frame_bytes * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def frame(self, slot):
+        return self.frames[slot]
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _detector_worker(stream_id, patient_id, ring_name, shape, slots, ready_queue, free_queue,
+                     result_queue, detector_kwargs):
+    """Worker process: analyze frames from the shared ring and report compact results"""
+    from PostureMovementDetector import PostureMovementDetector
+
+    ring = SharedFrameRing(shape, slots, name=ring_name)
+    detector = PostureMovementDetector(**detector_kwargs)
+    log_file = detector._setup_logging(patient_id)
+    print(f"[stream {stream_id}] Logging data to {log_file}")
+
+    try:
+        while True:
+            item = ready_queue.get()
+            if item is None:
+                break
+            slot, frame_index, timestamp = item
+
+            # The colour conversion copies the frame out, so the slot can be reused right away
+            frame_rgb = cv2.cvtColor(ring.frame(slot), cv2.COLOR_BGR2RGB)
+            free_queue.put(slot)
+
+            result = detector.process_frame(frame_rgb, timestamp, frame_index)
+            result_queue.put((stream_id, frame_index, timestamp,
+                              result.posture_status, result.movement_status, result.movement_scores))
+    finally:
+        # Flushes the log and pending events and releases the pose estimator, bus and metrics server
+        detector.cleanup()
+        ring.close()
+
+
+class _Stream:
+    """Supervisor-side state for one camera or stream URL"""
+
+    def __init__(self, stream_id, source, patient_id):
+        self.stream_id = stream_id
+        self.source = source
+        self.patient_id = patient_id
+        self.cap = None
+        self.ring = None
+        self.process = None
+        self.capture_thread = None
+        self.ready_queue = None
+        self.free_queue = None
+        self.frames_sent = 0
+        self.frames_done = 0
+        self.frames_dropped = 0
+        self.done_times = deque(maxlen=60)
+        self.latest = None
+
+
+class CameraSupervisor:
+    """
+    Runs one PostureMovementDetector per camera index or stream URL, each in its own
+    worker process. A capture thread per stream copies frames into a shared memory ring
+    and only sends the slot index to the worker, so frames are never pickled.
+    Results come back on a single queue and are aggregated here.
+    """
+
+    def __init__(self, slots_per_stream=3, detector_kwargs=None, report_interval=5.0):
+        self.slots_per_stream = slots_per_stream
+        self.detector_kwargs = detector_kwargs or {}
+        self.report_interval = report_interval
+        self.streams = []
+        self.context = mp.get_context("spawn")
+        self.result_queue = self.context.Queue()
+        self.stop_event = threading.Event()
+        self.start_time = None
+
+    def add_stream(self, source, patient_id=None):
+        """Register a camera index or stream URL. Returns the stream id"""
+        stream_id = len(self.streams)
+        if patient_id is None:
+            patient_id = f"stream{stream_id}"
+        self.streams.append(_Stream(stream_id, source, patient_id))
+        return stream_id
+
+    def start(self):
+        """Open every source, allocate its frame ring and start its worker process"""
+        self.start_time = time.time()
+        for stream in self.streams:
+            stream.cap = cv2.VideoCapture(stream.source)
+            ret, frame = stream.cap.read() if stream.cap.isOpened() else (False, None)
+            if not ret:
+                raise ValueError(f"Error: Could not open video source {stream.source}")
+
+            stream.ring = SharedFrameRing(frame.shape, self.slots_per_stream)
+            stream.ready_queue = self.context.Queue()
+            stream.free_queue = self.context.Queue()
+            for slot in range(self.slots_per_stream):
+                stream.free_queue.put(slot)
+
+            stream.process = self.context.Process(
+                target=_detector_worker,
+                args=(stream.stream_id, stream.patient_id, stream.ring.name, frame.shape,
+                      self.slots_per_stream, stream.ready_queue, stream.free_queue,
+                      self.result_queue, self.detector_kwargs),
+                daemon=True
+            )
+            stream.process.start()
+
+            stream.capture_thread = threading.Thread(target=self._capture_loop, args=(stream,), daemon=True)
+            stream.capture_thread.start()
+            print(f"Started stream {stream.stream_id} ({stream.source}) at {frame.shape[1]}x{frame.shape[0]}")
+
+    def _capture_loop(self, stream):
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    slot = stream.free_queue.get(timeout=0.01)
+                except queue.Empty:
+                    # Worker is behind: skip this frame without decoding it
+                    if not stream.cap.grab():
+                        break
+                    stream.frames_dropped += 1
+                    continue
+
+                ret, frame = stream.cap.read()
+                if not ret:
+                    print(f"Stream {stream.stream_id}: couldn't read frame.")
+                    stream.free_queue.put(slot)
+                    break
+                np.copyto(stream.ring.frame(slot), frame)
+                stream.frames_sent += 1
+                stream.ready_queue.put((slot, stream.frames_sent, time.time() - self.start_time))
+        except Exception:
+            # E.g. the stream changed resolution and no longer fits the ring
+            logger.exception(f"Stream {stream.stream_id}: capture failed")
+        finally:
+            # The worker only exits once it sees the end marker
+            stream.ready_queue.put(None)
+
+    def _handle_result(self, item):
+        stream_id, frame_index, timestamp, posture_status, movement_status, movement_scores = item
+        stream = self.streams[stream_id]
+        stream.frames_done += 1
+        stream.done_times.append(time.time())
+        stream.latest = {
+            "frame": frame_index,
+            "timestamp": timestamp,
+            "posture": posture_status,
+            "movement": movement_status,
+            "movement_scores": movement_scores
+        }
+
+    def stats(self):
+        """Per-stream throughput, queue depth and latest status"""
+        report = {}
+        for stream in self.streams:
+            times = stream.done_times
+            fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+            latest = stream.latest or {}
+            report[stream.stream_id] = {
+                "source": stream.source,
+                "patient_id": stream.patient_id,
+                "fps": fps,
+                "queue_depth": stream.frames_sent - stream.frames_done,
+                "frames": stream.frames_done,
+                "dropped": stream.frames_dropped,
+                "posture": latest.get("posture", {}).get("overall"),
+                "movement": latest.get("movement", {}).get("overall")
+            }
+        return report
+
+    def print_report(self):
+        for stream_id, s in self.stats().items():
+            print(f"[stream {stream_id}] {s['fps']:.1f} fps, queue depth {s['queue_depth']}, "
+                  f"{s['frames']} frames, {s['dropped']} dropped, "
+                  f"posture: {s['posture']}, movement: {s['movement']}")
+
+    def run(self, duration=None, on_result=None):
+        """
+        Aggregate results until every stream ends, duration seconds pass or Ctrl+C.
+        on_result(stream_id, latest) is called for every analyzed frame.
+        """
+        if self.start_time is None:
+            self.start()
+        deadline = time.time() + duration if duration else None
+        next_report = time.time() + self.report_interval
+        try:
+            while any(stream.process.is_alive() for stream in self.streams):
+                if deadline and time.time() >= deadline:
+                    break
+                try:
+                    item = self.result_queue.get(timeout=0.1)
+                except queue.Empty:
+                    item = None
+                if item is not None:
+                    self._handle_result(item)
+                    if on_result is not None:
+                        on_result(item[0], self.streams[item[0]].latest)
+                if time.time() >= next_report:
+                    self.print_report()
+                    next_report = time.time() + self.report_interval
+        except KeyboardInterrupt:
+            print("Supervisor stopped by user")
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop capture, let workers finish their queued frames and release shared memory"""
+        self.stop_event.set()
+        for stream in self.streams:
+            if stream.capture_thread is not None:
+                stream.capture_thread.join()
+        for stream in self.streams:
+            if stream.process is not None:
+                # Keep draining results so workers never block on a full pipe
+                while stream.process.is_alive():
+                    try:
+                        self._handle_result(self.result_queue.get(timeout=0.1))
+                    except queue.Empty:
+                        pass
+                stream.process.join()
+            if stream.cap is not None:
+                stream.cap.release()
+            if stream.ring is not None:
+                stream.ring.close()
+                stream.ring.unlink()
+                stream.ring = None
+        while True:
+            try:
+                self._handle_result(self.result_queue.get_nowait())
+            except queue.Empty:
+                break
+        self.print_report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run posture and movement detection on several cameras at once')
+    parser.add_argument('sources', nargs='+', help='Camera indices or stream URLs')
+    parser.add_argument('--duration', type=float, default=None, help='Stop after this many seconds')
+    parser.add_argument('--slots', type=int, default=3, help='Shared memory frame slots per stream')
+    parser.add_argument('--log_format', type=str, default='columnar', choices=list(LOG_SINKS),
+                        help='Landmark log format for each stream')
+    args = parser.parse_args()
+
+    supervisor = CameraSupervisor(slots_per_stream=args.slots,
+                                  detector_kwargs={"log_format": args.log_format})
+    for source in args.sources:
+        supervisor.add_stream(int(source) if source.isdigit() else source)
+    supervisor.run(duration=args.duration)
@@ -0,0 +1,222 @@
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+from posture_rules import (assess_posture_batch, detect_involuntary_movements_batch,
+                           posture_status_dict, movement_status_dict)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EventRule:
+    """Hysteresis for one event type, in seconds of session time"""
+    onset_seconds: float = 1.0  # condition must hold this long before an episode opens
+    offset_seconds: float = 2.0  # condition must be absent this long before the episode closes
+    min_duration: float = 2.0  # an episode is reported once it has lasted this long
+
+
+DEFAULT_RULES = {
+    "posture_issue": EventRule(onset_seconds=2.0, offset_seconds=3.0, min_duration=3.0),
+    "shoulders_uneven": EventRule(onset_seconds=2.0, offset_seconds=3.0, min_duration=3.0),
+    "hips_uneven": EventRule(onset_seconds=2.0, offset_seconds=3.0, min_duration=3.0),
+    "forward_head": EventRule(onset_seconds=2.0, offset_seconds=3.0, min_duration=3.0),
+    "involuntary_movement": EventRule(onset_seconds=0.5, offset_seconds=2.0, min_duration=1.0),
+    "tremor": EventRule(onset_seconds=1.0, offset_seconds=2.0, min_duration=2.0),
+}
+
+
+def conditions_from_status(posture_status, movement_status):
+    """Per-frame event conditions from the detector's posture and movement status dicts"""
+    return {
+        "posture_issue": posture_status.get("overall") == "issues_detected",
+        "shoulders_uneven": posture_status.get("shoulders") == "uneven",
+        "hips_uneven": posture_status.get("hips") == "uneven",
+        "forward_head": posture_status.get("head") == "forward_posture",
+        "involuntary_movement": movement_status.get("overall") == "movements_detected",
+        "tremor": "tremor" in movement_status.values(),
+    }
+
+
+def conditions_from_record(record, visibility_threshold=0.5, movement_threshold=0.01):
+    """
+    Per-frame event conditions from a FRAME_DTYPE record (a landmark log or landmark bus
+    frame). The posture and movement checks are rerun on its landmarks and scores;
+    tremor is not part of the record and never holds.
+    """
+    landmarks = record['landmarks'][None]
+    codes, masks = assess_posture_batch(landmarks, visibility_threshold)
+    posture_status = posture_status_dict(codes, masks)
+    codes, masks = detect_involuntary_movements_batch(record['movement_scores'][None], landmarks,
+                                                      visibility_threshold, movement_threshold)
+    return conditions_from_status(posture_status, movement_status_dict(codes, masks))
+
+
+class _EpisodeState:
+    """Tracks one event type: idle -> pending -> active -> idle"""
+
+    def __init__(self):
+        self.state = "idle"
+        self.start = None  # when the condition first held
+        self.last_true = None  # last frame the condition held
+        self.frames = 0
+        self.true_frames = 0
+        self.reported = False
+
+
+class EventBatcher:
+    """
+    Collects emitted events and hands them to sink(list_of_events) from a background
+    thread, in batches of up to batch_size or every flush_interval seconds. A failed
+    flush is retried with the next batch.
+    """
+
+    def __init__(self, sink, batch_size=50, flush_interval=2.0):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.pending = []
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, event):
+        self.queue.put(event)
+
+    def _flush(self):
+        if not self.pending:
+            return
+        try:
+            self.sink(self.pending)
+            self.pending = []
+        except Exception as e:
+            logger.error(f"Error flushing {len(self.pending)} patient events: {e}")
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if item is None:
+                    break
+                self.pending.append(item)
+            except queue.Empty:
+                pass
+            if len(self.pending) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush()
+                deadline = time.monotonic() + self.flush_interval
+        self._flush()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+class EventEngine:
+    """
+    Turns per-frame conditions into one patient_event per clinical episode.
+    A condition has to hold for onset_seconds before an episode opens (its start is the
+    first frame it held) and be absent for offset_seconds before it closes; gaps shorter
+    than offset_seconds, e.g. a few frames of lost tracking, do not break it up. Each episode
+    is reported once, when it has lasted min_duration, with the share of frames where
+    the condition held as confidence (0-100).
+    """
+
+    def __init__(self, patient_id, video_id, rules=None, sink=None, batch_size=50, flush_interval=2.0):
+        self.patient_id = patient_id
+        self.video_id = video_id
+        self.rules = dict(DEFAULT_RULES if rules is None else rules)
+        self.states = {event_type: _EpisodeState() for event_type in self.rules}
+        self.batcher = EventBatcher(sink, batch_size, flush_interval) if sink is not None else None
+        self.events_emitted = 0
+        self.frames_seen = 0
+
+    def update(self, timestamp, conditions):
+        """Feed one frame of {event_type: bool}. Returns the events emitted on this frame"""
+        self.frames_seen += 1
+        emitted = []
+        for event_type, rule in self.rules.items():
+            state = self.states[event_type]
+            active = bool(conditions.get(event_type, False))
+
+            if state.state == "idle":
+                if active:
+                    state.state = "pending"
+                    state.start = timestamp
+                    state.last_true = timestamp
+                    state.frames = 1
+                    state.true_frames = 1
+                    state.reported = False
+                continue
+
+            state.frames += 1
+            if active:
+                state.true_frames += 1
+                state.last_true = timestamp
+
+            if timestamp - state.last_true >= rule.offset_seconds:
+                # Absent long enough: the episode ended, or never reached its onset
+                state.state = "idle"
+                continue
+            if state.state == "pending" and state.last_true - state.start >= rule.onset_seconds:
+                state.state = "active"
+
+            if (state.state == "active" and not state.reported
+                    and state.last_true - state.start >= rule.min_duration):
+                state.reported = True
+                emitted.append(self._emit(event_type, state))
+        return emitted
+
+    def update_from_result(self, result):
+        """Feed a detector FrameResult"""
+        return self.update(result.timestamp, conditions_from_status(result.posture_status, result.movement_status))
+
+    def update_from_record(self, record, visibility_threshold=0.5, movement_threshold=0.01):
+        """Feed a FRAME_DTYPE record, e.g. read from a LandmarkBusReader in another process"""
+        return self.update(float(record['timestamp']),
+                           conditions_from_record(record, visibility_threshold, movement_threshold))
+
+    def _emit(self, event_type, state):
+        event = {
+            "type": event_type,
+            "patient_id": self.patient_id,
+            "video_id": self.video_id,
+            "timestamp": float(state.start),
+            "confidence": int(round(100.0 * state.true_frames / state.frames)),
+            "validation_status": "pending"
+        }
+        self.events_emitted += 1
+        if self.batcher is not None:
+            self.batcher.submit(event)
+        return event
+
+    def close(self):
+        """Flush outstanding events and stop the background thread"""
+        if self.batcher is not None:
+            self.batcher.close()
+            self.batcher = None
+
+
+def http_event_sink(api_url, access_token, timeout=10.0):
+    """Sink that posts batches to the API's POST /patient_event/batch route"""
+    # httpx comes with the supabase client
+    import httpx
+
+    url = f"{api_url.rstrip('/')}/patient_event/batch"
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    def sink(events):
+        response = httpx.post(url, json=events, headers=headers, timeout=timeout)
+        response.raise_for_status()
+    return sink
+
+
+def supabase_event_sink():
+    """Sink that inserts batches straight into the patient_event table (server side)"""
+    from common import supabase
+
+    def sink(events):
+        supabase.table('patient_event').insert(events).execute()
+    return sink
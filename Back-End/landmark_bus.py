@@ -0,0 +1,283 @@
+import argparse
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from landmark_log import FRAME_DTYPE, fill_frame_record
+
+# Shared memory layout:
+#   64 byte header (BUS_HEADER_DTYPE), then capacity slots (SLOT_DTYPE).
+# Each slot holds one FRAME_DTYPE record, the same per-frame record as the columnar
+# log, between two copies of its sequence number. The writer sets seq_begin, writes
+# the record, then sets seq_end; a reader that sees the same number on both sides
+# after copying the record knows it was not overwritten halfway (a seqlock).
+BUS_MAGIC = b"PIMBUS01"
+BUS_VERSION = 1
+DEFAULT_BUS_NAME = "pim_landmarks"
+
+BUS_HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('capacity', '<u4'),
+    ('head', '<u8'),  # sequence number of the newest complete slot, 0 before the first frame
+    ('closed', 'u1'),  # set by the writer when it stops publishing
+    ('reserved', 'V39'),
+])
+
+_PADDING = -(8 + FRAME_DTYPE.itemsize) % 8  # keeps seq_end 8-byte aligned
+SLOT_DTYPE = np.dtype([
+    ('seq_begin', '<u8'),
+    ('record', FRAME_DTYPE),
+    ('padding', f'V{_PADDING}'),
+    ('seq_end', '<u8'),
+])
+
+
+_CREATED = set()  # Buses created by this process; their writer unlinks them
+
+
+def _untrack(shm):
+    """Take a segment away from this process's resource tracker, which would unlink it on exit"""
+    try:
+        # Before Python 3.13 every process that attaches registers the segment and
+        # unlinks it on exit, which would pull the bus away from the other readers
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+def _attach(name):
+    """Open an existing segment without handing it to this process's resource tracker"""
+    shm = shared_memory.SharedMemory(name=name)
+    if name not in _CREATED:
+        _untrack(shm)
+    return shm
+
+
+def _reclaim_stale(name):
+    """
+    Remove an existing segment called name if it is not a live bus: not a bus at all,
+    or one whose writer closed it. Raises FileExistsError for a bus that is still live.
+    """
+    if name in _CREATED:
+        raise FileExistsError(f"Landmark bus {name} is already published by this process")
+    existing = shared_memory.SharedMemory(name=name)
+    stale = True
+    if existing.size >= BUS_HEADER_DTYPE.itemsize:
+        header = np.ndarray((), dtype=BUS_HEADER_DTYPE, buffer=existing.buf)
+        stale = header['magic'] != BUS_MAGIC or bool(header['closed'])
+        del header
+    existing.close()
+    if not stale:
+        _untrack(existing)
+        raise FileExistsError(f"Landmark bus {name} is in use by another detector; give this one another "
+                              f"name (if its writer crashed, remove /dev/shm/{name})")
+    existing.unlink()
+
+
+class LandmarkBus:
+    """
+    Single-producer side of the landmark bus: a ring of capacity per-frame records in
+    shared memory that any number of LandmarkBusReader processes (UNIK classifier,
+    logger, event engine, UI) read at their own pace. Publishing never waits for a
+    reader; a reader that falls more than capacity frames behind skips ahead and
+    counts the frames it missed. Nothing is pickled or queued, the record is written
+    straight into the shared slot. Creating a bus under the name of a live one raises
+    FileExistsError; a segment left behind under that name by a closed bus is reused.
+    """
+
+    def __init__(self, name=DEFAULT_BUS_NAME, capacity=256):
+        self.name = name
+        self.capacity = capacity
+        size = BUS_HEADER_DTYPE.itemsize + capacity * SLOT_DTYPE.itemsize
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a finished run, whose readers have nothing more to read
+            _reclaim_stale(name)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _CREATED.add(name)
+
+        self.header = np.ndarray((), dtype=BUS_HEADER_DTYPE, buffer=self.shm.buf)
+        self.slots = np.ndarray((capacity,), dtype=SLOT_DTYPE, buffer=self.shm.buf,
+                                offset=BUS_HEADER_DTYPE.itemsize)
+        # Field views, so a slot's parts are written without building a slot object
+        self.seq_begin = self.slots['seq_begin']
+        self.records = self.slots['record']
+        self.seq_end = self.slots['seq_end']
+        self.seq_begin[:] = 0
+        self.seq_end[:] = 0
+        self.header['head'] = 0
+        self.header['closed'] = 0
+        self.header['capacity'] = capacity
+        self.header['version'] = BUS_VERSION
+        self.header['magic'] = BUS_MAGIC  # Written last: readers check it before anything else
+        self.seq = 0
+
+    def _begin(self):
+        """Claim the next slot for writing and return its index"""
+        self.seq += 1
+        index = self.seq % self.capacity
+        self.seq_begin[index] = self.seq
+        return index
+
+    def _commit(self, index):
+        self.seq_end[index] = self.seq
+        self.header['head'] = self.seq
+
+    def publish(self, result):
+        """Publish a detector FrameResult. Returns its sequence number"""
+        index = self._begin()
+        fill_frame_record(self.records[index], result)
+        self._commit(index)
+        return self.seq
+
+    def publish_record(self, record):
+        """Publish an already assembled FRAME_DTYPE record. Returns its sequence number"""
+        index = self._begin()
+        self.records[index] = record
+        self._commit(index)
+        return self.seq
+
+    def close(self):
+        """Tell readers no more frames are coming and remove the segment"""
+        if self.shm is None:
+            return
+        self.header['closed'] = 1
+        # Readers keep their own mapping, so unlinking only stops new ones from attaching
+        del self.header, self.slots, self.seq_begin, self.records, self.seq_end
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            # Removed by someone else already
+            _untrack(self.shm)
+        self.shm = None
+        _CREATED.discard(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class LandmarkBusReader:
+    """
+    One consumer of a LandmarkBus, possibly in another process. read() returns the
+    next FRAME_DTYPE record in order (see landmark_log for its fields) and latest()
+    the newest one, for consumers that only care about the current frame. Each read
+    copies one ~700 byte record into a buffer owned by this reader, which is what
+    lets it check that the writer did not overwrite the slot meanwhile; the returned
+    record stays valid until the next call. With from_start=True the reader begins
+    with the oldest frame still in the ring instead of the next one published.
+    """
+
+    def __init__(self, name=DEFAULT_BUS_NAME, from_start=False, poll_interval=0.002):
+        self.name = name
+        self.poll_interval = poll_interval  # Seconds between checks while waiting for a frame
+        self.shm = _attach(name)
+        self.header = np.ndarray((), dtype=BUS_HEADER_DTYPE, buffer=self.shm.buf)
+        if self.header['magic'] != BUS_MAGIC or self.header['version'] != BUS_VERSION:
+            self.shm.close()
+            raise ValueError(f"{name} is not a version {BUS_VERSION} landmark bus")
+        self.capacity = int(self.header['capacity'])
+        self.slots = np.ndarray((self.capacity,), dtype=SLOT_DTYPE, buffer=self.shm.buf,
+                                offset=BUS_HEADER_DTYPE.itemsize)
+        self.seq_begin = self.slots['seq_begin']
+        self.records = self.slots['record']
+        self.seq_end = self.slots['seq_end']
+
+        self.record = np.zeros((), dtype=FRAME_DTYPE)
+        head = int(self.header['head'])
+        self.next_seq = max(head - self.capacity + 2, 1) if from_start else head + 1
+        self.last_seq = 0  # Sequence number of the record returned last
+        self.frames_read = 0
+        self.frames_dropped = 0
+
+    @property
+    def writer_closed(self):
+        return bool(self.header['closed'])
+
+    def _copy(self, seq):
+        """Copy slot seq into self.record. False if it is not written yet or was overwritten"""
+        index = seq % self.capacity
+        if self.seq_end[index] != seq:
+            return False
+        self.record[...] = self.records[index]
+        return self.seq_begin[index] == seq
+
+    def read(self, timeout=None):
+        """Next record in order, or None on timeout or once the writer closed and everything was read"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            head = int(self.header['head'])
+            if self.next_seq <= head:
+                seq = self.next_seq
+                if self._copy(seq):
+                    self.next_seq = seq + 1
+                    self.last_seq = seq
+                    self.frames_read += 1
+                    return self.record
+                # Lapped by the writer: resume from the oldest frame still in the ring,
+                # with one slot of margin for the frame being written
+                resume = int(self.header['head']) - self.capacity + 2
+                self.frames_dropped += resume - seq
+                self.next_seq = resume
+                continue
+            if self.writer_closed:
+                return None
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def latest(self):
+        """The newest record, or None if nothing was published yet. Does not move the read position"""
+        while True:
+            head = int(self.header['head'])
+            if head == 0:
+                return None
+            if self._copy(head):
+                self.last_seq = head
+                return self.record
+
+    def __iter__(self):
+        while True:
+            record = self.read()
+            if record is None:
+                return
+            yield record
+
+    def close(self):
+        if self.shm is None:
+            return
+        del self.header, self.slots, self.seq_begin, self.records, self.seq_end
+        self.shm.close()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Follow a landmark bus and report what arrives')
+    parser.add_argument('--name', type=str, default=DEFAULT_BUS_NAME, help='Shared memory name of the bus')
+    parser.add_argument('--from_start', action='store_true', help='Start with the oldest frame in the ring')
+    args = parser.parse_args()
+
+    with LandmarkBusReader(args.name, from_start=args.from_start) as reader:
+        start = time.monotonic()
+        try:
+            for record in reader:
+                if reader.frames_read % 30 == 0:
+                    elapsed = time.monotonic() - start
+                    print(f"frame {int(record['frame'])} t={float(record['timestamp']):.2f}s "
+                          f"{reader.frames_read / elapsed:.1f} fps, {reader.frames_dropped} dropped")
+        except KeyboardInterrupt:
+            pass
+        print(f"Read {reader.frames_read} frames, dropped {reader.frames_dropped}")
@@ -0,0 +1,454 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import struct
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from landmarks import KEY_LANDMARKS, NUM_LANDMARKS, LANDMARK_FIELDS, POSTURE_CODES, MOVEMENT_CODES
+from landmark_codec import LandmarkEncoder, LandmarkDecoder, shuffle_bytes, unshuffle_bytes, compress, decompress
+
+# Binary landmark log layout:
+#   8 byte magic, uint32 header length, JSON header padded to a multiple of 64 bytes,
+#   then one fixed-size record per frame (FRAME_DTYPE) until the end of the file.
+LOG_MAGIC = b"PIMLMK01"
+LOG_VERSION = 2
+HEADER_ALIGNMENT = 64
+WRITER_POLL_SECONDS = 0.5  # How often a recorder waiting for a free block checks the writer thread
+
+# Encoded landmark log layout:
+#   the same magic/length/JSON header (with ENCODED_LOG_MAGIC and the codec settings),
+#   then blocks of up to block_frames records: uint32 codec block length, uint32 meta
+#   length, a landmark_codec block holding landmarks and movement scores, and the other
+#   FRAME_DTYPE fields (META_FIELDS) byte-shuffled and compressed. Every block starts
+#   with a keyframe, so a truncated file loses at most its last block.
+ENCODED_LOG_MAGIC = b"PIMLMZ01"
+ENCODED_BLOCK_HEADER = struct.Struct('<II')
+
+# Bits of the per-frame flags field (added in version 2)
+FLAG_REUSED = 1  # landmarks were carried over from an earlier frame by the motion gate
+
+FRAME_DTYPE = np.dtype([
+    ('frame', '<u4'),
+    ('timestamp', '<f8'),
+    ('landmarks', '<f4', (NUM_LANDMARKS, LANDMARK_FIELDS)),
+    ('movement_scores', '<f4', (NUM_LANDMARKS,)),
+    ('posture', 'u1'),
+    ('movement', 'u1'),
+    ('flags', 'u1'),
+])
+
+# FRAME_DTYPE fields an encoded log stores next to the codec block, packed
+META_FIELDS = ['frame', 'timestamp', 'posture', 'movement', 'flags']
+META_DTYPE = np.dtype([(name, FRAME_DTYPE[name]) for name in META_FIELDS])
+
+CSV_FIELDNAMES = ['timestamp', 'frame', 'landmark_name', 'landmark_id',
+                  'x', 'y', 'z', 'visibility',
+                  'movement_score', 'posture_status', 'reused']
+
+
+def _dtype_from_descr(descr):
+    """Rebuild a structured dtype from the JSON form of dtype.descr"""
+    fields = []
+    for entry in descr:
+        if len(entry) == 3:
+            fields.append((entry[0], entry[1], tuple(entry[2])))
+        else:
+            fields.append((entry[0], entry[1]))
+    return np.dtype(fields)
+
+
+def fill_frame_record(row, result):
+    """Write a detector FrameResult into one FRAME_DTYPE record in place"""
+    row['frame'] = result.frame_index
+    row['timestamp'] = result.timestamp
+    if result.landmarks is None:
+        row['landmarks'] = np.nan
+        row['movement_scores'] = np.nan
+    else:
+        row['landmarks'] = result.landmarks
+        row['movement_scores'] = result.movement_score_array
+    row['posture'] = POSTURE_CODES.get(result.posture_status.get("overall"), 0)
+    row['movement'] = MOVEMENT_CODES.get(result.movement_status.get("overall"), 0)
+    row['flags'] = FLAG_REUSED if result.reused else 0
+
+
+class CsvLandmarkSink:
+    """Writes one CSV row per visible key landmark per frame (the original log layout)"""
+
+    extension = ".csv"
+
+    def __init__(self, path, key_landmarks=KEY_LANDMARKS):
+        self.path = path
+        self.key_landmarks = key_landmarks
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDNAMES)
+        self.writer.writeheader()
+
+    def write(self, result):
+        if result.landmarks is None:
+            return
+        for name, score in result.movement_scores.items():
+            idx = self.key_landmarks[name]
+            x, y, z, visibility = result.landmarks[idx]
+            self.writer.writerow({
+                'timestamp': result.timestamp,
+                'frame': result.frame_index,
+                'landmark_name': name,
+                'landmark_id': idx,
+                'x': float(x),
+                'y': float(y),
+                'z': float(z),
+                'visibility': float(visibility),
+                'movement_score': score,
+                'posture_status': result.posture_status.get("overall", "unknown"),
+                'reused': int(result.reused)
+            })
+
+    def size(self):
+        """Bytes written so far (including buffered rows)"""
+        return self.file.tell()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ColumnarLandmarkSink:
+    """
+    Frame-major binary landmark log. Every frame becomes one FRAME_DTYPE record
+    (frames without a detection are stored with NaN landmarks), so record i is frame i.
+    Records are collected in preallocated blocks which a background thread writes out.
+    """
+
+    extension = ".lmlog"
+
+    def __init__(self, path, patient_id=None, block_frames=512, num_blocks=3):
+        self.path = path
+        self.block_frames = block_frames
+        self.file = open(path, 'wb')
+        self._write_header(patient_id)
+
+        # Blocks cycle between the recorder (free_blocks) and the writer thread (full_blocks)
+        self.free_blocks = queue.Queue()
+        for _ in range(num_blocks):
+            self.free_blocks.put(np.zeros(block_frames, dtype=FRAME_DTYPE))
+        self.full_blocks = queue.Queue()
+        self.block = self.free_blocks.get()
+        self.block_fill = 0
+        self.frames_written = 0
+        self.error = None  # First exception of the writer thread
+
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    magic = LOG_MAGIC
+
+    def _header(self, patient_id):
+        return {
+            'version': LOG_VERSION,
+            'dtype': FRAME_DTYPE.descr,
+            'patient_id': patient_id,
+            'created': datetime.now().isoformat(),
+            'posture_codes': POSTURE_CODES,
+            'movement_codes': MOVEMENT_CODES
+        }
+
+    def _write_header(self, patient_id):
+        header = json.dumps(self._header(patient_id)).encode('utf-8')
+        prefix = len(self.magic) + 4
+        padded_length = -(-(prefix + len(header)) // HEADER_ALIGNMENT) * HEADER_ALIGNMENT - prefix
+        self.file.write(self.magic)
+        self.file.write(struct.pack('<I', padded_length))
+        self.file.write(header.ljust(padded_length))
+        self.header_bytes = prefix + padded_length
+
+    def _writer_loop(self):
+        while True:
+            item = self.full_blocks.get()
+            if item is None:
+                break
+            block, count, recycle = item
+            if self.error is None:
+                try:
+                    self._write_block(block[:count])
+                except Exception as e:
+                    # E.g. disk full; raised to the recorder on its next write, flush or close.
+                    # Later blocks are dropped but still recycled so the recorder never waits
+                    self.error = e
+            if recycle:
+                self.free_blocks.put(block)
+
+    def _write_block(self, records):
+        records.tofile(self.file)
+
+    def _raise_writer_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def _submit_block(self):
+        if self.block_fill:
+            self.full_blocks.put((self.block, self.block_fill, True))
+            self.block_fill = 0
+            while True:
+                try:
+                    self.block = self.free_blocks.get(timeout=WRITER_POLL_SECONDS)
+                    break
+                except queue.Empty:
+                    self._raise_writer_error()
+                    if not self.writer_thread.is_alive():
+                        raise RuntimeError(f"Writer thread of {self.path} stopped")
+        self._raise_writer_error()
+
+    def write(self, result):
+        self._raise_writer_error()
+        fill_frame_record(self.block[self.block_fill], result)
+        self.block_fill += 1
+        self.frames_written += 1
+        if self.block_fill == self.block_frames:
+            self._submit_block()
+
+    def write_records(self, records):
+        """Append an already assembled FRAME_DTYPE array, e.g. from offline analysis"""
+        self._submit_block()
+        # A copy, so the caller may reuse its array while the writer thread catches up
+        self.full_blocks.put((np.array(records, dtype=FRAME_DTYPE), len(records), False))
+        self.frames_written += len(records)
+
+    def size(self):
+        """Bytes the log will hold once every queued block is written"""
+        return self.header_bytes + self.frames_written * FRAME_DTYPE.itemsize
+
+    def flush(self):
+        """Hand the partially filled block to the writer thread"""
+        self._submit_block()
+
+    def close(self):
+        if self.file is None:
+            return
+        try:
+            self._submit_block()
+        finally:
+            self.full_blocks.put(None)
+            self.writer_thread.join()
+            self.file.close()
+            self.file = None
+        self._raise_writer_error()
+
+
+def encode_records(records, encoder):
+    """FRAME_DTYPE records as one encoded log block, decodable on its own"""
+    block = encoder.encode(records['landmarks'], records['movement_scores'], keyframe=True)
+    meta = np.empty(len(records), dtype=META_DTYPE)
+    for name in META_FIELDS:
+        meta[name] = records[name]
+    meta_bytes = compress(shuffle_bytes(meta), encoder.compressor, encoder.level)
+    return ENCODED_BLOCK_HEADER.pack(len(block), len(meta_bytes)) + block + meta_bytes
+
+
+def decode_records(data, decoder, compressor, offset=0):
+    """(records, offset after the block) of the encoded log block at offset"""
+    block_length, meta_length = ENCODED_BLOCK_HEADER.unpack_from(data, offset)
+    offset += ENCODED_BLOCK_HEADER.size
+    landmarks, scores = decoder.decode(data[offset:offset + block_length])
+    offset += block_length
+    meta = unshuffle_bytes(decompress(data[offset:offset + meta_length], compressor),
+                           META_DTYPE, len(landmarks))
+    records = np.zeros(len(landmarks), dtype=FRAME_DTYPE)
+    for name in META_FIELDS:
+        records[name] = meta[name]
+    records['landmarks'] = landmarks
+    records['movement_scores'] = scores
+    return records, offset + meta_length
+
+
+class EncodedLandmarkSink(ColumnarLandmarkSink):
+    """
+    ColumnarLandmarkSink with every block run through landmark_codec before it is
+    written: landmarks and scores quantized, delta coded and compressed. That is
+    under a quarter of the columnar size and a tenth of the CSV log, which only keeps
+    the key landmarks. Encoding happens on the writer thread; codec_kwargs go to
+    LandmarkEncoder.
+    """
+
+    extension = ".lmz"
+    magic = ENCODED_LOG_MAGIC
+
+    def __init__(self, path, patient_id=None, block_frames=240, num_blocks=3, **codec_kwargs):
+        self.encoder = LandmarkEncoder(**codec_kwargs)
+        self.bytes_written = 0
+        super().__init__(path, patient_id=patient_id, block_frames=block_frames, num_blocks=num_blocks)
+
+    def _header(self, patient_id):
+        header = super()._header(patient_id)
+        header['codec'] = self.encoder.settings()
+        return header
+
+    def _write_block(self, records):
+        data = encode_records(records, self.encoder)
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    def size(self):
+        """Bytes written out so far; blocks still queued for the writer thread are not counted"""
+        return self.header_bytes + self.bytes_written
+
+
+LOG_SINKS = {
+    "csv": CsvLandmarkSink,
+    "columnar": ColumnarLandmarkSink,
+    "encoded": EncodedLandmarkSink
+}
+
+
+class LandmarkLogReader:
+    """
+    Memory-mapped reader for logs written by ColumnarLandmarkSink. Encoded logs
+    (EncodedLandmarkSink) are decoded into memory on open.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic = f.read(len(LOG_MAGIC))
+            if magic not in (LOG_MAGIC, ENCODED_LOG_MAGIC):
+                raise ValueError(f"{path} is not a landmark log")
+            (header_length,) = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(header_length).decode('utf-8'))
+            if magic == ENCODED_LOG_MAGIC:
+                self.dtype = FRAME_DTYPE
+                self.frames = self._decode(f.read())
+                return
+
+        self.dtype = _dtype_from_descr(self.header['dtype'])
+        offset = len(LOG_MAGIC) + 4 + header_length
+        # Ignore a partially written trailing record, e.g. after a crash
+        count = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if count > 0:
+            self.frames = np.memmap(path, dtype=self.dtype, mode='r', offset=offset, shape=(count,))
+        else:
+            self.frames = np.zeros(0, dtype=self.dtype)
+
+    def _decode(self, data):
+        decoder = LandmarkDecoder()
+        compressor = self.header['codec']['compressor']
+        blocks = []
+        offset = 0
+        while offset + ENCODED_BLOCK_HEADER.size <= len(data):
+            block_length, meta_length = ENCODED_BLOCK_HEADER.unpack_from(data, offset)
+            if offset + ENCODED_BLOCK_HEADER.size + block_length + meta_length > len(data):
+                break  # Partially written trailing block, e.g. after a crash
+            records, offset = decode_records(data, decoder, compressor, offset)
+            blocks.append(records)
+        return np.concatenate(blocks) if blocks else np.zeros(0, dtype=FRAME_DTYPE)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    @property
+    def timestamps(self):
+        return self.frames['timestamp']
+
+    @property
+    def landmarks(self):
+        return self.frames['landmarks']
+
+    @property
+    def reused(self):
+        """Boolean mask of frames whose landmarks were reused by the motion gate (all False before version 2)"""
+        if 'flags' not in self.dtype.names:
+            return np.zeros(len(self.frames), dtype=bool)
+        return (self.frames['flags'] & FLAG_REUSED) != 0
+
+    def index_of_frame(self, frame_number):
+        """Record index for a frame number; frames are consecutive so this is a subtraction"""
+        if not len(self.frames):
+            raise IndexError("log is empty")
+        index = int(frame_number) - int(self.frames[0]['frame'])
+        if 0 <= index < len(self.frames) and self.frames[index]['frame'] == frame_number:
+            return index
+        # Fall back to a search if frames were ever skipped
+        index = int(np.searchsorted(self.frames['frame'], frame_number))
+        if index < len(self.frames) and self.frames[index]['frame'] == frame_number:
+            return index
+        raise IndexError(f"frame {frame_number} is not in the log")
+
+    def index_at_time(self, timestamp):
+        """
+        Index of the last record at or before timestamp. The frame rate is close to
+        constant, so the position is guessed by interpolation and only corrected locally.
+        """
+        timestamps = self.frames['timestamp']
+        count = len(timestamps)
+        if not count:
+            raise IndexError("log is empty")
+        first, last = float(timestamps[0]), float(timestamps[-1])
+        if timestamp <= first:
+            return 0
+        if timestamp >= last:
+            return count - 1
+
+        guess = int((timestamp - first) / (last - first) * (count - 1))
+        low, high = guess, guess + 1
+        step = 16
+        while low > 0 and timestamps[low] > timestamp:
+            low = max(0, low - step)
+            step *= 2
+        step = 16
+        while high < count and timestamps[high - 1] <= timestamp:
+            high = min(count, high + step)
+            step *= 2
+        return low + int(np.searchsorted(timestamps[low:high], timestamp, side='right')) - 1
+
+    def frame(self, frame_number):
+        return self.frames[self.index_of_frame(frame_number)]
+
+    def at_time(self, timestamp):
+        return self.frames[self.index_at_time(timestamp)]
+
+    def close(self):
+        mmap = getattr(self.frames, '_mmap', None)
+        self.frames = None
+        if mmap is not None:
+            mmap.close()
+
+
+def export_csv(log_path, csv_path, key_landmarks=KEY_LANDMARKS, visibility_threshold=0.5):
+    """Convert a binary landmark log to the per-landmark CSV layout"""
+    reader = LandmarkLogReader(log_path)
+    posture_names = {code: name for name, code in reader.header['posture_codes'].items()}
+    reused = reader.reused
+    with open(csv_path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_FIELDNAMES)
+        for record, record_reused in zip(reader.frames, reused):
+            landmarks = record['landmarks']
+            posture = posture_names.get(int(record['posture']), "unknown")
+            for name, idx in key_landmarks.items():
+                x, y, z, visibility = landmarks[idx]
+                if not visibility > visibility_threshold:
+                    continue
+                writer.writerow([float(record['timestamp']), int(record['frame']), name, idx,
+                                 float(x), float(y), float(z), float(visibility),
+                                 float(record['movement_scores'][idx]), posture, int(record_reused)])
+    reader.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a binary landmark log to CSV')
+    parser.add_argument('log_path', type=str, help='Path to a .lmlog or .lmz file')
+    parser.add_argument('csv_path', type=str, help='Path of the CSV file to write')
+    parser.add_argument('--visibility_threshold', type=float, default=0.5,
+                        help='Skip landmarks at or below this visibility, like the live CSV log')
+    args = parser.parse_args()
+
+    export_csv(args.log_path, args.csv_path, visibility_threshold=args.visibility_threshold)
+    print(f"Wrote {args.csv_path}")
@@ -0,0 +1,171 @@
+import numpy as np
+
+from landmarks import NUM_LANDMARKS
+
+
+class OneEuroFilter:
+    """
+    One-Euro filter over the x, y, z of all 33 landmarks, updated as one set of array
+    operations per frame. min_cutoff (Hz) sets the smoothing at rest, beta how quickly
+    the cutoff opens up with speed (normalized units per second), d_cutoff the cutoff
+    of the speed estimate. Landmarks at or below visibility_threshold keep their raw
+    values and restart from their next visible position.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=5.0, d_cutoff=1.0, fps=30.0, visibility_threshold=0.5):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.fps = fps
+        self.visibility_threshold = visibility_threshold
+
+        shape = (NUM_LANDMARKS, 3)
+        self.value = np.zeros(shape)
+        self.speed = np.zeros(shape)
+        self.raw = np.zeros(shape)
+        self.cutoff = np.zeros(shape)
+        self.alpha = np.zeros(shape)
+        self.tracked = np.zeros((NUM_LANDMARKS, 1), dtype=bool)
+        self.last_timestamp = None
+
+    def reset(self):
+        self.tracked[:] = False
+        self.last_timestamp = None
+
+    def _dt(self, timestamp):
+        dt = None
+        if timestamp is not None and self.last_timestamp is not None:
+            dt = timestamp - self.last_timestamp
+        self.last_timestamp = timestamp
+        return dt if dt is not None and dt > 0 else 1.0 / self.fps
+
+    def filter(self, landmarks, timestamp=None, out=None):
+        """Smooth one (33, 4) frame. Visibility is passed through. Returns out (a new array by default)"""
+        if out is None:
+            out = landmarks.copy()
+        elif out is not landmarks:
+            out[:] = landmarks
+        dt = self._dt(timestamp)
+
+        visible = landmarks[:, 3:4] > self.visibility_threshold
+        fresh = visible & ~self.tracked
+        np.copyto(self.raw, landmarks[:, :3])
+
+        # Speed estimate, low-passed at d_cutoff
+        d_alpha = 1.0 / (1.0 + 1.0 / (2 * np.pi * self.d_cutoff * dt))
+        np.subtract(self.raw, self.value, out=self.cutoff)
+        self.cutoff /= dt
+        self.cutoff -= self.speed
+        self.cutoff *= d_alpha
+        self.speed += self.cutoff
+
+        # Cutoff opens with speed, then the position is low-passed with it
+        np.abs(self.speed, out=self.cutoff)
+        self.cutoff *= self.beta
+        self.cutoff += self.min_cutoff
+        np.multiply(self.cutoff, 2 * np.pi * dt, out=self.alpha)
+        np.reciprocal(self.alpha, out=self.alpha)
+        self.alpha += 1.0
+        np.reciprocal(self.alpha, out=self.alpha)
+        np.subtract(self.raw, self.value, out=self.cutoff)
+        self.cutoff *= self.alpha
+        self.value += self.cutoff
+
+        # Landmarks that just became visible start from their measurement
+        np.copyto(self.value, self.raw, where=fresh)
+        np.copyto(self.speed, 0.0, where=fresh)
+        self.tracked[:] = visible
+
+        np.copyto(out[:, :3], self.value, where=visible, casting='same_kind')
+        return out
+
+
+class ConstantVelocityKalmanFilter:
+    """
+    Constant-velocity Kalman filter per landmark axis, run on all 33 x 3 coordinates
+    at once. process_noise is the acceleration noise density, measurement_noise the
+    variance of the MediaPipe jitter (normalized units). Landmarks at or below
+    visibility_threshold are not updated and restart when visible again.
+    """
+
+    def __init__(self, process_noise=0.01, measurement_noise=1e-5, fps=30.0, visibility_threshold=0.5):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.fps = fps
+        self.visibility_threshold = visibility_threshold
+
+        shape = (NUM_LANDMARKS, 3)
+        self.position = np.zeros(shape)
+        self.velocity = np.zeros(shape)
+        # Symmetric 2x2 covariance of (position, velocity)
+        self.p00 = np.zeros(shape)
+        self.p01 = np.zeros(shape)
+        self.p11 = np.zeros(shape)
+        self.gain0 = np.zeros(shape)
+        self.gain1 = np.zeros(shape)
+        self.residual = np.zeros(shape)
+        self.tracked = np.zeros((NUM_LANDMARKS, 1), dtype=bool)
+        self.last_timestamp = None
+
+    def reset(self):
+        self.tracked[:] = False
+        self.last_timestamp = None
+
+    def _dt(self, timestamp):
+        dt = None
+        if timestamp is not None and self.last_timestamp is not None:
+            dt = timestamp - self.last_timestamp
+        self.last_timestamp = timestamp
+        return dt if dt is not None and dt > 0 else 1.0 / self.fps
+
+    def filter(self, landmarks, timestamp=None, out=None):
+        """Smooth one (33, 4) frame. Visibility is passed through. Returns out (a new array by default)"""
+        if out is None:
+            out = landmarks.copy()
+        elif out is not landmarks:
+            out[:] = landmarks
+        dt = self._dt(timestamp)
+        q = self.process_noise
+        r = self.measurement_noise
+
+        # Predict
+        self.position += self.velocity * dt
+        self.p00 += dt * (2 * self.p01 + dt * self.p11) + q * dt ** 3 / 3
+        self.p01 += dt * self.p11 + q * dt ** 2 / 2
+        self.p11 += q * dt
+
+        # Update with the measurement
+        visible = landmarks[:, 3:4] > self.visibility_threshold
+        np.subtract(landmarks[:, :3], self.position, out=self.residual)
+        np.divide(self.p00, self.p00 + r, out=self.gain0)
+        np.divide(self.p01, self.p00 + r, out=self.gain1)
+        np.copyto(self.gain0, 0.0, where=~visible)
+        np.copyto(self.gain1, 0.0, where=~visible)
+        self.position += self.gain0 * self.residual
+        self.velocity += self.gain1 * self.residual
+        self.p11 -= self.gain1 * self.p01
+        self.p01 *= 1.0 - self.gain0
+        self.p00 *= 1.0 - self.gain0
+
+        # Landmarks that just became visible start at rest on their measurement
+        fresh = visible & ~self.tracked
+        np.copyto(self.position, landmarks[:, :3], where=fresh)
+        np.copyto(self.velocity, 0.0, where=fresh)
+        np.copyto(self.p00, r, where=fresh)
+        np.copyto(self.p01, 0.0, where=fresh)
+        np.copyto(self.p11, 1.0, where=fresh)
+        self.tracked[:] = visible
+
+        np.copyto(out[:, :3], self.position, where=visible, casting='same_kind')
+        return out
+
+
+SMOOTHERS = {
+    "one_euro": OneEuroFilter,
+    "kalman": ConstantVelocityKalmanFilter
+}
+
+
+def make_smoother(name, **kwargs):
+    """Build a smoother by name ("one_euro" or "kalman")"""
+    return SMOOTHERS[name](**kwargs)
@@ -0,0 +1,61 @@
+import numpy as np
+
+# MediaPipe Pose always returns 33 landmarks, each with x, y, z and visibility
+NUM_LANDMARKS = 33
+LANDMARK_FIELDS = 4
+
+# All landmark names in MediaPipe Pose order, index i is landmark i
+LANDMARK_NAMES = (
+    "NOSE", "LEFT_EYE_INNER", "LEFT_EYE", "LEFT_EYE_OUTER",
+    "RIGHT_EYE_INNER", "RIGHT_EYE", "RIGHT_EYE_OUTER", "LEFT_EAR", "RIGHT_EAR",
+    "MOUTH_LEFT", "MOUTH_RIGHT", "LEFT_SHOULDER", "RIGHT_SHOULDER",
+    "LEFT_ELBOW", "RIGHT_ELBOW", "LEFT_WRIST", "RIGHT_WRIST",
+    "LEFT_PINKY", "RIGHT_PINKY", "LEFT_INDEX", "RIGHT_INDEX", "LEFT_THUMB", "RIGHT_THUMB",
+    "LEFT_HIP", "RIGHT_HIP", "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE",
+    "LEFT_HEEL", "RIGHT_HEEL", "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX"
+)
+
+# Key landmarks for posture analysis (indices in MediaPipe Pose)
+KEY_LANDMARKS = {
+    "LEFT_SHOULDER": 11,
+    "RIGHT_SHOULDER": 12,
+    "LEFT_HIP": 23,
+    "RIGHT_HIP": 24,
+    "LEFT_KNEE": 25,
+    "RIGHT_KNEE": 26,
+    "LEFT_ANKLE": 27,
+    "RIGHT_ANKLE": 28,
+    "NOSE": 0,
+    "LEFT_EAR": 7,
+    "RIGHT_EAR": 8,
+    "LEFT_WRIST": 15,
+    "RIGHT_WRIST": 16
+}
+
+# Integer codes for the "overall" posture and movement status, used by binary logs
+POSTURE_CODES = {
+    "no_detection": 0,
+    "normal": 1,
+    "insufficient_data": 2,
+    "issues_detected": 3
+}
+MOVEMENT_CODES = {
+    "normal": 0,
+    "movements_detected": 1
+}
+
+
+def landmarks_to_array(landmarks, out=None):
+    """
+    Copy MediaPipe landmark objects into a (33, 4) float32 array
+    laid out as x, y, z, visibility; rows without a landmark are NaN
+    """
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+    # One conversion of the whole list instead of a NumPy store per field
+    rows = [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks[:NUM_LANDMARKS]]
+    count = len(rows)
+    if count:
+        out[:count] = rows
+    out[count:] = np.nan
+    return out
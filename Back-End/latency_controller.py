@@ -0,0 +1,116 @@
+import logging
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (model_complexity, input scale) from most accurate to cheapest
+DEFAULT_LEVELS = [
+    (2, 1.0),
+    (1, 1.0),
+    (0, 1.0),
+    (0, 0.75),
+    (0, 0.5)
+]
+
+
+class AdaptivePoseEstimator:
+    """
+    Drop-in replacement for a MediaPipe Pose object that keeps per-frame inference
+    latency inside a budget. It steps down through DEFAULT_LEVELS (lower model_complexity,
+    then smaller input) while the rolling mean latency is over budget and steps back up
+    when there is headroom. One Pose instance per complexity is created and warmed up
+    front, so a switch never reloads a graph.
+    """
+
+    def __init__(self, budget_ms=66.0, levels=DEFAULT_LEVELS, window=30, headroom=0.6,
+                 cooldown_frames=60, pose_factory=None, **pose_kwargs):
+        self.budget_ms = budget_ms
+        self.levels = list(levels)
+        self.headroom = headroom
+        self.cooldown_frames = cooldown_frames
+        self.latencies = deque(maxlen=window)
+        self.level = 0
+        self.frames_since_switch = 0
+        self.switches = []
+
+        if pose_factory is None:
+            import mediapipe as mp
+            pose_factory = mp.solutions.pose.Pose
+        self.poses = {}
+        for complexity in sorted({complexity for complexity, _ in self.levels}):
+            self.poses[complexity] = pose_factory(model_complexity=complexity, **pose_kwargs)
+        self._warm_up()
+
+    def _warm_up(self):
+        """Run one blank frame through every instance so the first real frame is not slow"""
+        blank = np.zeros((256, 256, 3), dtype=np.uint8)
+        for pose in self.poses.values():
+            pose.process(blank)
+
+    @property
+    def model_complexity(self):
+        return self.levels[self.level][0]
+
+    @property
+    def input_scale(self):
+        return self.levels[self.level][1]
+
+    def process(self, image):
+        """Same contract as Pose.process: landmarks are normalized, so scaling needs no remapping"""
+        complexity, scale = self.levels[self.level]
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        start = time.perf_counter()
+        results = self.poses[complexity].process(image)
+        self.latencies.append((time.perf_counter() - start) * 1000.0)
+        self.frames_since_switch += 1
+
+        self._adapt()
+        return results
+
+    def _adapt(self):
+        if len(self.latencies) < self.latencies.maxlen:
+            return
+        mean_ms = sum(self.latencies) / len(self.latencies)
+        if mean_ms > self.budget_ms and self.level < len(self.levels) - 1:
+            self._switch(self.level + 1, mean_ms)
+        elif (mean_ms < self.budget_ms * self.headroom and self.level > 0
+              and self.frames_since_switch >= self.cooldown_frames):
+            self._switch(self.level - 1, mean_ms)
+
+    def _switch(self, level, mean_ms):
+        old_complexity, old_scale = self.levels[self.level]
+        new_complexity, new_scale = self.levels[level]
+        message = (f"Pose inference at {mean_ms:.1f} ms against a {self.budget_ms:.1f} ms budget: "
+                   f"model_complexity {old_complexity} -> {new_complexity}, "
+                   f"input scale {old_scale:.2f} -> {new_scale:.2f}")
+        if level > self.level:
+            logger.warning(message)
+        else:
+            logger.info(message)
+
+        self.switches.append({
+            "time": time.time(),
+            "from": self.levels[self.level],
+            "to": self.levels[level],
+            "mean_ms": mean_ms
+        })
+        self.level = level
+        self.latencies.clear()
+        self.frames_since_switch = 0
+
+    def reset(self):
+        """Drop the tracking state of every instance; the level reached so far is kept"""
+        for pose in self.poses.values():
+            pose.reset()
+        self.latencies.clear()
+        self.frames_since_switch = 0
+
+    def close(self):
+        for pose in self.poses.values():
+            pose.close()
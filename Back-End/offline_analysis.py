@@ -0,0 +1,151 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from landmark_log import FRAME_DTYPE, ColumnarLandmarkSink
+from tremor_analysis import SlidingDFTTremorAnalyzer
+from video_sources import FRAME_SOURCES, open_frame_source
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+BATCH_FRAMES = 16  # Frames handed to the detector per process_frames call
+
+# Detector owned by each worker process, built once by _init_worker
+_worker_detector = None
+
+
+def plan_chunks(frame_count, chunk_frames, warmup_frames):
+    """
+    Split [0, frame_count) into chunks. Each chunk starts decoding warmup_frames early
+    so movement history and pose tracking are settled when its own frames begin.
+    Returns a list of (warm_start, start, end).
+    """
+    chunks = []
+    for start in range(0, frame_count, chunk_frames):
+        end = min(start + chunk_frames, frame_count)
+        chunks.append((max(0, start - warmup_frames), start, end))
+    return chunks
+
+
+def _init_worker(detector_kwargs):
+    global _worker_detector
+    from PostureMovementDetector import PostureMovementDetector
+    _worker_detector = PostureMovementDetector(**detector_kwargs)
+
+
+def _analyze_chunk(path, chunk_index, warm_start, start, end, backend, stride, batch_frames=BATCH_FRAMES):
+    """Analyze frames [start, end) of a video and return them as FRAME_DTYPE records"""
+    detector = _worker_detector
+    detector.reset_history()
+
+    parts = []
+    frames, timestamps, numbers = [], [], []
+    source = open_frame_source(path, backend, stride=stride)
+    source.seek(warm_start)
+    fps = source.fps / stride
+    if detector.tremor_analyzer is not None and fps > 0 and detector.tremor_analyzer.fps != fps:
+        # Tremor bands are in Hz, so the analyzer must run at the rate frames are analyzed
+        detector.tremor_analyzer = SlidingDFTTremorAnalyzer(
+            fps=fps, visibility_threshold=detector.landmark_visibility_threshold)
+
+    def flush():
+        records = detector.process_frames(frames, timestamps, np.add(numbers, 1)).records()
+        # Warm-up frames only settle the history; they belong to the previous chunk
+        parts.append(records[np.asarray(numbers) >= start])
+        frames.clear()
+        timestamps.clear()
+        numbers.clear()
+
+    try:
+        for frame_rgb, timestamp, frame_number in source:
+            if frame_number >= end:
+                break
+            frames.append(frame_rgb)
+            timestamps.append(timestamp)
+            numbers.append(frame_number)
+            if len(frames) == batch_frames:
+                flush()
+        if frames:
+            flush()
+    finally:
+        source.close()
+
+    records = np.concatenate(parts) if parts else np.zeros(0, dtype=FRAME_DTYPE)
+    return chunk_index, records
+
+
+def probe_video(path, backend="opencv"):
+    """Return (frame_count, fps) of a video file"""
+    source = open_frame_source(path, backend)
+    frame_count, fps = source.frame_count, source.fps
+    source.close()
+    return frame_count, fps
+
+
+def analyze_videos(paths, workers=None, chunk_seconds=60.0, warmup_frames=30, detector_kwargs=None,
+                   backend="opencv", stride=1):
+    """
+    Analyze recorded videos in parallel. Every file is cut into chunks of chunk_seconds
+    which are spread over a process pool, then the per-frame records are merged back
+    in order. backend picks the decoder (see video_sources.FRAME_SOURCES) and stride
+    analyzes every n-th frame only. Timestamps are the frames' own presentation times.
+    Returns {path: FRAME_DTYPE records}.
+    """
+    for path in paths:
+        if not path.lower().endswith(VIDEO_EXTENSIONS):
+            raise ValueError(f"Invalid file type for {path}. Only {', '.join(VIDEO_EXTENSIONS)} are supported.")
+
+    jobs = []
+    for path in paths:
+        frame_count, fps = probe_video(path, backend)
+        # Whole strides per chunk, so chunk boundaries fall on analyzed frames
+        chunk_frames = max(1, int(chunk_seconds * fps) // stride) * stride
+        for chunk_index, (warm_start, start, end) in enumerate(plan_chunks(frame_count, chunk_frames,
+                                                                           warmup_frames * stride)):
+            jobs.append((path, chunk_index, warm_start, start, end, backend, stride))
+
+    chunks = {path: {} for path in paths}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(detector_kwargs or {},)) as pool:
+        futures = {pool.submit(_analyze_chunk, *job): job[0] for job in jobs}
+        for future in futures:
+            chunk_index, records = future.result()
+            chunks[futures[future]][chunk_index] = records
+
+    merged = {}
+    for path, parts in chunks.items():
+        ordered = [parts[i] for i in sorted(parts)]
+        merged[path] = np.concatenate(ordered) if ordered else np.zeros(0, dtype=FRAME_DTYPE)
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Analyze recorded videos for posture and movement in parallel')
+    parser.add_argument('videos', nargs='+', help='Recorded .mp4, .avi or .mov files')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--chunk_seconds', type=float, default=60.0, help='Length of each parallel chunk')
+    parser.add_argument('--warmup_frames', type=int, default=30, help='Frames decoded before each chunk to warm up history')
+    parser.add_argument('--output_dir', type=str, default='patient_data', help='Where the landmark logs are written')
+    parser.add_argument('--video_backend', type=str, default='opencv', choices=list(FRAME_SOURCES),
+                        help='Decoder; pyav decodes on FFmpeg threads straight to RGB')
+    parser.add_argument('--frame_stride', type=int, default=1, help='Analyze every n-th frame')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    started = time.time()
+    results = analyze_videos(args.videos, workers=args.workers, chunk_seconds=args.chunk_seconds,
+                             warmup_frames=args.warmup_frames, backend=args.video_backend,
+                             stride=args.frame_stride)
+
+    for path, records in results.items():
+        name = os.path.splitext(os.path.basename(path))[0]
+        log_path = os.path.join(args.output_dir, f"{name}.lmlog")
+        sink = ColumnarLandmarkSink(log_path, patient_id=name)
+        sink.write_records(records)
+        sink.close()
+        duration = float(records['timestamp'][-1]) if len(records) else 0.0
+        print(f"{path}: {len(records)} frames ({duration:.1f}s of video) -> {log_path}")
+
+    print(f"Finished in {time.time() - started:.2f} seconds")
@@ -0,0 +1,322 @@
+import time
+import warnings
+
+import numpy as np
+try:
+    import mediapipe as mp
+    from mediapipe.framework.formats import landmark_pb2
+except ImportError:
+    mp = None
+    landmark_pb2 = None
+
+from landmarks import KEY_LANDMARKS, NUM_LANDMARKS, LANDMARK_FIELDS
+
+# Stretcher area in normalized image coordinates (x0, y0, x1, y1) for a camera mounted
+# above the foot of the stretcher; adjust per ambulance
+DEFAULT_STRETCHER_REGION = (0.1, 0.3, 0.9, 0.95)
+
+_SHOULDERS = [KEY_LANDMARKS["LEFT_SHOULDER"], KEY_LANDMARKS["RIGHT_SHOULDER"]]
+_HIPS = [KEY_LANDMARKS["LEFT_HIP"], KEY_LANDMARKS["RIGHT_HIP"]]
+
+
+def pose_boxes(poses, min_visibility=0.5):
+    """(P, 4) x0, y0, x1, y1 boxes around the visible landmarks of (P, 33, 4) poses, NaN when none are visible"""
+    poses = np.asarray(poses)
+    visible = poses[:, :, 3:4] > min_visibility
+    points = np.where(visible, poses[:, :, :2], np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN poses give NaN boxes
+        return np.concatenate([np.nanmin(points, axis=1), np.nanmax(points, axis=1)], axis=1)
+
+
+def box_iou(a, b):
+    """(M, N) intersection over union of (M, 4) and (N, 4) boxes; 0 where either is NaN"""
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        iou = intersection / (area_a[:, None] + area_b[None, :] - intersection)
+    return np.nan_to_num(iou, nan=0.0)
+
+
+def keypoint_distance(a, b, min_visibility=0.5):
+    """
+    (M, N) mean image-plane distance between the landmarks two sets of poses both see,
+    divided by the diagonal of the first pose's box. inf where they share no landmark.
+    """
+    visible = (a[:, None, :, 3] > min_visibility) & (b[None, :, :, 3] > min_visibility)
+    delta = a[:, None, :, :2] - b[None, :, :, :2]
+    distance = np.sqrt(np.einsum('mnkj,mnkj->mnk', delta, delta))
+    shared = visible.sum(axis=2)
+    boxes = pose_boxes(a, min_visibility)
+    diagonal = np.hypot(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(visible, distance, 0.0).sum(axis=2) / shared
+        result = mean / diagonal[:, None]
+    return np.where(shared > 0, np.nan_to_num(result, nan=np.inf), np.inf)
+
+
+class PersonTrack:
+    """One person followed across frames"""
+
+    __slots__ = ('track_id', 'landmarks', 'box', 'hits', 'missing')
+
+    def __init__(self, track_id, landmarks, box):
+        self.track_id = track_id
+        self.landmarks = landmarks  # (33, 4) from the last frame the person was seen
+        self.box = box
+        self.hits = 1  # frames the person was matched in
+        self.missing = 0  # frames since the person was last matched
+
+
+class PersonTracker:
+    """
+    Gives every detected person a stable id across frames. Detections are matched to
+    the existing tracks greedily, best pair first, by box IoU (match="iou") or by the
+    normalized mean landmark distance (match="keypoints"), which holds up better when
+    people overlap. A track that finds no match for max_missing frames is dropped.
+    """
+
+    def __init__(self, match="iou", iou_threshold=0.3, max_distance=0.5, max_missing=15, min_visibility=0.5):
+        if match not in ("iou", "keypoints"):
+            raise ValueError(f"Unknown match method {match}")
+        self.match = match
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance  # In box diagonals, for match="keypoints"
+        self.max_missing = max_missing
+        self.min_visibility = min_visibility
+        self.tracks = []
+        self.next_id = 1
+
+    def reset(self):
+        self.tracks = []
+
+    def _affinity(self, poses, boxes):
+        """(T, P) match quality of every track with every detection, -inf where they may not match"""
+        if self.match == "iou":
+            track_boxes = np.array([track.box for track in self.tracks])
+            affinity = box_iou(track_boxes, boxes)
+            return np.where(affinity >= self.iou_threshold, affinity, -np.inf)
+        track_poses = np.array([track.landmarks for track in self.tracks])
+        distance = keypoint_distance(track_poses, poses, self.min_visibility)
+        return np.where(distance <= self.max_distance, -distance, -np.inf)
+
+    def update(self, poses):
+        """Match this frame's (P, 33, 4) poses to the tracks. Returns the tracks seen in this frame"""
+        poses = np.asarray(poses, dtype=np.float32).reshape(-1, NUM_LANDMARKS, LANDMARK_FIELDS)
+        boxes = pose_boxes(poses, self.min_visibility)
+        # A pose without visible landmarks cannot be placed
+        usable = ~np.isnan(boxes[:, 0])
+        assigned = np.full(len(poses), -1)
+
+        if self.tracks and usable.any():
+            affinity = self._affinity(poses, boxes)
+            affinity[:, ~usable] = -np.inf
+            candidates = np.count_nonzero(affinity > -np.inf)
+            order = np.argsort(-affinity, axis=None)[:candidates]
+            for t, p in zip(*(index.tolist() for index in np.unravel_index(order, affinity.shape))):
+                if assigned[p] >= 0 or self.tracks[t].missing < 0:
+                    continue
+                track = self.tracks[t]
+                track.landmarks = poses[p]
+                track.box = boxes[p]
+                track.hits += 1
+                track.missing = -1  # Marks the track as matched in this frame
+                assigned[p] = t
+
+        for track in self.tracks:
+            track.missing = 0 if track.missing < 0 else track.missing + 1
+        self.tracks = [track for track in self.tracks if track.missing <= self.max_missing]
+
+        for p in np.flatnonzero(usable & (assigned < 0)):
+            self.tracks.append(PersonTrack(self.next_id, poses[p], boxes[p]))
+            self.next_id += 1
+        return [track for track in self.tracks if track.missing == 0]
+
+
+def _lying(poses):
+    """How horizontal the torso is: 1 for a shoulder-to-hip line along x, 0 along y"""
+    torso = poses[:, _HIPS, :2].mean(axis=1) - poses[:, _SHOULDERS, :2].mean(axis=1)
+    length = np.hypot(torso[:, 0], torso[:, 1])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nan_to_num(np.abs(torso[:, 0]) / length)
+
+
+def stretcher_score(poses, boxes, region=DEFAULT_STRETCHER_REGION, min_visibility=0.5):
+    """Share of the visible landmarks inside the stretcher region, weighted towards people lying down"""
+    x, y = poses[:, :, 0], poses[:, :, 1]
+    visible = poses[:, :, 3] > min_visibility
+    inside = visible & (x >= region[0]) & (x <= region[2]) & (y >= region[1]) & (y <= region[3])
+    share = inside.sum(axis=1) / np.maximum(visible.sum(axis=1), 1)
+    return share * (0.5 + 0.5 * _lying(poses))
+
+
+def lying_score(poses, boxes, **kwargs):
+    return _lying(poses)
+
+
+def largest_score(poses, boxes, **kwargs):
+    return np.nan_to_num((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]))
+
+
+PATIENT_POLICIES = {
+    "stretcher": stretcher_score,
+    "lying": lying_score,
+    "largest": largest_score
+}
+
+
+class _Landmark:
+    """Stand-in for a MediaPipe NormalizedLandmark when mediapipe is not installed"""
+
+    __slots__ = ('x', 'y', 'z', 'visibility')
+
+    def __init__(self, x, y, z, visibility):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.visibility = visibility
+
+
+class _LandmarkList:
+    __slots__ = ('landmark',)
+
+    def __init__(self, landmark):
+        self.landmark = landmark
+
+
+class PoseResult:
+    """What Pose.process returns, for the patient only"""
+
+    __slots__ = ('pose_landmarks',)
+
+    def __init__(self, pose_landmarks=None):
+        self.pose_landmarks = pose_landmarks
+
+
+def landmark_list(landmarks):
+    """A (33, 4) array as a MediaPipe NormalizedLandmarkList, so the drawing utilities accept it"""
+    rows = landmarks.tolist()
+    if landmark_pb2 is None:
+        return _LandmarkList([_Landmark(*row) for row in rows])
+    return landmark_pb2.NormalizedLandmarkList(
+        landmark=[landmark_pb2.NormalizedLandmark(x=x, y=y, z=z, visibility=v) for x, y, z, v in rows])
+
+
+class MediaPipeMultiPose:
+    """
+    MediaPipe Tasks PoseLandmarker in video mode, returning every detected person.
+    model_path is a pose_landmarker_{lite,full,heavy}.task bundle. process_all(rgb_image)
+    returns a list of (33, 4) float32 arrays.
+    """
+
+    def __init__(self, model_path, num_poses=4, min_pose_detection_confidence=0.5,
+                 min_pose_presence_confidence=0.5, min_tracking_confidence=0.5):
+        if mp is None:
+            raise ImportError("mediapipe is required for multi-person pose estimation")
+        vision = mp.tasks.vision
+        options = vision.PoseLandmarkerOptions(
+            base_options=mp.tasks.BaseOptions(model_asset_path=model_path),
+            running_mode=vision.RunningMode.VIDEO,
+            num_poses=num_poses,
+            min_pose_detection_confidence=min_pose_detection_confidence,
+            min_pose_presence_confidence=min_pose_presence_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        self.landmarker = vision.PoseLandmarker.create_from_options(options)
+        self.start_time = time.monotonic()
+        self.last_timestamp_ms = -1
+
+    def process_all(self, image):
+        # Video mode needs strictly increasing timestamps
+        timestamp_ms = max(int((time.monotonic() - self.start_time) * 1000), self.last_timestamp_ms + 1)
+        self.last_timestamp_ms = timestamp_ms
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=np.ascontiguousarray(image))
+        result = self.landmarker.detect_for_video(mp_image, timestamp_ms)
+        poses = []
+        for person in result.pose_landmarks:
+            poses.append(np.array([(lm.x, lm.y, lm.z, lm.visibility or 0.0) for lm in person], dtype=np.float32))
+        return poses
+
+    def close(self):
+        self.landmarker.close()
+
+
+class PatientPoseEstimator:
+    """
+    Runs a multi-person estimator (anything with process_all(rgb_image) returning (33, 4)
+    arrays), tracks everyone with a PersonTracker and returns only the patient's
+    landmarks in the MediaPipe Pose result form, so the detector's history and analysis
+    never see anyone else. Bystanders cost one box and one row of the match matrix each.
+
+    The patient is the tracked person with the best policy score (see PATIENT_POLICIES)
+    of at least min_score; with the stretcher policy someone standing scores at most 0.5.
+    Once chosen they stay the patient for as long as their track
+    lives, so a paramedic leaning over the stretcher does not take over. patient_changed
+    is True after a frame in which a different person became the patient.
+    """
+
+    def __init__(self, multi_pose, tracker=None, policy="stretcher", min_score=0.6, **policy_kwargs):
+        self.multi_pose = multi_pose
+        self.tracker = tracker or PersonTracker()
+        self.policy = PATIENT_POLICIES[policy] if isinstance(policy, str) else policy
+        self.policy_kwargs = policy_kwargs  # e.g. region=(x0, y0, x1, y1) for "stretcher"
+        self.min_score = min_score
+
+        self.patient_id = None
+        self.patient_changed = False
+
+        # Statistics
+        self.frames = 0
+        self.people_seen = 0
+        self.patient_frames = 0
+        self.patient_switches = 0
+
+    def _select(self, tracks):
+        if self.patient_id is not None:
+            if any(track.track_id == self.patient_id for track in self.tracker.tracks):
+                return self.patient_id
+        if not tracks:
+            return None
+        poses = np.array([track.landmarks for track in tracks])
+        boxes = np.array([track.box for track in tracks])
+        scores = self.policy(poses, boxes, **self.policy_kwargs)
+        best = int(np.argmax(scores))
+        return tracks[best].track_id if scores[best] >= self.min_score else None
+
+    def process(self, image):
+        poses = self.multi_pose.process_all(image)
+        tracks = self.tracker.update(poses)
+        self.frames += 1
+        self.people_seen += len(tracks)
+
+        patient_id = self._select(tracks)
+        self.patient_changed = patient_id is not None and patient_id != self.patient_id
+        if self.patient_changed:
+            if self.patient_id is not None:
+                self.patient_switches += 1
+            self.patient_id = patient_id
+
+        for track in tracks:
+            if track.track_id == self.patient_id:
+                self.patient_frames += 1
+                return PoseResult(landmark_list(track.landmarks))
+        # The patient is not visible in this frame (their track may still come back)
+        return PoseResult()
+
+    @property
+    def mean_people(self):
+        return self.people_seen / self.frames if self.frames else 0.0
+
+    def reset(self):
+        self.tracker.reset()
+        self.patient_id = None
+        self.patient_changed = False
+
+    def close(self):
+        if hasattr(self.multi_pose, 'close'):
+            self.multi_pose.close()
@@ -1,68 +1,288 @@
-import cv2
-import mediapipe as mp
-import time
+import argparse
+import asyncio
 import csv
+import queue
+import threading
+import time
+
+import cv2
+try:
+    import mediapipe as mp
+except ImportError:
+    mp = None
+
+from landmarks import NUM_LANDMARKS, landmarks_to_array
+
+# One row per frame: timestamp followed by x, y, z, visibility of every landmark
+WIDE_FIELDNAMES = ['timestamp'] + [f'{field}_{landmark_id}' for landmark_id in range(NUM_LANDMARKS)
+                                   for field in ('x', 'y', 'z', 'visibility')]
+
+_END = object()  # Queued after the last frame of the source
+
+
+class LandmarkStream:
+    """
+    One consumer's view of a LandmarkProducer: a bounded queue of (timestamp, (33, 4)
+    float32 array) items, readable with a for loop or an async for loop. While the
+    queue is full the producer waits, so a slow consumer holds back capture instead of
+    having frames pile up.
+    """
+
+    def __init__(self, producer, buffer_size):
+        self.producer = producer
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.closed = False
+
+    def get(self, timeout=None):
+        """
+        Next item, or None once the source is exhausted or the stream was closed, or when
+        nothing arrived within timeout seconds (closed tells the cases apart)
+        """
+        if self.closed:
+            return None
+        try:
+            item = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is _END:
+            self.closed = True
+            return None
+        return item
+
+    def _put_end(self):
+        """Queue the end marker, making room for it if the consumer stopped reading"""
+        while True:
+            try:
+                self.queue.put_nowait(_END)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def close(self):
+        """Stop receiving items; the producer no longer waits for this stream"""
+        self.closed = True
+        self.producer._unsubscribe(self)
+        # Wakes a get() still blocked on another thread, e.g. the one of a cancelled async for
+        self._put_end()
+
+    def __iter__(self):
+        try:
+            while True:
+                item = self.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.close()
+
+    async def __aiter__(self):
+        try:
+            while True:
+                # The blocking get runs on a worker thread so the event loop stays free
+                item = await asyncio.to_thread(self.get)
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.close()
+
+
+class LandmarkProducer:
+    """
+    Reads a camera or video file on a background thread, runs MediaPipe Pose and hands
+    (timestamp, (33, 4) float32 array) items to every subscribed LandmarkStream. The
+    camera is only opened by start(), which the first iteration calls, so importing
+    this module or building a producer has no side effects. Frames without a
+    detection are skipped, like the original capture script. Camera frames are
+    stamped with the time since start, video files with their position in the file.
+    With preview=True, preview_frame holds the latest frame with the pose and FPS
+    drawn on it, for the caller to show on its own (GUI) thread.
+    """
+
+    def __init__(self, source=0, pose=None, buffer_size=8, log_path=None, preview=False, **pose_kwargs):
+        self.source = source  # Camera index or video path
+        self.pose = pose  # Anything with a MediaPipe-style process(rgb_image); built on start() if None
+        self.owns_pose = False  # Only a pose built here is closed by stop()
+        self.buffer_size = buffer_size
+        self.log_path = log_path  # Wide frame-major CSV, see WIDE_FIELDNAMES
+        self.preview = preview
+        self.preview_frame = None
+        self.pose_kwargs = pose_kwargs
+
+        self.cap = None
+        self.streams = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.frames_read = 0
+        self.frames_produced = 0
+
+    def subscribe(self, buffer_size=None):
+        """A new consumer stream; it receives items produced from now on"""
+        stream = LandmarkStream(self, buffer_size or self.buffer_size)
+        with self.lock:
+            self.streams.append(stream)
+        return stream
+
+    def _unsubscribe(self, stream):
+        with self.lock:
+            if stream in self.streams:
+                self.streams.remove(stream)
+
+    def start(self):
+        """Open the source and start producing. Calling it again is a no-op"""
+        if self.thread is not None:
+            return self
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open video source {self.source}")
+        if self.pose is None:
+            if mp is None:
+                raise ImportError("mediapipe is required unless a pose estimator is given")
+            self.pose = mp.solutions.pose.Pose(**self.pose_kwargs)
+            self.owns_pose = True
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _publish(self, item):
+        """Hand item to every stream, waiting on full ones. False once stop() was called"""
+        with self.lock:
+            streams = list(self.streams)
+        for stream in streams:
+            while not stream.closed:
+                try:
+                    stream.queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self.stop_event.is_set():
+                        return False
+        return not self.stop_event.is_set()
+
+    def _run(self):
+        log_file = open(self.log_path, 'w', newline='') if self.log_path else None
+        writer = None
+        if log_file is not None:
+            writer = csv.writer(log_file)
+            writer.writerow(WIDE_FIELDNAMES)
+
+        # Video files carry their own time base; processing speed must not change it
+        from_file = not isinstance(self.source, int)
+        start_time = time.monotonic()
+        prev_time = None
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.frames_read += 1
+                if from_file:
+                    timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                else:
+                    timestamp = time.monotonic() - start_time
+
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # MediaPipe expects RGB
+                results = self.pose.process(frame_rgb)
+                if self.preview:
+                    now = time.monotonic()
+                    self.preview_frame = self._draw_preview(frame, results, now - prev_time if prev_time else 0)
+                    prev_time = now
+                if not results.pose_landmarks:
+                    continue
+
+                landmarks = landmarks_to_array(results.pose_landmarks.landmark)
+                if writer is not None:
+                    writer.writerow([timestamp, *landmarks.ravel().tolist()])
+                self.frames_produced += 1
+                if not self._publish((timestamp, landmarks)):
+                    break
+        finally:
+            if log_file is not None:
+                log_file.close()
+            with self.lock:
+                streams = list(self.streams)
+            for stream in streams:
+                stream._put_end()
+
+    def _draw_preview(self, frame, results, frame_seconds):
+        if results.pose_landmarks and mp is not None:
+            mp.solutions.drawing_utils.draw_landmarks(frame, results.pose_landmarks,
+                                                      mp.solutions.pose.POSE_CONNECTIONS)
+        fps = 1 / frame_seconds if frame_seconds else 0
+        cv2.putText(frame, f'FPS: {int(fps)}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX,
+                    1, (0, 255, 0), 2, cv2.LINE_AA)
+        return frame
+
+    def stop(self):
+        """Stop producing and release the camera, and the pose estimator if it was built here"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        if self.owns_pose and hasattr(self.pose, 'close'):
+            self.pose.close()
+            self.pose = None
+            self.owns_pose = False
+
+    def __iter__(self):
+        stream = self.subscribe()
+        self.start()
+        return iter(stream)
+
+    def __aiter__(self):
+        stream = self.subscribe()
+        self.start()
+        return stream.__aiter__()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    async def __aenter__(self):
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await asyncio.to_thread(self.stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Capture MediaPipe Pose landmarks to a CSV file')
+    parser.add_argument('--camera', type=int, default=1,
+                        help='Webcam index (0, 1, 2...); the original setup used 1 but the default is usually 0')
+    parser.add_argument('--video_path', type=str, default=None, help='Read a video file instead of the webcam')
+    parser.add_argument('--output', type=str, default='landmarks_data.csv', help='Wide frame-major CSV to write')
+    parser.add_argument('--max_frames', type=int, default=None, help='Stop after this many detected frames')
+    parser.add_argument('--preview', action='store_true', help="Show the feed with the pose drawn; 'q' quits")
+    args = parser.parse_args()
 
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose()  
-
-cap = cv2.VideoCapture(1) # Find and use the index for your webcam (0, 1, 2...)
-                          # mine is at 1 but the default is usually 0
-
-# Check webcam
-if not cap.isOpened():
-    print("Error: Could not open camera.")
-    exit()
-
-# Open a CSV file to store the landmarks
-with open('landmarks_data.csv', 'w', newline='') as csvfile:
-    fieldnames = ['timestamp', 'landmark_id', 'x', 'y', 'z']
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    start_time = time.time()
-    prev_time = 0
-
-    writer.writeheader()
-    
-    while True:
-        # Capture frame-by-frame
-        ret, frame = cap.read()
-
-        if not ret:
-            print("Error: Couldn't read frame.")
-            break
-
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) # Converting to rgb for MediaPipe Compatibility
-       
-        results = pose.process(frame_rgb)
-
-        if results.pose_landmarks:
-            timestamp = time.time() - start_time  # Get the current timestamp
-
-            for landmark_id, landmark in enumerate(results.pose_landmarks.landmark):
-                # Write the landmark data to a CSV
-                writer.writerow({
-                    'timestamp': timestamp,
-                    'landmark_id': landmark_id,
-                    'x': landmark.x,
-                    'y': landmark.y,
-                    'z': landmark.z
-                })
-
-            # Draw the landmarks on the frame
-            mp.solutions.drawing_utils.draw_landmarks(frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-
-        # calculte and displaying the fps on the frame
-        current_time = time.time()
-        fps = 1 / (current_time - prev_time) if prev_time else 0
-        prev_time = current_time  
-        cv2.putText(frame, f'FPS: {int(fps)}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-        1, (0, 255, 0), 2, cv2.LINE_AA)
-
-        cv2.imshow('Webcam Feed with MediaPipe Pose', frame) # display the frame
-
-        # Quit when 'q' is pressed
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-cap.release()
-cv2.destroyAllWindows()
+    producer = LandmarkProducer(args.video_path or args.camera, log_path=args.output, preview=args.preview)
+    count = 0
+    start = time.monotonic()
+    try:
+        for timestamp, landmarks in producer:
+            count += 1
+            if count % 30 == 0:
+                print(f"{count} frames, {count / (time.monotonic() - start):.1f} fps")
+            if args.max_frames is not None and count >= args.max_frames:
+                break
+            if args.preview and producer.preview_frame is not None:
+                cv2.imshow('Webcam Feed with MediaPipe Pose', producer.preview_frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+    except KeyboardInterrupt:
+        print("Capture stopped by user")
+    finally:
+        producer.stop()
+        if args.preview:
+            cv2.destroyAllWindows()
+    print(f"Wrote {count} frames to {args.output}")
@@ -0,0 +1,254 @@
+import argparse
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Settings of the detector's own Pose instance
+DEFAULT_POSE_KWARGS = {
+    "min_detection_confidence": 0.7,
+    "min_tracking_confidence": 0.7,
+    "model_complexity": 2
+}
+
+
+def mediapipe_pose_factory(**pose_kwargs):
+    """Factory for PoseEstimatorPool building MediaPipe Pose instances with pose_kwargs"""
+    import mediapipe as mp
+    kwargs = dict(DEFAULT_POSE_KWARGS, **pose_kwargs)
+    return lambda: mp.solutions.pose.Pose(**kwargs)
+
+
+class PoseEstimatorPool:
+    """
+    Pose estimators loaded once and handed out per session. Loading a MediaPipe Pose
+    graph with model_complexity=2 takes seconds; the pool pays that for size instances
+    up front (each also runs one blank frame, so its first real frame is not slow) and
+    acquire() then returns a warm one immediately. release() resets the instance's
+    tracking state (estimator.reset(), e.g. Pose.reset() restarts the graph without
+    reloading the model) so the next patient is not tracked from where the last one was.
+    Up to max_size instances are created on demand once all are busy; beyond that
+    acquire() waits. stats() reports how busy the pool is.
+    factory is a callable returning a new estimator, by default a MediaPipe Pose with
+    DEFAULT_POSE_KWARGS updated by pose_kwargs.
+    """
+
+    def __init__(self, size=1, max_size=None, factory=None, warm_up=True, **pose_kwargs):
+        self.factory = factory or mediapipe_pose_factory(**pose_kwargs)
+        self.max_size = max(size, max_size or size)
+        self.warm_up = warm_up
+        self.condition = threading.Condition()
+        self.idle = deque()
+        self.busy = {}  # id(estimator) -> time it was acquired
+        self.pending = 0  # Instances being created on demand
+        self.closed = False
+        self.created_at = time.monotonic()
+
+        # Statistics
+        self.created = 0
+        self.created_on_demand = 0
+        self.peak_in_use = 0
+        self.acquisitions = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.resets = 0
+        self.reset_seconds = 0.0
+        self.load_seconds = 0.0
+
+        for _ in range(size):
+            self.idle.append(self._create())
+
+    def _create(self):
+        start = time.perf_counter()
+        estimator = self.factory()
+        if self.warm_up:
+            estimator.process(np.zeros((256, 256, 3), dtype=np.uint8))
+        with self.condition:
+            self.load_seconds += time.perf_counter() - start
+            self.created += 1
+        return estimator
+
+    def acquire(self, timeout=None):
+        """A warm estimator for one session. Raises TimeoutError if none frees up within timeout seconds"""
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        waited = False
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise ValueError("Pose estimator pool is closed")
+                if self.idle:
+                    estimator = self.idle.popleft()
+                    break
+                if self.created + self.pending < self.max_size:
+                    # Reserve the slot, then load outside the lock so releases are not held up
+                    self.pending += 1
+                    estimator = None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No pose estimator free within {timeout} s "
+                                       f"({len(self.busy)} of {self.max_size} in use)")
+                waited = True
+                self.condition.wait(remaining)
+        wait_seconds = time.monotonic() - start
+
+        created = estimator is None
+        if created:
+            try:
+                estimator = self._create()
+            finally:
+                with self.condition:
+                    self.pending -= 1
+            logger.info(f"Pose estimator pool grew to {self.created} instances")
+
+        with self.condition:
+            self.busy[id(estimator)] = time.monotonic()
+            self.created_on_demand += created
+            self.acquisitions += 1
+            self.waits += waited
+            self.wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+            self.peak_in_use = max(self.peak_in_use, len(self.busy))
+        return estimator
+
+    def release(self, estimator):
+        """Reset estimator's tracking state and return it to the pool"""
+        with self.condition:
+            acquired = self.busy.pop(id(estimator), None)
+            if acquired is None:
+                raise ValueError("Estimator was not acquired from this pool")
+            self.busy_seconds += time.monotonic() - acquired
+
+        start = time.perf_counter()
+        try:
+            if hasattr(estimator, 'reset'):
+                estimator.reset()
+        except Exception as e:
+            # Do not hand a half-reset graph to the next patient
+            logger.error(f"Discarding pose estimator that failed to reset: {e}")
+            with self.condition:
+                self.created -= 1
+                self.condition.notify()
+            _close(estimator)
+            return
+        reset_seconds = time.perf_counter() - start
+
+        with self.condition:
+            self.resets += 1
+            self.reset_seconds += reset_seconds
+            if self.closed:
+                _close(estimator)
+            else:
+                self.idle.append(estimator)
+                self.condition.notify()
+
+    @contextmanager
+    def session(self, timeout=None):
+        """with pool.session() as pose: ... acquires an estimator and always releases it"""
+        estimator = self.acquire(timeout)
+        try:
+            yield estimator
+        finally:
+            self.release(estimator)
+
+    @property
+    def in_use(self):
+        return len(self.busy)
+
+    def stats(self):
+        """Pool size and utilisation; utilisation is the share of estimator time spent in sessions"""
+        with self.condition:
+            now = time.monotonic()
+            busy_seconds = self.busy_seconds + sum(now - acquired for acquired in self.busy.values())
+            capacity_seconds = self.created * (now - self.created_at)
+            return {
+                "size": self.created,
+                "max_size": self.max_size,
+                "in_use": len(self.busy),
+                "idle": len(self.idle),
+                "peak_in_use": self.peak_in_use,
+                "acquisitions": self.acquisitions,
+                "created_on_demand": self.created_on_demand,
+                "waits": self.waits,
+                "mean_wait_ms": self.wait_seconds * 1000.0 / self.acquisitions if self.acquisitions else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000.0,
+                "mean_reset_ms": self.reset_seconds * 1000.0 / self.resets if self.resets else 0.0,
+                "load_seconds": self.load_seconds,
+                "utilisation": busy_seconds / capacity_seconds if capacity_seconds > 0 else 0.0
+            }
+
+    def format_stats(self):
+        stats = self.stats()
+        return (f"Pose pool: {stats['in_use']}/{stats['size']} in use (peak {stats['peak_in_use']}, "
+                f"max {stats['max_size']}), {stats['acquisitions']} sessions, {stats['waits']} waited "
+                f"(mean {stats['mean_wait_ms']:.1f} ms, max {stats['max_wait_ms']:.1f} ms), "
+                f"reset {stats['mean_reset_ms']:.1f} ms, loading took {stats['load_seconds']:.2f} s, "
+                f"utilisation {stats['utilisation']:.0%}")
+
+    def close(self):
+        """Close the idle estimators; busy ones are closed when they are released"""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = list(self.idle), deque()
+            self.condition.notify_all()
+        for estimator in idle:
+            _close(estimator)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _close(estimator):
+    if hasattr(estimator, 'close'):
+        estimator.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool(size=1, max_size=None, **pose_kwargs):
+    """
+    The process-wide pool of detector Pose instances, created on the first call. Call
+    it at process start (e.g. server startup) so the models are loaded before the
+    first session; later calls return the same pool and ignore their arguments.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = PoseEstimatorPool(size=size, max_size=max_size, **pose_kwargs)
+        return _default_pool
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare cold Pose construction with sessions from a warm pool')
+    parser.add_argument('--size', type=int, default=2, help='Estimators loaded up front')
+    parser.add_argument('--sessions', type=int, default=5, help='Sessions to run against the pool')
+    parser.add_argument('--model_complexity', type=int, default=2, choices=[0, 1, 2])
+    args = parser.parse_args()
+
+    factory = mediapipe_pose_factory(model_complexity=args.model_complexity)
+    start = time.perf_counter()
+    factory().close()
+    print(f"Cold Pose construction: {time.perf_counter() - start:.2f} s")
+
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    with PoseEstimatorPool(size=args.size, factory=factory) as pool:
+        for session in range(args.sessions):
+            start = time.perf_counter()
+            with pool.session() as pose:
+                acquired = time.perf_counter() - start
+                pose.process(frame)
+            print(f"Session {session}: acquired in {acquired * 1000.0:.2f} ms")
+        print(pool.format_stats())
@@ -0,0 +1,96 @@
+import numpy as np
+
+from landmarks import KEY_LANDMARKS, NUM_LANDMARKS, POSTURE_CODES, MOVEMENT_CODES
+
+REQUIRED_POSTURE_LANDMARKS = ["LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_HIP", "RIGHT_HIP",
+                              "NOSE", "LEFT_EAR", "RIGHT_EAR"]
+
+_REQUIRED = np.array([KEY_LANDMARKS[name] for name in REQUIRED_POSTURE_LANDMARKS])
+_KEY = np.array(list(KEY_LANDMARKS.values()))
+_WRISTS = np.array([KEY_LANDMARKS["LEFT_WRIST"], KEY_LANDMARKS["RIGHT_WRIST"]])
+_OTHER_KEY = np.array([idx for idx in _KEY if idx not in _WRISTS])
+
+_POSTURE_NAMES = {code: name for name, code in POSTURE_CODES.items()}
+_MOVEMENT_NAMES = {code: name for name, code in MOVEMENT_CODES.items()}
+
+
+def assess_posture_batch(landmarks, visibility_threshold=0.5, shoulder_limit=0.05, hip_limit=0.05,
+                         head_forward_limit=0.1):
+    """
+    Array form of PostureMovementDetector.assess_posture.
+    landmarks is (N, 33, 4) with NaN rows for frames without a detection.
+    Returns (codes, masks): codes is (N,) uint8 from POSTURE_CODES and masks holds (N,) booleans
+    "sufficient", "shoulders_uneven", "hips_uneven" and "forward_head". The check masks
+    are only meaningful where "sufficient" is True.
+    """
+    landmarks = np.asarray(landmarks)
+    k = KEY_LANDMARKS
+    x = landmarks[:, :, 0]
+    y = landmarks[:, :, 1]
+
+    detected = ~np.isnan(landmarks[:, 0, 3])
+    sufficient = np.all(landmarks[:, _REQUIRED, 3] > visibility_threshold, axis=1)
+    with np.errstate(invalid='ignore'):
+        shoulders = np.abs(y[:, k["LEFT_SHOULDER"]] - y[:, k["RIGHT_SHOULDER"]]) > shoulder_limit
+        hips = np.abs(y[:, k["LEFT_HIP"]] - y[:, k["RIGHT_HIP"]]) > hip_limit
+        head = x[:, k["NOSE"]] - (x[:, k["LEFT_SHOULDER"]] + x[:, k["RIGHT_SHOULDER"]]) / 2 > head_forward_limit
+
+    codes = np.where(detected, POSTURE_CODES["insufficient_data"], POSTURE_CODES["no_detection"]).astype(np.uint8)
+    issues = shoulders | hips | head
+    codes[sufficient & issues] = POSTURE_CODES["issues_detected"]
+    codes[sufficient & ~issues] = POSTURE_CODES["normal"]
+
+    masks = {
+        "sufficient": sufficient,
+        "shoulders_uneven": shoulders,
+        "hips_uneven": hips,
+        "forward_head": head
+    }
+    return codes, masks
+
+
+def detect_involuntary_movements_batch(movement_scores, landmarks, visibility_threshold=0.5,
+                                       movement_threshold=0.01):
+    """
+    Array form of PostureMovementDetector.detect_involuntary_movements.
+    movement_scores is (N, 33) and landmarks (N, 33, 4); only key landmarks visible in
+    their frame are considered, like the per-frame score dict.
+    Returns (codes, masks): codes is (N,) uint8 from MOVEMENT_CODES and
+    masks["significant_movement"] is an (N, 33) boolean array.
+    """
+    movement_scores = np.asarray(movement_scores)
+    visible = np.asarray(landmarks)[:, :, 3] > visibility_threshold
+
+    significant = np.zeros(movement_scores.shape, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        # Wrists use the base threshold, every other key landmark twice that
+        significant[:, _WRISTS] = visible[:, _WRISTS] & (movement_scores[:, _WRISTS] > movement_threshold)
+        significant[:, _OTHER_KEY] = visible[:, _OTHER_KEY] & (movement_scores[:, _OTHER_KEY] > movement_threshold * 2)
+
+    codes = np.where(significant.any(axis=1), MOVEMENT_CODES["movements_detected"],
+                     MOVEMENT_CODES["normal"]).astype(np.uint8)
+    return codes, {"significant_movement": significant}
+
+
+def posture_status_dict(codes, masks, i=0):
+    """Frame i of assess_posture_batch output in the dict form of assess_posture"""
+    overall = _POSTURE_NAMES[int(codes[i])]
+    status = {"overall": overall}
+    if overall in ("issues_detected", "normal"):
+        if masks["shoulders_uneven"][i]:
+            status["shoulders"] = "uneven"
+        if masks["hips_uneven"][i]:
+            status["hips"] = "uneven"
+        if masks["forward_head"][i]:
+            status["head"] = "forward_posture"
+    return status
+
+
+def movement_status_dict(codes, masks, i=0, key_landmarks=KEY_LANDMARKS):
+    """Frame i of detect_involuntary_movements_batch output in the dict form of detect_involuntary_movements"""
+    status = {"overall": _MOVEMENT_NAMES[int(codes[i])]}
+    significant = masks["significant_movement"][i]
+    for name, idx in key_landmarks.items():
+        if idx < NUM_LANDMARKS and significant[idx]:
+            status[name] = "significant_movement"
+    return status
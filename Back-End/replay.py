@@ -0,0 +1,247 @@
+import argparse
+import csv
+import itertools
+import json
+import time
+
+import numpy as np
+
+from landmark_log import LandmarkLogReader
+from landmarks import KEY_LANDMARKS, NUM_LANDMARKS, LANDMARK_FIELDS, POSTURE_CODES, MOVEMENT_CODES
+from posture_rules import assess_posture_batch, detect_involuntary_movements_batch
+from rule_engine import RuleSet
+
+# Defaults of the live detector
+DEFAULT_SETTINGS = {
+    "movement_threshold": 0.01,
+    "visibility_threshold": 0.5,
+    "shoulder_limit": 0.05,
+    "hip_limit": 0.05,
+    "head_forward_limit": 0.1
+}
+
+
+def load_session(path):
+    """
+    Load a recorded session as (timestamps, landmarks). landmarks is (N, 33, 4) with NaN
+    rows for frames without a detection. Accepts binary .lmlog and .lmz files and the CSV
+    layout (which only holds key landmarks; the others stay NaN).
+    """
+    if not path.endswith('.csv'):
+        reader = LandmarkLogReader(path)
+        timestamps = np.array(reader.timestamps, dtype=np.float64)
+        landmarks = np.array(reader.landmarks, dtype=np.float32)
+        reader.close()
+        return timestamps, landmarks
+
+    rows = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            frame = int(row['frame'])
+            if frame not in rows:
+                rows[frame] = (float(row['timestamp']), [])
+            rows[frame][1].append((int(row['landmark_id']), float(row['x']), float(row['y']),
+                                   float(row['z']), float(row['visibility'])))
+    frames = sorted(rows)
+    timestamps = np.array([rows[frame][0] for frame in frames], dtype=np.float64)
+    landmarks = np.full((len(frames), NUM_LANDMARKS, LANDMARK_FIELDS), np.nan, dtype=np.float32)
+    for i, frame in enumerate(frames):
+        for idx, x, y, z, visibility in rows[frame][1]:
+            landmarks[i, idx] = (x, y, z, visibility)
+    # Key landmarks missing from a CSV frame were below the visibility threshold
+    key = list(KEY_LANDMARKS.values())
+    missing = np.isnan(landmarks[:, key, 3])
+    landmarks[:, key, 3] = np.where(missing, 0.0, landmarks[:, key, 3])
+    return timestamps, landmarks
+
+
+def replay_movement_scores(landmarks, visibility_threshold, movement_window=10):
+    """
+    Movement scores for a whole session, identical to calculate_movement_scores run frame
+    by frame: the average displacement over the previous movement_window detected frames,
+    counting only steps where the landmark was visible on both frames. (N, 33), NaN where
+    nothing was detected.
+    """
+    num_frames = len(landmarks)
+    scores = np.full((num_frames, NUM_LANDMARKS), np.nan, dtype=np.float32)
+    detected = ~np.isnan(landmarks[:, 0, 3])
+    history = landmarks[detected]
+    count = len(history)
+    if count == 0:
+        return scores
+
+    steps = np.zeros((count, NUM_LANDMARKS))
+    valid = np.zeros((count, NUM_LANDMARKS))
+    if count > 1:
+        delta = history[1:, :, :3] - history[:-1, :, :3]
+        steps[1:] = np.sqrt(np.einsum('ijk,ijk->ij', delta, delta))
+        visible = history[:, :, 3] > visibility_threshold
+        valid[1:] = visible[1:] & visible[:-1]
+
+    # Prefix sums so every window sum is one subtraction
+    step_sums = np.zeros((count + 1, NUM_LANDMARKS))
+    valid_sums = np.zeros((count + 1, NUM_LANDMARKS))
+    np.cumsum(steps * valid, axis=0, out=step_sums[1:])
+    np.cumsum(valid, axis=0, out=valid_sums[1:])
+
+    # Frame j averages the steps between entries j-m .. j-1, m = min(window, j)
+    j = np.arange(count)
+    m = np.minimum(movement_window, j)
+    first = np.maximum(j - m + 1, 0)
+    last = j  # exclusive upper bound of the step index range
+    has_steps = (m >= 2)[:, None]
+    total = np.where(has_steps, step_sums[last] - step_sums[first], 0.0)
+    counts = np.where(has_steps, valid_sums[last] - valid_sums[first], 0.0)
+    session_scores = np.divide(total, counts, out=np.zeros_like(total), where=counts > 0)
+    scores[detected] = session_scores
+    return scores
+
+
+def _episodes(flags):
+    """(start, end) index pairs of consecutive True runs, end exclusive"""
+    padded = np.concatenate(([0], flags.astype(np.int8), [0]))
+    edges = np.diff(padded)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def load_events(path, statuses=("confirmed",)):
+    """Clinician-labelled patient_event rows, as returned by GET /patient_event/video/{video_id}"""
+    with open(path) as f:
+        events = json.load(f)
+    return [event for event in events if event.get("validation_status", "confirmed") in statuses]
+
+
+def score_alerts(timestamps, alerts, event_times, tolerance):
+    """
+    Event-level agreement: an event counts as detected if an alert frame lies within
+    tolerance seconds of it, and an alert episode is a true positive if any event lies
+    within tolerance seconds of its span.
+    """
+    starts, ends = _episodes(alerts)
+    event_times = np.sort(np.asarray(event_times, dtype=np.float64))
+    alert_times = timestamps[alerts]
+
+    if len(event_times) and len(alert_times):
+        position = np.searchsorted(alert_times, event_times)
+        before = np.abs(event_times - alert_times[np.clip(position - 1, 0, len(alert_times) - 1)])
+        after = np.abs(alert_times[np.clip(position, 0, len(alert_times) - 1)] - event_times)
+        detected_events = int(np.sum(np.minimum(before, after) <= tolerance))
+    else:
+        detected_events = 0
+
+    if len(starts) and len(event_times):
+        span_start = timestamps[starts] - tolerance
+        span_end = timestamps[ends - 1] + tolerance
+        first_event = np.searchsorted(event_times, span_start)
+        true_episodes = int(np.sum((first_event < len(event_times)) &
+                                   (event_times[np.clip(first_event, 0, len(event_times) - 1)] <= span_end)))
+    else:
+        true_episodes = 0
+
+    precision = true_episodes / len(starts) if len(starts) else 0.0
+    recall = detected_events / len(event_times) if len(event_times) else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"episodes": len(starts), "true_episodes": true_episodes, "events": len(event_times),
+            "detected_events": detected_events, "precision": precision, "recall": recall, "f1": f1}
+
+
+def replay(timestamps, landmarks, settings=None, scores=None, rules=None):
+    """
+    Re-run the posture and movement rules over a session. Returns per-frame codes and scores.
+    With a rule_engine.RuleSet, its rules are used and settings override its params.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    if scores is None:
+        scores = replay_movement_scores(landmarks, settings["visibility_threshold"])
+    if rules is not None:
+        posture, movement, fired = rules.evaluate(landmarks, scores, settings)
+        return {"timestamps": timestamps, "posture": posture, "movement": movement, "movement_scores": scores,
+                "rules_fired": fired}
+    posture, posture_masks = assess_posture_batch(landmarks, settings["visibility_threshold"],
+                                                  settings["shoulder_limit"], settings["hip_limit"],
+                                                  settings["head_forward_limit"])
+    movement, movement_masks = detect_involuntary_movements_batch(scores, landmarks,
+                                                                  settings["visibility_threshold"],
+                                                                  settings["movement_threshold"])
+    return {"timestamps": timestamps, "posture": posture, "movement": movement, "movement_scores": scores,
+            "posture_masks": posture_masks, "movement_masks": movement_masks}
+
+
+def grid_search(timestamps, landmarks, event_times, grid, target="any", tolerance=2.0, rules=None):
+    """
+    Replay every combination of the settings in grid ({name: [values]}) and score the
+    resulting alerts against the labelled event times. target picks which alerts count:
+    "posture", "movement" or "any". Results are sorted by F1, best first.
+    """
+    names = list(grid)
+    score_cache = {}
+    results = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        settings = {**DEFAULT_SETTINGS, **dict(zip(names, values))}
+        visibility = settings["visibility_threshold"]
+        if visibility not in score_cache:
+            score_cache[visibility] = replay_movement_scores(landmarks, visibility)
+        outcome = replay(timestamps, landmarks, settings, score_cache[visibility], rules)
+
+        posture_alerts = outcome["posture"] == POSTURE_CODES["issues_detected"]
+        movement_alerts = outcome["movement"] == MOVEMENT_CODES["movements_detected"]
+        alerts = {"posture": posture_alerts, "movement": movement_alerts,
+                  "any": posture_alerts | movement_alerts}[target]
+
+        results.append({"settings": dict(zip(names, values)),
+                        **score_alerts(timestamps, alerts, event_times, tolerance)})
+    results.sort(key=lambda r: r["f1"], reverse=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay a recorded landmark log through the posture and movement rules')
+    parser.add_argument('log_path', type=str, help='Landmark log (.lmlog, .lmz or .csv)')
+    parser.add_argument('--events', type=str, default=None, help='JSON list of patient_event rows to score against')
+    parser.add_argument('--target', type=str, default='any', choices=['any', 'posture', 'movement'])
+    parser.add_argument('--tolerance', type=float, default=2.0, help='Seconds between an alert and an event that still match')
+    parser.add_argument('--movement_thresholds', type=float, nargs='+', default=[0.005, 0.01, 0.02])
+    parser.add_argument('--visibility_thresholds', type=float, nargs='+', default=[0.5])
+    parser.add_argument('--shoulder_limits', type=float, nargs='+', default=[0.05])
+    parser.add_argument('--hip_limits', type=float, nargs='+', default=[0.05])
+    parser.add_argument('--head_forward_limits', type=float, nargs='+', default=[0.1])
+    parser.add_argument('--top', type=int, default=10, help='How many settings to print')
+    parser.add_argument('--rules', type=str, default=None, help='Rule file to replay instead of the built-in checks')
+    args = parser.parse_args()
+
+    rules = RuleSet.from_file(args.rules) if args.rules else None
+
+    timestamps, landmarks = load_session(args.log_path)
+    duration = float(timestamps[-1] - timestamps[0]) if len(timestamps) > 1 else 0.0
+    started = time.perf_counter()
+
+    if args.events is None:
+        outcome = replay(timestamps, landmarks, rules=rules)
+        elapsed = time.perf_counter() - started
+        posture_names = {code: name for name, code in POSTURE_CODES.items()}
+        codes, counts = np.unique(outcome["posture"], return_counts=True)
+        for code, count in zip(codes, counts):
+            print(f"posture {posture_names[int(code)]}: {count} frames")
+        print(f"movement detected: {int(np.sum(outcome['movement']))} frames")
+        if rules is not None:
+            for name, fired in outcome["rules_fired"].items():
+                print(f"rule {name}: {int(fired.sum())} frames")
+            print(rules.format_timings())
+    else:
+        event_times = [event["timestamp"] for event in load_events(args.events)]
+        grid = {
+            "movement_threshold": args.movement_thresholds,
+            "visibility_threshold": args.visibility_thresholds,
+            "shoulder_limit": args.shoulder_limits,
+            "hip_limit": args.hip_limits,
+            "head_forward_limit": args.head_forward_limits
+        }
+        results = grid_search(timestamps, landmarks, event_times, grid, args.target, args.tolerance, rules)
+        elapsed = time.perf_counter() - started
+        for result in results[:args.top]:
+            print(f"F1 {result['f1']:.3f}  precision {result['precision']:.3f}  recall {result['recall']:.3f}  "
+                  f"{result['episodes']} episodes  {result['settings']}")
+        print(f"Evaluated {len(results)} settings")
+
+    speed = duration / elapsed if elapsed else float('inf')
+    print(f"Replayed {len(timestamps)} frames ({duration:.1f}s) in {elapsed:.3f}s, {speed:.0f}x real time")
@@ -0,0 +1,103 @@
+import cv2
+import numpy as np
+
+
+class RoiPoseEstimator:
+    """
+    Wraps a pose estimator (anything with .process(rgb_image)) so that inference runs on a
+    padded crop around the patient found in the previous frame instead of the full frame.
+    The crop is downscaled to at most max_side pixels and the returned landmarks are
+    mapped back to full-frame normalized coordinates, so callers see the usual results.
+    When the patient is lost in the crop it falls back to the full frame.
+    """
+
+    def __init__(self, pose, padding=0.25, max_side=480, min_visibility=0.5, min_visible_landmarks=8):
+        self.pose = pose
+        self.padding = padding
+        self.max_side = max_side
+        self.min_visibility = min_visibility
+        self.min_visible_landmarks = min_visible_landmarks
+        self.roi = None  # (x0, y0, x1, y1) in normalized full-frame coordinates
+
+        # Statistics
+        self.frames = 0
+        self.roi_frames = 0
+        self.fallbacks = 0
+        self.pixels_processed = 0
+        self.pixels_total = 0
+
+    def process(self, image):
+        height, width = image.shape[:2]
+        self.frames += 1
+        self.pixels_total += height * width
+
+        if self.roi is not None:
+            x0 = int(self.roi[0] * width)
+            y0 = int(self.roi[1] * height)
+            x1 = int(np.ceil(self.roi[2] * width))
+            y1 = int(np.ceil(self.roi[3] * height))
+            crop = image[y0:y1, x0:x1]
+
+            scale = min(1.0, self.max_side / max(crop.shape[:2]))
+            if scale < 1.0:
+                crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            else:
+                crop = np.ascontiguousarray(crop)
+            self.pixels_processed += crop.shape[0] * crop.shape[1]
+
+            results = self.pose.process(crop)
+            if results.pose_landmarks:
+                self._map_to_frame(results.pose_landmarks.landmark, x0, y0, x1 - x0, y1 - y0, width, height)
+                if self._update_roi(results.pose_landmarks.landmark):
+                    self.roi_frames += 1
+                    return results
+
+            # Tracking lost: retry this frame on the full image
+            self.roi = None
+            self.fallbacks += 1
+
+        self.pixels_processed += height * width
+        results = self.pose.process(image)
+        if results.pose_landmarks:
+            self._update_roi(results.pose_landmarks.landmark)
+        return results
+
+    @staticmethod
+    def _map_to_frame(landmarks, x0, y0, crop_width, crop_height, width, height):
+        """Convert landmarks normalized to the crop into full-frame normalized coordinates"""
+        for lm in landmarks:
+            lm.x = (x0 + lm.x * crop_width) / width
+            lm.y = (y0 + lm.y * crop_height) / height
+            # MediaPipe z uses roughly the same scale as x
+            lm.z = lm.z * crop_width / width
+
+    def _update_roi(self, landmarks):
+        """Derive the next crop from the visible landmarks. Returns False when tracking is lost"""
+        points = np.array([(lm.x, lm.y) for lm in landmarks if lm.visibility > self.min_visibility])
+        if len(points) < self.min_visible_landmarks:
+            self.roi = None
+            return False
+
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        pad = (high - low) * self.padding
+        low = np.clip(low - pad, 0.0, 1.0)
+        high = np.clip(high + pad, 0.0, 1.0)
+        if np.any(high - low <= 0):
+            self.roi = None
+            return False
+        self.roi = (low[0], low[1], high[0], high[1])
+        return True
+
+    @property
+    def pixel_fraction(self):
+        """Share of full-frame pixels that actually went through inference"""
+        return self.pixels_processed / self.pixels_total if self.pixels_total else 1.0
+
+    def reset(self):
+        self.roi = None
+        if hasattr(self.pose, 'reset'):
+            self.pose.reset()
+
+    def close(self):
+        self.pose.close()
@@ -0,0 +1,492 @@
+import argparse
+import ast
+import json
+import os
+import time
+
+import numpy as np
+
+from landmarks import LANDMARK_NAMES, NUM_LANDMARKS, POSTURE_CODES, MOVEMENT_CODES
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules", "default_rules.json")
+RULE_GROUPS = ("posture", "movement")
+
+_INDEX = {name: i for i, name in enumerate(LANDMARK_NAMES)}
+_AXES = {"x": 0, "y": 1, "z": 2}
+_POSTURE_NAMES = {code: name for name, code in POSTURE_CODES.items()}
+_MOVEMENT_NAMES = {code: name for name, code in MOVEMENT_CODES.items()}
+# Visibility of a frame as one bit per landmark, so a rule's visibility check is a single mask test
+_BITS = np.left_shift(np.uint64(1), np.arange(NUM_LANDMARKS, dtype=np.uint64))
+
+# Kinds of compiled expressions
+POINT = "point"  # (N, 3) x, y, z; (N, K, 3) or (N, 1, 3) in a for_each rule
+NUMBER = "number"  # (N,) or a scalar; (N, K) or (N, 1) in a for_each rule
+FLAG = "flag"  # (N,) bool; (N, K) or (N, 1) in a for_each rule
+
+
+class RuleError(ValueError):
+    """A rule that does not parse or uses something outside the rule language"""
+
+
+def _as_column(value):
+    """Let a number broadcast against a point"""
+    return np.asarray(value)[..., None]
+
+
+EACH = "_each_"  # What "$" in a for_each rule becomes before parsing
+
+
+class _Compiler:
+    """
+    Compiles one rule expression (a Python expression parsed with ast) into a closure
+    over NumPy arrays. Only the nodes handled below are accepted. Every landmark whose
+    position or movement is read is collected in used, so the rule only fires where
+    those landmarks are visible.
+
+    For a for_each rule, each is the array of landmark indices "$" stands for and the
+    rule is evaluated for all of them at once: "$" reads (N, K) columns and every other
+    landmark a (N, 1) column that broadcasts against them.
+    """
+
+    FUNCTIONS = ("abs", "min", "max", "sqrt", "dist", "angle", "mid", "movement", "visible")
+
+    def __init__(self, params, features, feature_cache, rule_name, each=None):
+        self.params = params
+        self.features = features
+        self.feature_cache = feature_cache  # Compiled features shared by all rules of a RuleSet
+        self.rule_name = rule_name
+        self.each = each
+        self.used = set()
+        self.uses_movement = False
+        self.expanding = []
+
+    def error(self, message):
+        return RuleError(f"rule {self.rule_name}: {message}")
+
+    def compile(self, source):
+        try:
+            tree = ast.parse(source, mode='eval')
+        except SyntaxError as e:
+            raise self.error(f"cannot parse {source!r}: {e.msg}")
+        return self.visit(tree.body)
+
+    def visit(self, node):
+        method = getattr(self, f"visit_{type(node).__name__}", None)
+        if method is None:
+            raise self.error(f"{type(node).__name__} is not allowed in rules")
+        return method(node)
+
+    def _columns(self, node):
+        """Landmark index selector for a name: an int, a (1,) slice, or the for_each indices"""
+        if isinstance(node, ast.Name) and node.id == EACH and self.each is not None and not self.expanding:
+            return self.each
+        if not isinstance(node, ast.Name) or node.id not in _INDEX:
+            raise self.error("expected a landmark name")
+        idx = _INDEX[node.id]
+        return idx if self.each is None else slice(idx, idx + 1)
+
+    def _track(self, node):
+        if node.id in _INDEX:
+            self.used.add(_INDEX[node.id])
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise self.error(f"unsupported constant {node.value!r}")
+        value = float(node.value)
+        return (lambda ctx: value), NUMBER
+
+    def visit_Name(self, node):
+        name = node.id
+        if name in _INDEX or name == EACH:
+            columns = self._columns(node)
+            self._track(node)
+            return (lambda ctx: ctx.landmarks[:, columns, :3]), POINT
+        if name in self.params:
+            return (lambda ctx: ctx.params[name]), NUMBER
+        if name in self.features:
+            return self._feature(name)
+        raise self.error(f"unknown name {name}")
+
+    def _feature(self, name):
+        """A feature is compiled once per RuleSet and evaluated once per batch"""
+        key = (name, self.each is not None)
+        if key not in self.feature_cache:
+            if name in self.expanding:
+                raise self.error(f"feature {name} refers to itself")
+            outer_used, outer_movement = self.used, self.uses_movement
+            self.used, self.uses_movement = set(), False
+            self.expanding.append(name)
+            try:
+                fn, kind = self.visit(ast.parse(self.features[name], mode='eval').body)
+            except SyntaxError as e:
+                raise self.error(f"cannot parse feature {name}: {e.msg}")
+            finally:
+                self.expanding.pop()
+                feature_used, feature_movement = self.used, self.uses_movement
+                self.used, self.uses_movement = outer_used, outer_movement
+
+            def cached(ctx, fn=fn):
+                value = ctx.cache.get(key)
+                if value is None:
+                    value = ctx.cache[key] = fn(ctx)
+                return value
+            self.feature_cache[key] = (cached, kind, feature_used, feature_movement)
+
+        fn, kind, used, uses_movement = self.feature_cache[key]
+        self.used |= used
+        self.uses_movement |= uses_movement
+        return fn, kind
+
+    def visit_Attribute(self, node):
+        if node.attr == "visibility":
+            columns = self._columns(node.value)
+            return (lambda ctx: ctx.landmarks[:, columns, 3]), NUMBER
+        if node.attr not in _AXES:
+            raise self.error(f"unknown attribute .{node.attr}")
+        fn, kind = self.visit(node.value)
+        if kind != POINT:
+            raise self.error(f".{node.attr} needs a point")
+        axis = _AXES[node.attr]
+        return (lambda ctx: fn(ctx)[..., axis]), NUMBER
+
+    def visit_BinOp(self, node):
+        operators = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+                     ast.Div: np.divide, ast.Pow: np.power}
+        op = operators.get(type(node.op))
+        if op is None:
+            raise self.error(f"operator {type(node.op).__name__} is not allowed")
+        left, left_kind = self.visit(node.left)
+        right, right_kind = self.visit(node.right)
+        if FLAG in (left_kind, right_kind):
+            raise self.error("arithmetic on a condition")
+        if left_kind == right_kind:
+            return (lambda ctx: op(left(ctx), right(ctx))), left_kind
+        if left_kind == POINT:
+            return (lambda ctx: op(left(ctx), _as_column(right(ctx)))), POINT
+        return (lambda ctx: op(_as_column(left(ctx)), right(ctx))), POINT
+
+    def visit_UnaryOp(self, node):
+        operand, kind = self.visit(node.operand)
+        if isinstance(node.op, ast.USub) and kind != FLAG:
+            return (lambda ctx: -operand(ctx)), kind
+        if isinstance(node.op, ast.Not) and kind == FLAG:
+            return (lambda ctx: ~operand(ctx)), FLAG
+        raise self.error(f"operator {type(node.op).__name__} does not apply to a {kind}")
+
+    def visit_BoolOp(self, node):
+        parts = []
+        for value in node.values:
+            fn, kind = self.visit(value)
+            if kind != FLAG:
+                raise self.error("'and'/'or' need conditions on both sides")
+            parts.append(fn)
+        is_and = isinstance(node.op, ast.And)
+
+        def evaluate(ctx):
+            result = parts[0](ctx)
+            for part in parts[1:]:
+                # Stop as soon as the whole batch is decided, which is the common case live (N=1)
+                if is_and:
+                    if not result.any():
+                        return result
+                    result = result & part(ctx)
+                else:
+                    if result.all():
+                        return result
+                    result = result | part(ctx)
+            return result
+        return evaluate, FLAG
+
+    def visit_Compare(self, node):
+        operators = {ast.Gt: np.greater, ast.GtE: np.greater_equal,
+                     ast.Lt: np.less, ast.LtE: np.less_equal}
+        operands = [node.left] + list(node.comparators)
+        compiled = []
+        for operand in operands:
+            fn, kind = self.visit(operand)
+            if kind != NUMBER:
+                raise self.error("comparisons need numbers")
+            compiled.append(fn)
+        ops = []
+        for op in node.ops:
+            if type(op) not in operators:
+                raise self.error(f"comparison {type(op).__name__} is not allowed")
+            ops.append(operators[type(op)])
+
+        if len(ops) == 1:
+            left, right = compiled
+            op = ops[0]
+            return (lambda ctx: np.asarray(op(left(ctx), right(ctx)))), FLAG
+
+        def evaluate(ctx):
+            values = [fn(ctx) for fn in compiled]
+            result = ops[0](values[0], values[1])
+            for i in range(1, len(ops)):
+                result = result & ops[i](values[i], values[i + 1])
+            return np.asarray(result)
+        return evaluate, FLAG
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in self.FUNCTIONS or node.keywords:
+            raise self.error(f"unknown function {ast.unparse(node.func)}")
+        name = node.func.id
+        args = node.args
+
+        if name in ("movement", "visible"):
+            if len(args) != 1:
+                raise self.error(f"{name}() takes one landmark")
+            columns = self._columns(args[0])
+            if name == "visible":
+                return (lambda ctx: ctx.landmarks[:, columns, 3] > ctx.params["visibility_threshold"]), FLAG
+            self._track(args[0])
+            self.uses_movement = True
+            return (lambda ctx: ctx.scores[:, columns]), NUMBER
+
+        compiled = [self.visit(arg) for arg in args]
+        fns = [fn for fn, _ in compiled]
+        kinds = [kind for _, kind in compiled]
+        expected = {"abs": 1, "sqrt": 1, "min": 2, "max": 2, "dist": 2, "mid": 2, "angle": 3}[name]
+        if len(args) != expected:
+            raise self.error(f"{name}() takes {expected} arguments")
+        if FLAG in kinds:
+            raise self.error(f"{name}() does not take conditions")
+
+        if name in ("abs", "sqrt"):
+            op = np.abs if name == "abs" else np.sqrt
+            return (lambda ctx: op(fns[0](ctx))), kinds[0]
+        if name in ("min", "max"):
+            if kinds[0] != kinds[1]:
+                raise self.error(f"{name}() needs two numbers or two points")
+            op = np.minimum if name == "min" else np.maximum
+            return (lambda ctx: op(fns[0](ctx), fns[1](ctx))), kinds[0]
+
+        if any(kind != POINT for kind in kinds):
+            raise self.error(f"{name}() takes points")
+        if name == "mid":
+            return (lambda ctx: (fns[0](ctx) + fns[1](ctx)) * 0.5), POINT
+        if name == "dist":
+            # Image-plane distance; MediaPipe's z is too noisy to mix in
+            def dist(ctx):
+                delta = fns[0](ctx)[..., :2] - fns[1](ctx)[..., :2]
+                return np.hypot(delta[..., 0], delta[..., 1])
+            return dist, NUMBER
+
+        # angle(a, b, c): image-plane angle at b in degrees
+        def angle(ctx):
+            center = fns[1](ctx)[..., :2]
+            u = fns[0](ctx)[..., :2] - center
+            v = fns[2](ctx)[..., :2] - center
+            cross = u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+            dot = np.einsum('...j,...j->...', u, v)
+            return np.degrees(np.abs(np.arctan2(cross, dot)))
+        return angle, NUMBER
+
+
+class Rule:
+    """
+    One compiled rule: a condition over a batch of frames and the status it sets.
+    A for_each rule has one column per landmark, named "<rule>:<landmark>".
+    """
+
+    def __init__(self, name, group, evaluate, required, uses_movement, source, columns, each=None):
+        self.name = name
+        self.group = group
+        self.evaluate = evaluate
+        self.required = _BITS[sorted(required)].sum(dtype=np.uint64)
+        self.uses_movement = uses_movement
+        self.source = source
+        self.columns = columns  # [(fired name, (status key, status value))]
+        self.each = each  # Landmark indices of a for_each rule, else None
+        self.each_bits = _BITS[each] if each is not None else None
+
+
+class _Context:
+    """What compiled expressions read from: one batch of frames, the parameters and a feature cache"""
+
+    def __init__(self, landmarks, scores, params):
+        self.landmarks = landmarks
+        self.scores = scores
+        self.params = params
+        self.cache = {}
+
+
+class RuleSet:
+    """
+    Posture and movement rules loaded from a JSON (or YAML) document:
+
+        params:           named numbers usable in expressions, overridable per call
+        features:         named sub-expressions usable in rules, computed once per batch
+        posture_required: landmarks that must be visible for any posture verdict
+        rules:            list of {name, group, when, status, for_each?, requires?}
+
+    "when" is an expression over landmark names (NOSE.y, mid(LEFT_HIP, RIGHT_HIP).x),
+    the functions abs, min, max, sqrt, dist, angle, mid, movement and visible, the
+    params and features, arithmetic, comparisons and and/or/not. A rule only fires
+    where every landmark it reads is visible. With "for_each", "$" in "when" and
+    "status" stands for each listed landmark and all of them are evaluated together.
+    Every rule is compiled once; evaluate() then runs all of them over a whole batch.
+    """
+
+    def __init__(self, spec):
+        self.params = {"visibility_threshold": 0.5, **spec.get("params", {})}
+        self.features = dict(spec.get("features", {}))
+        required = spec.get("posture_required", [])
+        unknown = [name for name in required if name not in _INDEX]
+        if unknown:
+            raise RuleError(f"posture_required: unknown landmarks {unknown}")
+        self.posture_required = _BITS[[_INDEX[name] for name in required]].sum(dtype=np.uint64)
+
+        self.feature_cache = {}
+        self.rules = [self._compile_rule(entry) for entry in spec.get("rules", [])]
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise RuleError("rule names must be unique")
+        self.uses_movement = any(rule.uses_movement for rule in self.rules)
+
+        self.rule_seconds = {rule.name: 0.0 for rule in self.rules}
+        self.frames_evaluated = 0
+
+    def _compile_rule(self, entry):
+        name = entry.get("name")
+        group = entry.get("group")
+        when = entry.get("when")
+        if not name or not when:
+            raise RuleError(f"rule {name or '?'} needs a name and a 'when' expression")
+        if group not in RULE_GROUPS:
+            raise RuleError(f"rule {name}: group must be one of {RULE_GROUPS}")
+        status = list(entry.get("status", [name, "detected"]))
+
+        for_each = entry.get("for_each")
+        each = None
+        if for_each:
+            unknown = [landmark for landmark in for_each if landmark not in _INDEX]
+            if unknown:
+                raise RuleError(f"rule {name}: unknown landmarks {unknown}")
+            each = np.array([_INDEX[landmark] for landmark in for_each], dtype=np.intp)
+            columns = [(f"{name}:{landmark}", tuple(part.replace("$", landmark) for part in status))
+                       for landmark in for_each]
+        else:
+            columns = [(name, tuple(status))]
+
+        compiler = _Compiler(self.params, self.features, self.feature_cache, name, each)
+        evaluate, kind = compiler.compile(when.replace("$", EACH))
+        if kind != FLAG:
+            raise RuleError(f"rule {name}: 'when' must be a condition")
+        required = set(compiler.used)
+        for extra in entry.get("requires", []):
+            if extra not in _INDEX:
+                raise RuleError(f"rule {name}: unknown landmark {extra}")
+            required.add(_INDEX[extra])
+        return Rule(name, group, evaluate, required, compiler.uses_movement, when, columns, each)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_PATH):
+        with open(path) as f:
+            if path.endswith(('.yaml', '.yml')):
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("PyYAML is required for YAML rule files")
+                return cls(yaml.safe_load(f))
+            return cls(json.load(f))
+
+    def evaluate(self, landmarks, movement_scores=None, params=None):
+        """
+        Run every rule over (N, 33, 4) landmarks (NaN rows where nothing was detected) and
+        (N, 33) movement scores. Returns (posture_codes, movement_codes, fired) where
+        fired maps rule (column) names to (N,) booleans. params override the file's params.
+        """
+        landmarks = np.asarray(landmarks)
+        if self.uses_movement and movement_scores is None:
+            raise ValueError("these rules need movement scores")
+        params = {**self.params, **(params or {})} if params else self.params
+        ctx = _Context(landmarks, movement_scores, params)
+        count = len(landmarks)
+
+        visible = (landmarks[:, :, 3] > params["visibility_threshold"]) @ _BITS
+        posture_issue = np.zeros(count, dtype=bool)
+        movement_issue = np.zeros(count, dtype=bool)
+        fired = {}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for rule in self.rules:
+                started = time.perf_counter()
+                mask = rule.evaluate(ctx)
+                if rule.each is not None:
+                    # The "$" landmark itself has to be visible too
+                    shape = (count, len(rule.each))
+                    if mask.shape != shape:
+                        mask = np.broadcast_to(mask, shape)
+                    mask = mask & ((visible[:, None] & rule.each_bits) != 0)
+                    if rule.required:
+                        mask &= ((visible & rule.required) == rule.required)[:, None]
+                    for k, (name, _) in enumerate(rule.columns):
+                        fired[name] = mask[:, k]
+                    mask = mask.any(axis=1)
+                else:
+                    if mask.shape != (count,):
+                        mask = np.broadcast_to(mask, (count,))
+                    if rule.required:
+                        mask = mask & ((visible & rule.required) == rule.required)
+                    fired[rule.name] = mask
+                if rule.group == "posture":
+                    posture_issue |= mask
+                else:
+                    movement_issue |= mask
+                self.rule_seconds[rule.name] += time.perf_counter() - started
+        self.frames_evaluated += count
+
+        detected = ~np.isnan(landmarks[:, 0, 3])
+        sufficient = (visible & self.posture_required) == self.posture_required
+        posture = np.where(detected, POSTURE_CODES["insufficient_data"], POSTURE_CODES["no_detection"]).astype(np.uint8)
+        posture[sufficient & posture_issue] = POSTURE_CODES["issues_detected"]
+        posture[sufficient & ~posture_issue] = POSTURE_CODES["normal"]
+        movement = np.where(movement_issue, MOVEMENT_CODES["movements_detected"],
+                            MOVEMENT_CODES["normal"]).astype(np.uint8)
+        return posture, movement, fired
+
+    def status_dicts(self, posture, movement, fired, i=0):
+        """Frame i of evaluate() output as the posture and movement status dicts of the detector"""
+        posture_status = {"overall": _POSTURE_NAMES[int(posture[i])]}
+        movement_status = {"overall": _MOVEMENT_NAMES[int(movement[i])]}
+        report_posture = posture_status["overall"] in ("issues_detected", "normal")
+        for rule in self.rules:
+            if rule.group == "posture" and not report_posture:
+                continue
+            status = posture_status if rule.group == "posture" else movement_status
+            for name, (key, value) in rule.columns:
+                if fired[name][i]:
+                    status[key] = value
+        return posture_status, movement_status
+
+    def timing_report(self):
+        """[(rule name, microseconds per frame)], most expensive first"""
+        frames = max(self.frames_evaluated, 1)
+        report = [(name, seconds * 1e6 / frames) for name, seconds in self.rule_seconds.items()]
+        return sorted(report, key=lambda item: item[1], reverse=True)
+
+    def format_timings(self):
+        lines = [f"{'rule':<40}{'us/frame':>10}"]
+        for name, micros in self.timing_report():
+            lines.append(f"{name:<40}{micros:>10.3f}")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run a rule file over a recorded landmark log')
+    parser.add_argument('log_path', type=str, help='Landmark log (.lmlog, .lmz or .csv)')
+    parser.add_argument('--rules', type=str, default=DEFAULT_RULES_PATH, help='JSON or YAML rule file')
+    args = parser.parse_args()
+
+    from replay import load_session, replay_movement_scores
+
+    rules = RuleSet.from_file(args.rules)
+    timestamps, landmarks = load_session(args.log_path)
+    scores = replay_movement_scores(landmarks, rules.params["visibility_threshold"])
+    started = time.perf_counter()
+    posture, movement, fired = rules.evaluate(landmarks, scores)
+    elapsed = time.perf_counter() - started
+
+    for name, mask in fired.items():
+        print(f"{name:<40}{int(mask.sum()):>8} frames")
+    print(rules.format_timings())
+    print(f"Evaluated {len(rules.rules)} rules over {len(landmarks)} frames in {elapsed * 1e3:.2f} ms")
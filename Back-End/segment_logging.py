@@ -0,0 +1,206 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime
+
+from landmark_log import LOG_SINKS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+COPY_CHUNK = 1 << 20  # Compression streams in 1 MB chunks so memory stays flat
+
+
+class RotatingLandmarkSink:
+    """
+    Splits a session's landmark log into segments inside one directory. A segment is
+    closed after segment_seconds of session time or once it reaches segment_bytes,
+    whichever comes first. Closed segments are fsynced, gzip-compressed and handed to
+    on_segment_closed(path, entry) on a background thread while recording continues.
+    manifest.json lists every segment with its frame and time range and is replaced
+    atomically after each change, so it is always readable. A segment whose
+    on_segment_closed call fails is marked "upload_failed" with the error, and
+    retry_failed_uploads() hands it over again later. Only the open segment lives in
+    memory, however long the session runs.
+    """
+
+    def __init__(self, directory, log_format="csv", patient_id=None, segment_seconds=600.0,
+                 segment_bytes=None, compress=True, on_segment_closed=None, check_interval=30, **sink_kwargs):
+        self.directory = directory
+        self.log_format = log_format
+        self.sink_class = LOG_SINKS[log_format]
+        self.sink_kwargs = dict(sink_kwargs)
+        if log_format != "csv":
+            self.sink_kwargs["patient_id"] = patient_id
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.compress = compress
+        self.on_segment_closed = on_segment_closed  # e.g. supabase_segment_uploader(...)
+        self.check_interval = check_interval  # Frames between size checks
+        os.makedirs(directory, exist_ok=True)
+
+        self.manifest = {
+            "patient_id": patient_id,
+            "format": log_format,
+            "created": datetime.now().isoformat(),
+            "segment_seconds": segment_seconds,
+            "segment_bytes": segment_bytes,
+            "segments": []
+        }
+        self.manifest_lock = threading.Lock()
+        self._write_manifest()
+
+        self.sink = None
+        self.segment = None
+        self.closed_segments = queue.Queue()
+        self.worker = threading.Thread(target=self._process_closed_segments, daemon=True)
+        self.worker.start()
+
+    def _write_manifest(self):
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        temp_path = path + ".tmp"
+        # Both the recorder and the compression thread rewrite it, so the lock covers the file too
+        with self.manifest_lock:
+            with open(temp_path, 'w') as f:
+                json.dump(self.manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+
+    def _open_segment(self, result):
+        index = len(self.manifest["segments"])
+        name = f"segment_{index:05d}{self.sink_class.extension}"
+        self.sink = self.sink_class(os.path.join(self.directory, name), **self.sink_kwargs)
+        self.segment = {
+            "index": index,
+            "file": name,
+            "status": "recording",
+            "first_frame": result.frame_index,
+            "last_frame": result.frame_index,
+            "start_time": result.timestamp,
+            "end_time": result.timestamp,
+            "frames": 0,
+            "bytes": 0
+        }
+        with self.manifest_lock:
+            self.manifest["segments"].append(self.segment)
+        self._write_manifest()
+
+    def _close_segment(self):
+        if self.sink is None:
+            return
+        with self.manifest_lock:
+            self.segment["bytes"] = self.sink.size()
+        self.sink.close()
+        # One fsync per segment keeps the durability cost independent of session length
+        with open(os.path.join(self.directory, self.segment["file"]), 'rb') as f:
+            os.fsync(f.fileno())
+        with self.manifest_lock:
+            self.segment["status"] = "closed"
+        self._write_manifest()
+        self.closed_segments.put(self.segment)
+        self.sink = None
+        self.segment = None
+
+    def _rotation_due(self, result):
+        if self.segment_seconds is not None and result.timestamp - self.segment["start_time"] >= self.segment_seconds:
+            return True
+        if self.segment_bytes is not None and self.segment["frames"] % self.check_interval == 0:
+            return self.sink.size() >= self.segment_bytes
+        return False
+
+    def write(self, result):
+        if self.sink is not None and self._rotation_due(result):
+            self._close_segment()
+        if self.sink is None:
+            self._open_segment(result)
+        self.sink.write(result)
+        # The compression thread may be dumping the manifest, this segment included
+        with self.manifest_lock:
+            self.segment["frames"] += 1
+            self.segment["last_frame"] = result.frame_index
+            self.segment["end_time"] = result.timestamp
+
+    def _compress(self, entry):
+        source = os.path.join(self.directory, entry["file"])
+        target = source + ".gz"
+        with open(source, 'rb') as f_in, open(target + ".tmp", 'wb') as raw_out:
+            with gzip.GzipFile(filename=entry["file"], mode='wb', fileobj=raw_out) as f_out:
+                shutil.copyfileobj(f_in, f_out, COPY_CHUNK)
+            raw_out.flush()
+            os.fsync(raw_out.fileno())
+        os.replace(target + ".tmp", target)
+        os.remove(source)
+        with self.manifest_lock:
+            entry["file"] = entry["file"] + ".gz"
+            entry["compressed_bytes"] = os.path.getsize(target)
+            entry["status"] = "compressed"
+
+    def _process_closed_segments(self):
+        while True:
+            entry = self.closed_segments.get()
+            if entry is None:
+                break
+            try:
+                if self.compress:
+                    self._compress(entry)
+                    self._write_manifest()
+            except Exception as e:
+                logger.error(f"Error compressing landmark segment {entry['file']}: {e}")
+                continue
+            if self.on_segment_closed is not None:
+                self._upload(entry)
+
+    def _upload(self, entry):
+        """Hand a finished segment to on_segment_closed and record the outcome in the manifest"""
+        with self.manifest_lock:
+            snapshot = dict(entry)
+        try:
+            self.on_segment_closed(os.path.join(self.directory, entry["file"]), snapshot)
+        except Exception as e:
+            logger.error(f"Error uploading landmark segment {entry['file']}: {e}")
+            with self.manifest_lock:
+                entry["status"] = "upload_failed"
+                entry["upload_error"] = str(e)
+        else:
+            with self.manifest_lock:
+                entry["status"] = "uploaded"
+                entry.pop("upload_error", None)
+        self._write_manifest()
+
+    def retry_failed_uploads(self):
+        """Hand every segment marked "upload_failed" to on_segment_closed again. Returns how many now succeeded"""
+        with self.manifest_lock:
+            failed = [entry for entry in self.manifest["segments"] if entry["status"] == "upload_failed"]
+        for entry in failed:
+            self._upload(entry)
+        return sum(entry["status"] == "uploaded" for entry in failed)
+
+    def size(self):
+        """Bytes in the segment being recorded"""
+        return self.sink.size() if self.sink is not None else 0
+
+    def close(self):
+        """Close the current segment and wait for compression and uploads to finish"""
+        if self.worker is None:
+            return
+        self._close_segment()
+        self.closed_segments.put(None)
+        self.worker.join()
+        self.worker = None
+
+
+def supabase_segment_uploader(bucket, prefix=""):
+    """on_segment_closed callback that uploads each closed segment to Supabase storage"""
+    from common import supabase
+
+    def upload(path, entry):
+        # Segment names repeat across sessions, so keep the session directory in the key
+        session = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        with open(path, 'rb') as f:
+            supabase.storage.from_(bucket).upload(f"{prefix}{session}/{os.path.basename(path)}", f.read())
+    return upload
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class StageTimer:
+    """Measures consecutive stages of one thread's loop: mark() at the start, lap(stage) after each stage"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.last = time.perf_counter()
+
+    def mark(self):
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.metrics.record(stage, now - self.last)
+        self.last = now
+
+
+class _NullTimer:
+    """Stand-in used when instrumentation is disabled"""
+
+    def mark(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class StageMetrics:
+    """
+    Per-stage latency samples kept in fixed-size rolling windows, plus running totals.
+    Recording a sample is one array store, so it can stay enabled in the field.
+    """
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+        self.totals = {}
+        self.started = time.time()
+        self.server = None
+
+    def timer(self):
+        """A timer for one thread; each thread of a pipeline needs its own"""
+        return StageTimer(self)
+
+    def record(self, stage, seconds):
+        buffer = self.samples.get(stage)
+        if buffer is None:
+            buffer = self.samples[stage] = np.zeros(self.window)
+            self.counts[stage] = 0
+            self.totals[stage] = 0.0
+        buffer[self.counts[stage] % self.window] = seconds
+        self.counts[stage] += 1
+        self.totals[stage] += seconds
+
+    def snapshot(self):
+        """Rolling p50/p95/p99 and totals per stage, in milliseconds"""
+        stages = {}
+        for stage, buffer in list(self.samples.items()):
+            count = self.counts[stage]
+            recent = buffer[:min(count, self.window)] * 1000.0
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99]) if len(recent) else (0.0, 0.0, 0.0)
+            stages[stage] = {
+                "count": count,
+                "total_s": self.totals[stage],
+                "mean_ms": self.totals[stage] * 1000.0 / count if count else 0.0,
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(recent.max()) if len(recent) else 0.0
+            }
+        return {"uptime_s": time.time() - self.started, "stages": stages}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            f.write(self.to_json())
+
+    def format_summary(self, frame_count, elapsed):
+        """Text table printed at the end of a run"""
+        lines = [f"Processed {frame_count} frames in {elapsed:.2f} seconds "
+                 f"({frame_count / elapsed if elapsed else 0:.1f} fps)",
+                 f"{'stage':<12}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for stage, s in self.snapshot()["stages"].items():
+            lines.append(f"{stage:<12}{s['total_s']:>10.2f}{s['mean_ms']:>10.2f}"
+                         f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+        return "\n".join(lines)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expose the snapshot as JSON at http://host:port/metrics from a background thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.to_json().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
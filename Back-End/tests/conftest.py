@@ -0,0 +1,6 @@
+import os
+import sys
+
+BACK_END = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACK_END)
+sys.path.insert(0, os.path.join(BACK_END, "benchmarks"))
@@ -0,0 +1,41 @@
+import queue
+
+import numpy as np
+
+from camera_supervisor import CameraSupervisor, SharedFrameRing, _Stream
+
+
+class ResizingCapture:
+    """Capture whose frames switch resolution after the first one"""
+
+    def __init__(self):
+        self.reads = 0
+
+    def read(self):
+        self.reads += 1
+        size = 8 if self.reads == 1 else 16
+        return True, np.zeros((size, size, 3), dtype=np.uint8)
+
+    def grab(self):
+        return True
+
+
+def test_capture_error_still_ends_the_worker_queue():
+    supervisor = CameraSupervisor(slots_per_stream=2)
+    supervisor.start_time = 0.0
+    stream = _Stream(0, "fake", "patient")
+    stream.cap = ResizingCapture()
+    stream.ring = SharedFrameRing((8, 8, 3), 2)
+    stream.ready_queue = queue.Queue()
+    stream.free_queue = queue.Queue()
+    for slot in range(2):
+        stream.free_queue.put(slot)
+    try:
+        supervisor._capture_loop(stream)
+    finally:
+        stream.ring.close()
+        stream.ring.unlink()
+
+    items = [stream.ready_queue.get_nowait() for _ in range(stream.ready_queue.qsize())]
+    assert items[0][:2] == (0, 1)
+    assert items[-1] is None
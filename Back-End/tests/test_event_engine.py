@@ -0,0 +1,65 @@
+import numpy as np
+
+from event_engine import EventEngine, EventRule
+from synthetic_landmarks import generate_landmarks, FakePoseEstimator
+from PostureMovementDetector import PostureMovementDetector
+
+FPS = 10
+RULE = EventRule(onset_seconds=1.0, offset_seconds=2.0, min_duration=2.0)
+
+
+def _feed(engine, spans, seconds):
+    """Feed FPS frames per second where the condition holds inside the (start, end) spans"""
+    emitted = []
+    for i in range(int(seconds * FPS)):
+        t = i / FPS
+        active = any(start <= t < end for start, end in spans)
+        for event in engine.update(t, {"tremor": active}):
+            emitted.append((t, event))
+    return emitted
+
+
+def _engine():
+    return EventEngine("patient", "video", rules={"tremor": RULE})
+
+
+def test_condition_shorter_than_onset_is_not_reported():
+    assert _feed(_engine(), [(1.0, 1.5), (4.0, 4.5)], 10) == []
+
+
+def test_held_condition_is_reported_once_after_min_duration():
+    engine = _engine()
+    emitted = _feed(engine, [(1.0, 8.0)], 10)
+    assert len(emitted) == 1
+    t, event = emitted[0]
+    assert t == 3.0
+    assert event["type"] == "tremor" and event["timestamp"] == 1.0
+    assert event["confidence"] == 100
+    assert engine.events_emitted == 1
+
+
+def test_gap_shorter_than_offset_does_not_split_the_episode():
+    # The condition drops out for a second, e.g. lost tracking, before min_duration is reached
+    emitted = _feed(_engine(), [(1.0, 2.0), (3.0, 8.0)], 10)
+    assert len(emitted) == 1
+    t, event = emitted[0]
+    assert t == 3.0 and event["timestamp"] == 1.0
+    assert event["confidence"] < 100
+
+
+def test_gap_longer_than_offset_starts_a_new_episode():
+    emitted = _feed(_engine(), [(1.0, 4.0), (7.0, 10.0)], 12)
+    assert [(t, event["timestamp"]) for t, event in emitted] == [(3.0, 1.0), (9.0, 7.0)]
+
+
+def test_detector_cleanup_leaves_callers_engine_open(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    batches = []
+    engine = EventEngine("patient", "video", sink=batches.append)
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(generate_landmarks(5)),
+                                       event_engine=engine)
+    detector.process_frame(np.zeros((8, 8, 3), dtype=np.uint8))
+    detector.cleanup()
+
+    assert engine.batcher is not None and engine.batcher.thread.is_alive()
+    engine.close()
@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pytest
+
+from conftest import BACK_END
+from landmark_bus import BUS_HEADER_DTYPE, BUS_MAGIC, LandmarkBus, LandmarkBusReader
+from landmark_log import FRAME_DTYPE
+
+SECOND_WRITER = f"""
+import sys
+sys.path.insert(0, {BACK_END!r})
+from landmark_bus import LandmarkBus
+try:
+    LandmarkBus(sys.argv[1])
+except FileExistsError:
+    print("refused")
+"""
+
+
+def _bus_name():
+    return f"test_bus_{os.getpid()}"
+
+
+def test_second_writer_does_not_take_over_live_bus():
+    name = _bus_name()
+    bus = LandmarkBus(name)
+    reader = LandmarkBusReader(name)
+    try:
+        result = subprocess.run([sys.executable, "-c", SECOND_WRITER, name],
+                                capture_output=True, text=True, timeout=30)
+        assert result.stdout.strip() == "refused"
+        with pytest.raises(FileExistsError):
+            LandmarkBus(name)
+    finally:
+        reader.close()
+        bus.close()
+
+
+def test_segment_of_closed_bus_is_reclaimed():
+    name = _bus_name()
+    # A segment a finished run left behind: a bus header with the closed flag set
+    leftover = shared_memory.SharedMemory(name=name, create=True, size=BUS_HEADER_DTYPE.itemsize)
+    header = np.ndarray((), dtype=BUS_HEADER_DTYPE, buffer=leftover.buf)
+    header['magic'] = BUS_MAGIC
+    header['closed'] = 1
+    del header
+    leftover.close()
+    resource_tracker.unregister(leftover._name, "shared_memory")
+
+    bus = LandmarkBus(name)
+    bus.close()
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="segments are not files under /dev/shm here")
+def test_close_tolerates_removed_segment():
+    name = _bus_name()
+    bus = LandmarkBus(name)
+    os.remove(f"/dev/shm/{name}")
+    bus.close()
+
+
+def _record(frame):
+    record = np.zeros((), dtype=FRAME_DTYPE)
+    record['frame'] = frame
+    record['timestamp'] = frame / 30.0
+    return record
+
+
+def test_reader_gets_frames_in_order_then_skips_ahead_when_lapped():
+    name = _bus_name()
+    bus = LandmarkBus(name, capacity=8)
+    reader = LandmarkBusReader(name)
+    try:
+        for frame in range(1, 4):
+            bus.publish_record(_record(frame))
+        assert [int(reader.read(timeout=0)['frame']) for _ in range(3)] == [1, 2, 3]
+        assert reader.read(timeout=0) is None
+
+        # The writer laps the reader: frames 4-23 into an 8 slot ring
+        for frame in range(4, 24):
+            bus.publish_record(_record(frame))
+        assert int(reader.latest()['frame']) == 23
+        frames = []
+        while (record := reader.read(timeout=0)) is not None:
+            frames.append(int(record['frame']))
+
+        # Resumes at the oldest frame still safe to read and counts everything it missed
+        assert frames == list(range(23 - 8 + 2, 24))
+        assert reader.frames_dropped == frames[0] - 4
+        assert reader.frames_read + reader.frames_dropped == 23
+    finally:
+        reader.close()
+        bus.close()
+
+
+def test_reader_ends_once_writer_closed_and_ring_is_drained():
+    name = _bus_name()
+    bus = LandmarkBus(name, capacity=8)
+    reader = LandmarkBusReader(name)
+    for frame in range(1, 4):
+        bus.publish_record(_record(frame))
+    bus.close()
+    assert [int(record['frame']) for record in reader] == [1, 2, 3]
+    reader.close()
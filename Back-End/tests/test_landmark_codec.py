@@ -0,0 +1,71 @@
+import numpy as np
+
+from landmark_codec import LandmarkDecoder, LandmarkEncoder, decode_landmarks, encode_landmarks
+from synthetic_landmarks import generate_landmarks
+
+
+def _frames(num_frames, missing_every=0):
+    frames = generate_landmarks(num_frames).astype(np.float32)
+    if missing_every:
+        # Frames without a detection are stored as NaN rows
+        frames[::missing_every] = np.nan
+    return frames
+
+
+def _scores(frames):
+    rng = np.random.default_rng(1)
+    scores = rng.uniform(0.0, 0.05, size=frames.shape[:2]).astype(np.float32)
+    scores[np.isnan(frames[:, 0, 3])] = np.nan
+    return scores
+
+
+def test_stream_round_trip_within_quantisation_error():
+    frames = _frames(300, missing_every=7)
+    scores = _scores(frames)
+    encoder = LandmarkEncoder(precision=1e-4, visibility_precision=1e-3, score_precision=1e-5,
+                              keyframe_interval=30)
+    decoder = LandmarkDecoder()
+    decoded, decoded_scores = [], []
+    for start in range(0, len(frames), 45):
+        landmarks, block_scores = decoder.decode(encoder.encode(frames[start:start + 45],
+                                                                scores[start:start + 45]))
+        decoded.append(landmarks)
+        decoded_scores.append(block_scores)
+    decoded = np.concatenate(decoded)
+    decoded_scores = np.concatenate(decoded_scores)
+
+    absent = np.isnan(frames[:, 0, 3])
+    assert absent.any()
+    assert np.isnan(decoded[absent]).all()
+    present = ~absent
+    # Rounding to the nearest step is off by at most half a step, plus float32 rounding
+    assert np.abs(decoded[present][..., :3] - frames[present][..., :3]).max() <= 0.5e-4 + 1e-6
+    assert np.abs(decoded[present][..., 3] - frames[present][..., 3]).max() <= 0.5e-3 + 1e-6
+    assert np.abs(decoded_scores[present] - scores[present]).max() <= 0.5e-5 + 1e-7
+    assert decoder.frames_lost == 0
+
+
+def test_lost_block_is_recovered_at_the_next_keyframe():
+    frames = _frames(80)
+    encoder = LandmarkEncoder(keyframe_interval=30)
+    blocks = [encoder.encode(frames[start:start + 20]) for start in range(0, 80, 20)]
+
+    decoder = LandmarkDecoder()
+    first, _ = decoder.decode(blocks[0])
+    # blocks[1] (frames 20-39, keyframe at 30) never arrives
+    deltas, _ = decoder.decode(blocks[2])
+    recovered, _ = decoder.decode(blocks[3])
+
+    assert np.allclose(first, frames[:20], atol=1e-3)
+    # Frames 40-59 are deltas from the lost keyframe group, so they cannot be restored
+    assert np.isnan(deltas).all()
+    assert decoder.frames_lost == 20
+    # Frame 60 starts a new keyframe group
+    assert np.allclose(recovered, frames[60:], atol=1e-3)
+
+
+def test_keyframe_block_decodes_on_its_own():
+    frames = _frames(50, missing_every=9)
+    landmarks, scores = decode_landmarks(encode_landmarks(frames))
+    assert scores is None
+    assert np.allclose(landmarks, frames, atol=1e-3, equal_nan=True)
@@ -0,0 +1,57 @@
+import errno
+import threading
+
+import numpy as np
+import pytest
+
+from landmark_log import FRAME_DTYPE, ColumnarLandmarkSink, LandmarkLogReader
+from synthetic_landmarks import generate_landmarks, FakePoseEstimator
+from PostureMovementDetector import PostureMovementDetector
+
+
+class FullDiskSink(ColumnarLandmarkSink):
+    def _write_block(self, records):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+
+def _results(count):
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(generate_landmarks(count)))
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    return [detector._analyze_frame(image, i + 1, i / 30.0) for i in range(count)]
+
+
+def test_writer_error_reaches_the_recorder(tmp_path):
+    results = _results(40)
+    sink = FullDiskSink(str(tmp_path / "full.lmlog"), block_frames=4, num_blocks=2)
+    raised = []
+
+    def record():
+        try:
+            for result in results:
+                sink.write(result)
+            sink.close()
+        except OSError as e:
+            raised.append(e)
+
+    recorder = threading.Thread(target=record, daemon=True)
+    recorder.start()
+    recorder.join(timeout=10)
+    assert not recorder.is_alive(), "recorder blocked on a dead writer"
+    assert raised and raised[0].errno == errno.ENOSPC
+
+    with pytest.raises(OSError):
+        sink.close()
+
+
+def test_write_records_does_not_keep_the_callers_array(tmp_path):
+    path = str(tmp_path / "copy.lmlog")
+    records = np.zeros(100, dtype=FRAME_DTYPE)
+    records['frame'] = np.arange(100)
+    sink = ColumnarLandmarkSink(path)
+    sink.write_records(records)
+    records['frame'] = 0
+    sink.close()
+
+    reader = LandmarkLogReader(path)
+    assert np.array_equal(reader.frames['frame'], np.arange(100))
+    reader.close()
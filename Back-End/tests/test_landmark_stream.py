@@ -0,0 +1,121 @@
+import subprocess
+import sys
+import textwrap
+import time
+
+import cv2
+import numpy as np
+
+from conftest import BACK_END
+from synthetic_landmarks import generate_landmarks, FakePoseEstimator
+from pose_model_capture import LandmarkProducer
+
+# Runs in its own interpreter: a get() left blocked on an executor thread keeps
+# asyncio.run(), and the interpreter after it, from ever exiting
+CANCEL_SCRIPT = textwrap.dedent("""
+    import asyncio
+    import sys
+    import threading
+
+    sys.path[:0] = [{back_end!r}, {benchmarks!r}]
+    from synthetic_landmarks import generate_landmarks, FakePoseEstimator
+    from pose_model_capture import LandmarkProducer
+
+
+    # Delivers one frame, then stalls until released, so no later item wakes the consumer
+    class StallingPoseEstimator(FakePoseEstimator):
+
+        def __init__(self, frames):
+            super().__init__(frames)
+            self.release = threading.Event()
+            self.calls = 0
+
+        def process(self, image):
+            self.calls += 1
+            if self.calls > 1:
+                self.release.wait()
+            return super().process(image)
+
+
+    pose = StallingPoseEstimator(generate_landmarks(10))
+    producer = LandmarkProducer({video!r}, pose=pose)
+    received = []
+
+
+    async def consume():
+        async for item in producer:
+            received.append(item)
+
+
+    async def main():
+        task = asyncio.create_task(consume())
+        while not received:
+            await asyncio.sleep(0.01)
+        # Cancel while the consumer waits on the blocking get of an empty queue
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+    asyncio.run(main())
+    pose.release.set()
+    producer.stop()
+    print(len(received), len(producer.streams))
+""")
+
+
+def _write_video(path, frames=60):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 30.0, (64, 48))
+    for _ in range(frames):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+
+def test_cancelled_async_consumer_does_not_hang(tmp_path):
+    video = tmp_path / "clip.avi"
+    _write_video(video)
+    script = CANCEL_SCRIPT.format(back_end=BACK_END, benchmarks=f"{BACK_END}/benchmarks", video=str(video))
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=30)
+    assert completed.returncode == 0, completed.stderr
+    received, streams = map(int, completed.stdout.split())
+    assert received > 0
+    assert streams == 0
+
+
+class SlowPoseEstimator(FakePoseEstimator):
+    """Takes longer per frame than the video's frame interval"""
+
+    def __init__(self, frames):
+        super().__init__(frames)
+        self.closed = False
+
+    def process(self, image):
+        time.sleep(0.05)
+        return super().process(image)
+
+    def close(self):
+        self.closed = True
+
+
+def test_video_timestamps_follow_the_file_and_callers_pose_stays_open(tmp_path):
+    video = tmp_path / "clip.avi"
+    _write_video(video, frames=10)
+    pose = SlowPoseEstimator(generate_landmarks(10, dropout=0))
+    producer = LandmarkProducer(str(video), pose=pose)
+    timestamps = [timestamp for timestamp, _ in producer]
+    producer.stop()
+
+    assert np.allclose(timestamps, np.arange(len(timestamps)) / 30.0, atol=1e-3)
+    assert not pose.closed
+
+
+def test_get_returns_none_on_timeout(tmp_path):
+    video = tmp_path / "clip.avi"
+    _write_video(video, frames=2)
+    producer = LandmarkProducer(str(video), pose=SlowPoseEstimator(generate_landmarks(2, dropout=0)))
+    stream = producer.subscribe()
+    assert stream.get(timeout=0.01) is None
+    assert not stream.closed
+    stream.close()
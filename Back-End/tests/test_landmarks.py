@@ -0,0 +1,22 @@
+import numpy as np
+
+from landmarks import NUM_LANDMARKS, landmarks_to_array
+from synthetic_landmarks import generate_landmarks, to_pose_result
+
+
+def test_landmarks_to_array_matches_the_landmark_objects():
+    frame = generate_landmarks(1, dropout=0)[0]
+    landmarks = to_pose_result(frame).pose_landmarks.landmark
+    array = landmarks_to_array(landmarks)
+    assert array.dtype == np.float32 and array.shape == (NUM_LANDMARKS, 4)
+    assert np.array_equal(array, frame.astype(np.float32))
+
+
+def test_missing_landmarks_are_nan():
+    frame = generate_landmarks(1, dropout=0)[0]
+    landmarks = to_pose_result(frame).pose_landmarks.landmark[:20]
+    out = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    array = landmarks_to_array(landmarks, out=out)
+    assert array is out
+    assert np.array_equal(array[:20], frame[:20].astype(np.float32))
+    assert np.isnan(array[20:]).all()
@@ -0,0 +1,21 @@
+import numpy as np
+
+from synthetic_landmarks import generate_landmarks, FakePoseEstimator
+from PostureMovementDetector import PostureMovementDetector
+
+
+def test_forced_inference_is_not_counted_as_reuse(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    frames = generate_landmarks(10, dropout=0)
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(frames), motion_gate=True)
+    image = np.zeros((90, 160, 3), dtype=np.uint8)
+
+    assert not detector.process_frame(image).reused
+    # No results to reuse, although the gate still holds a matching reference frame
+    detector.last_pose_results = None
+    assert not detector.process_frame(image).reused
+    assert detector.motion_gate.frames_reused == 0
+
+    assert detector.process_frame(image).reused
+    assert detector.motion_gate.frames_reused == 1
+    assert detector.motion_gate.frames_seen == 3
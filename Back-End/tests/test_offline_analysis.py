@@ -0,0 +1,30 @@
+import cv2
+import numpy as np
+
+import offline_analysis
+from synthetic_landmarks import generate_landmarks, FakePoseEstimator
+from PostureMovementDetector import PostureMovementDetector
+
+
+def _write_video(path, frames, fps):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (64, 48))
+    for _ in range(frames):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+
+def test_chunks_start_fresh_tremor_analysis_at_source_rate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    video = tmp_path / "clip.avi"
+    _write_video(video, 40, 15.0)
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(generate_landmarks(200)),
+                                       tremor_analysis=True)
+    monkeypatch.setattr(offline_analysis, "_worker_detector", detector)
+
+    offline_analysis._analyze_chunk(str(video), 0, 0, 0, 20, "opencv", 2)
+    assert detector.tremor_analyzer.fps == 7.5
+    assert detector.tremor_analyzer.count == 10
+
+    # The next chunk does not continue the previous chunk's tremor window
+    offline_analysis._analyze_chunk(str(video), 1, 10, 20, 40, "opencv", 2)
+    assert detector.tremor_analyzer.count == 15
@@ -0,0 +1,48 @@
+import threading
+import time
+
+import numpy as np
+
+from synthetic_landmarks import generate_landmarks, FakePoseEstimator
+from PostureMovementDetector import PostureMovementDetector
+
+
+class SlowSource:
+    """Video source that decodes slower than the fake estimator infers"""
+
+    def __init__(self, frames, delay=0.02):
+        self.frames = frames
+        self.delay = delay
+        self.number = 0
+
+    def read(self):
+        time.sleep(self.delay)
+        if self.number >= self.frames:
+            return None
+        self.number += 1
+        return np.zeros((8, 8, 3), dtype=np.uint8), self.number / 30.0, self.number - 1
+
+    def close(self):
+        pass
+
+
+def test_quit_mid_video_with_slow_source(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(generate_landmarks(50)),
+                                       log_format="columnar", video_path="slow.mp4")
+    detector.source = SlowSource(1000)
+    rendered = []
+
+    def render(frame, result, patient_id):
+        rendered.append(result.frame_index)
+        return len(rendered) < 5  # 'q' after five frames
+
+    detector._render_result = render
+    runner = threading.Thread(target=detector.run_detection, args=("quit",),
+                              kwargs={"display": True, "pipelined": True}, daemon=True)
+    runner.start()
+    runner.join(timeout=10)
+    assert not runner.is_alive(), "pipelined loop did not stop after quitting"
+    assert len(rendered) == 5
+    assert detector.source.number < 1000
+    detector.cleanup()
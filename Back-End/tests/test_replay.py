@@ -0,0 +1,30 @@
+import numpy as np
+
+from replay import replay_movement_scores
+from synthetic_landmarks import generate_landmarks, FakePoseEstimator
+from PostureMovementDetector import PostureMovementDetector
+
+
+def test_replayed_movement_scores_match_the_live_detector():
+    frames = generate_landmarks(400, noise=0.004, tremor_amplitude=0.02, dropout=0.05)
+    # Landmarks that drop below the visibility threshold on single frames
+    rng = np.random.default_rng(3)
+    frames[..., 3] = np.where(rng.random(frames.shape[:2]) < 0.1, 0.2, frames[..., 3])
+    frames[np.all(frames[..., 3] <= 0.2, axis=1), :, 3] = 0.0
+
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(frames), movement_window=6)
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    logged = np.full(frames.shape, np.nan, dtype=np.float32)
+    live = np.full(frames.shape[:2], np.nan, dtype=np.float32)
+    for i in range(len(frames)):
+        result = detector._analyze_frame(image, i, i / 30.0)
+        if result.landmarks is not None:
+            logged[i] = result.landmarks
+            live[i] = result.movement_score_array
+
+    detected = ~np.isnan(logged[:, 0, 3])
+    assert 0 < detected.sum() < len(frames)
+    replayed = replay_movement_scores(logged, detector.landmark_visibility_threshold, movement_window=6)
+    assert np.isnan(replayed[~detected]).all()
+    assert np.allclose(replayed[detected], live[detected], atol=1e-6)
+    assert live[detected].max() > 0
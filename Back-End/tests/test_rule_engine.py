@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+from rule_engine import DEFAULT_RULES_PATH, RuleError, RuleSet
+from synthetic_landmarks import generate_landmarks, to_pose_result, FakePoseEstimator
+from PostureMovementDetector import PostureMovementDetector
+
+
+# The default rules that restate assess_posture and detect_involuntary_movements; the
+# others (decorticate, decerebrate, ...) have no built-in counterpart
+BUILT_IN_RULES = {"shoulders_uneven", "hips_uneven", "forward_head", "wrist_movement", "body_movement"}
+
+
+def _built_in_rules():
+    with open(DEFAULT_RULES_PATH) as f:
+        spec = json.load(f)
+    spec["rules"] = [rule for rule in spec["rules"] if rule["name"] in BUILT_IN_RULES]
+    return RuleSet(spec)
+
+
+def _frames():
+    # Postural shifts trip the shoulder and hip checks, tremor the wrist movement check
+    return generate_landmarks(600, noise=0.004, tremor_amplitude=0.02, shift_amplitude=0.08, dropout=0.05)
+
+
+def test_default_rules_match_the_built_in_checks():
+    frames = _frames()
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(frames))
+    rules = _built_in_rules()
+    seen = set()
+    for frame in frames:
+        result = to_pose_result(frame)
+        if not result.pose_landmarks:
+            continue
+        scores = detector.calculate_movement_scores(frame)
+        score_dict = {name: float(scores[idx]) for name, idx in detector.key_landmarks.items()
+                      if frame[idx, 3] > detector.landmark_visibility_threshold}
+
+        posture, movement, fired = rules.evaluate(frame[None], scores[None], detector._rule_params())
+        posture_status, movement_status = rules.status_dicts(posture, movement, fired)
+
+        assert posture_status == detector.assess_posture(result.pose_landmarks.landmark)
+        assert movement_status == detector.detect_involuntary_movements(score_dict)
+        seen.update(posture_status)
+        seen.update(movement_status)
+    # The synthetic session exercises every check, not just the "normal" path
+    assert {"shoulders", "hips", "LEFT_WRIST"} <= seen
+
+
+def test_detector_with_rules_reports_like_the_built_in_checks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    frames = _frames()
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    built_in = PostureMovementDetector(pose_estimator=FakePoseEstimator(frames))
+    with_rules = PostureMovementDetector(pose_estimator=FakePoseEstimator(frames), rules=_built_in_rules())
+    for i in range(len(frames)):
+        expected = built_in.process_frame(image, i / 30.0, i + 1)
+        actual = with_rules.process_frame(image, i / 30.0, i + 1)
+        assert (actual.posture_status, actual.movement_status) == (expected.posture_status,
+                                                                    expected.movement_status)
+
+
+def test_unknown_landmark_is_a_rule_error():
+    spec = {"rules": [{"name": "bad", "group": "posture", "when": "NO_SUCH_POINT.y > 0.5",
+                       "status": ["bad", "yes"]}]}
+    with pytest.raises(RuleError):
+        RuleSet(spec)
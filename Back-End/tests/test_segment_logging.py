@@ -0,0 +1,49 @@
+import json
+import os
+
+import numpy as np
+
+from segment_logging import MANIFEST_NAME, RotatingLandmarkSink
+from synthetic_landmarks import generate_landmarks, FakePoseEstimator
+from PostureMovementDetector import PostureMovementDetector
+
+
+class FlakyUploader:
+    """Fails every upload until it is told the network is back"""
+
+    def __init__(self):
+        self.online = False
+        self.uploaded = []
+
+    def __call__(self, path, entry):
+        if not self.online:
+            raise ConnectionError("network unreachable")
+        self.uploaded.append(os.path.basename(path))
+
+
+def _manifest(directory):
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def test_failed_upload_is_recorded_and_retried(tmp_path):
+    detector = PostureMovementDetector(pose_estimator=FakePoseEstimator(generate_landmarks(90)))
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    uploader = FlakyUploader()
+    sink = RotatingLandmarkSink(str(tmp_path), log_format="columnar", segment_seconds=1.0,
+                                on_segment_closed=uploader)
+    for i in range(90):
+        sink.write(detector._analyze_frame(image, i + 1, i / 30.0))
+    sink.close()
+
+    segments = _manifest(tmp_path)["segments"]
+    assert len(segments) == 3
+    assert all(entry["status"] == "upload_failed" for entry in segments)
+    assert sum(entry["frames"] for entry in segments) == 90
+    assert "network unreachable" in segments[0]["upload_error"]
+
+    uploader.online = True
+    assert sink.retry_failed_uploads() == 3
+    assert uploader.uploaded == [entry["file"] for entry in segments]
+    assert all(entry["status"] == "uploaded" and "upload_error" not in entry
+               for entry in _manifest(tmp_path)["segments"])
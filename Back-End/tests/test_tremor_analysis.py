@@ -0,0 +1,35 @@
+import numpy as np
+
+from landmarks import NUM_LANDMARKS
+from tremor_analysis import SlidingDFTTremorAnalyzer, TREMOR_LANDMARKS
+
+
+def _frames(visibility, count=200, fps=30.0, hz=5.0, amplitude=0.02):
+    """Still body with the left wrist oscillating at hz, all at the given visibility"""
+    frames = np.full((count, NUM_LANDMARKS, 4), 0.5)
+    frames[:, :, 3] = visibility
+    t = np.arange(count) / fps
+    frames[:, TREMOR_LANDMARKS["LEFT_WRIST"], 0] += amplitude * np.sin(2 * np.pi * hz * t)
+    return frames
+
+
+def _flags(frames):
+    analyzer = SlidingDFTTremorAnalyzer(fps=30.0)
+    for frame in frames:
+        analyzer.update(frame)
+    return dict(zip(analyzer.landmark_names, analyzer.detect()))
+
+
+def test_visible_tremor_is_flagged():
+    assert _flags(_frames(visibility=0.9))["LEFT_WRIST"]
+
+
+def test_jitter_of_hidden_landmark_is_not_tremor():
+    flags = _flags(_frames(visibility=0.1))
+    assert not any(flags.values())
+
+
+def test_landmark_hidden_now_is_not_flagged():
+    frames = _frames(visibility=0.9)
+    frames[-5:, TREMOR_LANDMARKS["LEFT_WRIST"], 3] = 0.1
+    assert not _flags(frames)["LEFT_WRIST"]
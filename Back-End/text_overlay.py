@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class CachedTextRenderer:
+    """
+    Draws status text by stamping cached patches instead of calling cv2.putText every
+    frame. Each distinct (text, color) is rasterized once, without anti-aliasing so its
+    mask is exact, and then copied into the frame in place with cv2.copyTo(mask=...).
+    The least recently used patches are evicted beyond max_entries.
+    """
+
+    def __init__(self, font=cv2.FONT_HERSHEY_SIMPLEX, scale=1, thickness=2, max_entries=128):
+        self.font = font
+        self.scale = scale
+        self.thickness = thickness
+        self.max_entries = max_entries
+        self.patches = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _patch(self, text, color, channels):
+        """(patch, mask, baseline offset) for text in color, rasterized on first use"""
+        key = (text, color, channels)
+        entry = self.patches.get(key)
+        if entry is not None:
+            self.patches.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        (width, height), baseline = cv2.getTextSize(text, self.font, self.scale, self.thickness)
+        pad = self.thickness
+        mask = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+        # Same origin convention as putText: org is the bottom-left corner of the text
+        cv2.putText(mask, text, (pad, pad + height), self.font, self.scale, 255, self.thickness, cv2.LINE_8)
+        patch = np.zeros(mask.shape + (channels,), dtype=np.uint8)
+        patch[mask > 0] = color[:channels]
+        entry = (patch, mask, pad + height)
+        self.patches[key] = entry
+        if len(self.patches) > self.max_entries:
+            self.patches.popitem(last=False)
+        return entry
+
+    def draw(self, image, text, org, color):
+        """Draw text onto a uint8 BGR image in place, with org as in cv2.putText"""
+        patch, mask, top = self._patch(text, tuple(color), image.shape[2])
+        x0 = org[0] - self.thickness
+        y0 = org[1] - top
+
+        # Clip the stamp to the image
+        left, top_row = max(x0, 0), max(y0, 0)
+        right = min(x0 + mask.shape[1], image.shape[1])
+        bottom = min(y0 + mask.shape[0], image.shape[0])
+        if right <= left or bottom <= top_row:
+            return
+
+        rows = slice(top_row - y0, bottom - y0)
+        cols = slice(left - x0, right - x0)
+        # copyTo writes straight into the image view since size and type match
+        cv2.copyTo(patch[rows, cols], mask[rows, cols], image[top_row:bottom, left:right])
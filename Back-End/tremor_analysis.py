@@ -0,0 +1,160 @@
+import numpy as np
+
+# Landmarks watched for tremor: wrists, ankles and the head
+TREMOR_LANDMARKS = {
+    "NOSE": 0,
+    "LEFT_WRIST": 15,
+    "RIGHT_WRIST": 16,
+    "LEFT_ANKLE": 27,
+    "RIGHT_ANKLE": 28
+}
+
+# Frequency bands in Hz
+DEFAULT_BANDS = {
+    "slow": (0.5, 3.0),
+    "tremor": (4.0, 6.0),
+    "fast": (6.0, 12.0)
+}
+
+
+class SlidingDFTTremorAnalyzer:
+    """
+    Sliding DFT over the last `window` samples of x, y and z for a set of landmarks.
+    Each new frame updates every bin with one multiply-add,
+        X_k <- (X_k + x_new - x_oldest) * exp(2j*pi*k/N)
+    for all landmarks, axes and bins at once, instead of an FFT per frame.
+    The spectrum is recomputed exactly every resync_interval samples to cancel
+    floating point drift. A landmark at or below visibility_threshold holds its last
+    visible position, since the positions MediaPipe guesses for hidden points jitter
+    in the tremor band, and is not flagged until it is visible again.
+    """
+
+    def __init__(self, fps=30.0, window=64, bands=DEFAULT_BANDS, landmarks=TREMOR_LANDMARKS,
+                 resync_interval=None, visibility_threshold=0.5):
+        self.fps = fps
+        self.window = window
+        self.bands = dict(bands)
+        self.landmark_names = list(landmarks)
+        self.indices = np.array(list(landmarks.values()))
+        self.resync_interval = resync_interval or 8 * window
+        self.visibility_threshold = visibility_threshold
+
+        num_bins = window // 2 + 1
+        self.frequencies = np.arange(num_bins) * fps / window
+        self.twiddle = np.exp(2j * np.pi * np.arange(num_bins) / window)
+        # One boolean row per band selecting its bins, DC excluded
+        self.band_masks = np.array([(self.frequencies >= low) & (self.frequencies <= high) & (self.frequencies > 0)
+                                    for low, high in self.bands.values()])
+
+        self.samples = np.zeros((window, len(self.indices), 3))
+        self.spectrum = np.zeros((len(self.indices), 3, num_bins), dtype=np.complex128)
+        self.position = 0
+        self.count = 0
+        self.last_sample = None
+        self.visible = np.zeros(len(self.indices), dtype=bool)
+
+    @property
+    def ready(self):
+        """True once a full window of samples has been seen"""
+        return self.count >= self.window
+
+    def update(self, landmarks):
+        """
+        Add one frame. landmarks is a (33, 3+) array, with visibility in column 3 if
+        present; pass None when nobody was detected and the last sample is repeated so
+        the time base stays uniform.
+        """
+        if landmarks is None:
+            if self.last_sample is None:
+                return
+            self.visible[:] = False
+            sample = self.last_sample
+        else:
+            points = landmarks[self.indices]
+            sample = points[:, :3]
+            if points.shape[1] > 3:
+                self.visible = points[:, 3] > self.visibility_threshold
+                if self.last_sample is not None:
+                    # Hidden landmarks hold their last visible position
+                    sample = np.where(self.visible[:, None], sample, self.last_sample)
+            else:
+                self.visible[:] = True
+            self.last_sample = sample
+
+        if self.count == 0:
+            # Fill the window with the first sample so the start-up is not one big step
+            self.samples[:] = sample
+            self.spectrum[:] = 0
+            self.spectrum[..., 0] = sample * self.window
+
+        delta = sample - self.samples[self.position]
+        self.spectrum += delta[..., None]
+        self.spectrum *= self.twiddle
+        self.samples[self.position] = sample
+        self.position = (self.position + 1) % self.window
+        self.count += 1
+
+        if self.count % self.resync_interval == 0:
+            self._resync()
+
+    def _resync(self):
+        """Recompute the spectrum exactly from the samples, oldest first"""
+        ordered = np.roll(self.samples, -self.position, axis=0)
+        self.spectrum[:] = np.moveaxis(np.fft.rfft(ordered, axis=0), 0, -1)
+
+    def power_spectrum(self):
+        """One-sided power per landmark and bin, summed over x, y and z. Shape (landmarks, bins)"""
+        power = np.abs(self.spectrum) ** 2
+        power = power.sum(axis=1) * (2.0 / self.window ** 2)
+        power[:, 0] = 0.0
+        return power
+
+    def band_power(self, power=None):
+        """Power in each configured band. Shape (landmarks, bands)"""
+        if power is None:
+            power = self.power_spectrum()
+        return power @ self.band_masks.T
+
+    def dominant_frequency(self, power=None):
+        """Frequency of the strongest non-DC bin per landmark"""
+        if power is None:
+            power = self.power_spectrum()
+        return self.frequencies[np.argmax(power, axis=1)]
+
+    def band_ratio(self, power=None):
+        """Share of the total non-DC power that falls in each band. Shape (landmarks, bands)"""
+        if power is None:
+            power = self.power_spectrum()
+        total = power.sum(axis=1, keepdims=True)
+        return np.divide(self.band_power(power), total, out=np.zeros((len(power), len(self.bands))),
+                         where=total > 0)
+
+    def detect(self, band="tremor", min_ratio=0.5, min_power=2.5e-5):
+        """Per-landmark boolean mask of visible landmarks whose movement is concentrated in band"""
+        if not self.ready:
+            return np.zeros(len(self.indices), dtype=bool)
+        power = self.power_spectrum()
+        column = list(self.bands).index(band)
+        return ((self.band_power(power)[:, column] >= min_power) & (self.band_ratio(power)[:, column] >= min_ratio)
+                & self.visible)
+
+    def report(self):
+        """Band power, band ratio and dominant frequency for every watched landmark"""
+        power = self.power_spectrum()
+        band_power = self.band_power(power)
+        band_ratio = self.band_ratio(power)
+        dominant = self.dominant_frequency(power)
+        report = {}
+        for i, name in enumerate(self.landmark_names):
+            report[name] = {
+                "dominant_frequency": float(dominant[i]),
+                "band_power": {band: float(band_power[i, j]) for j, band in enumerate(self.bands)},
+                "band_ratio": {band: float(band_ratio[i, j]) for j, band in enumerate(self.bands)}
+            }
+        return report
+
+    def reset(self):
+        self.position = 0
+        self.count = 0
+        self.last_sample = None
+        self.visible[:] = False
@@ -0,0 +1,170 @@
+import argparse
+import time
+
+import cv2
+
+
+class OpenCVFrameSource:
+    """
+    Frames of a video file or stream through cv2.VideoCapture, converted to RGB.
+    With stride > 1 only every stride-th frame is returned; the ones in between are
+    grabbed (decoded) but never retrieved or converted. Timestamps come from the
+    container (CAP_PROP_POS_MSEC).
+    """
+
+    def __init__(self, path, stride=1):
+        self.path = path
+        self.stride = stride
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Error: Could not open video {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.next_number = 0
+
+    def seek(self, frame_number):
+        """Continue reading at frame_number"""
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        self.next_number = frame_number
+
+    def read(self):
+        """(frame_rgb, timestamp in seconds, frame number), or None at the end"""
+        number = self.next_number
+        if not self.cap.grab():
+            return None
+        timestamp = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            return None
+        for _ in range(self.stride - 1):
+            if not self.cap.grab():
+                break
+        self.next_number = number + self.stride
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), timestamp, number
+
+    def __iter__(self):
+        while True:
+            item = self.read()
+            if item is None:
+                return
+            yield item
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class PyAVFrameSource:
+    """
+    Frames of a video file or network stream decoded with PyAV (FFmpeg). Decoding runs
+    on FFmpeg's own threads (thread_type "AUTO" uses frame and slice threading,
+    thread_count 0 lets FFmpeg pick), and frames come out as RGB24 directly from
+    FFmpeg's converter, optionally scaled to size=(width, height) in the same pass.
+    With stride > 1 the frames in between are decoded but never converted; skip_frame
+    ("NONREF", "NONKEY") additionally has the decoder drop frames it would otherwise
+    decode. Timestamps are the frames' presentation times relative to the stream start.
+    """
+
+    def __init__(self, path, stride=1, thread_type="AUTO", thread_count=0, skip_frame=None, size=None,
+                 options=None):
+        try:
+            import av
+        except ImportError:
+            raise ImportError("PyAV is required for the pyav video backend (pip install av)")
+        self.path = path
+        self.stride = stride
+        self.size = size
+        self.container = av.open(path, options=options or {})
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = thread_type
+        self.stream.thread_count = thread_count
+        if skip_frame is not None:
+            self.stream.codec_context.skip_frame = skip_frame
+
+        self.time_base = self.stream.time_base
+        self.start_pts = self.stream.start_time or 0
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        self.fps = float(rate) if rate else 30.0
+        self.frame_count = self.stream.frames
+        if not self.frame_count and self.stream.duration is not None:
+            self.frame_count = int(float(self.stream.duration * self.time_base) * self.fps)
+        self.frames = self.container.decode(self.stream)
+        self.next_number = 0
+        self.decoded = 0
+
+    def seek(self, frame_number):
+        """Continue reading at frame_number: seek to the keyframe before it and decode forward"""
+        target_pts = self.start_pts + int(frame_number / self.fps / self.time_base)
+        self.container.seek(target_pts, stream=self.stream, backward=True, any_frame=False)
+        self.frames = self.container.decode(self.stream)
+        self.next_number = frame_number
+        self.decoded = frame_number
+
+    def read(self):
+        """(frame_rgb, timestamp in seconds, frame number), or None at the end"""
+        for frame in self.frames:
+            if frame.pts is not None:
+                timestamp = float((frame.pts - self.start_pts) * self.time_base)
+                number = round(timestamp * self.fps)
+            else:
+                # Some streams carry no timestamps; count frames instead
+                number = self.decoded
+                timestamp = number / self.fps
+            self.decoded = number + 1
+            if number < self.next_number:
+                continue
+            self.next_number = number + self.stride
+            if self.size is not None:
+                image = frame.to_ndarray(width=self.size[0], height=self.size[1], format='rgb24')
+            else:
+                image = frame.to_ndarray(format='rgb24')
+            return image, timestamp, number
+        return None
+
+    def __iter__(self):
+        while True:
+            item = self.read()
+            if item is None:
+                return
+            yield item
+
+    def close(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+FRAME_SOURCES = {
+    "opencv": OpenCVFrameSource,
+    "pyav": PyAVFrameSource
+}
+
+
+def open_frame_source(path, backend="opencv", **kwargs):
+    """Open a video file or stream with the named backend ("opencv" or "pyav")"""
+    return FRAME_SOURCES[backend](path, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure decode throughput of the video backends')
+    parser.add_argument('video', type=str, help='Video file or stream URL')
+    parser.add_argument('--backends', nargs='+', default=list(FRAME_SOURCES), choices=list(FRAME_SOURCES))
+    parser.add_argument('--stride', type=int, default=1, help='Return every n-th frame')
+    parser.add_argument('--max_frames', type=int, default=None, help='Stop after this many returned frames')
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        source = open_frame_source(args.video, backend, stride=args.stride)
+        count = 0
+        started = time.perf_counter()
+        last_timestamp = 0.0
+        for frame_rgb, timestamp, number in source:
+            count += 1
+            last_timestamp = timestamp
+            if args.max_frames is not None and count >= args.max_frames:
+                break
+        elapsed = time.perf_counter() - started
+        source.close()
+        print(f"{backend:<8}{count:>7} frames in {elapsed:.2f}s ({count / elapsed:.1f} fps), "
+              f"last timestamp {last_timestamp:.3f}s")